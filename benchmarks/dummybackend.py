@@ -0,0 +1,93 @@
+#
+#  Copyright 2019 Thomas Wunschel (https://github.com/wuschi)
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+"""
+A local dummy backend for the full stack benchmark.
+
+Serves a fixed number of tracks under the `dummy:` uri scheme, all of which
+play the same generated silent wave file, so the audio pipeline runs without
+any media library or network access.
+"""
+from __future__ import unicode_literals
+
+import os
+import struct
+import wave
+
+from mopidy import backend, models
+
+import pykka
+
+
+def write_silence(path, seconds, rate=8000):
+    """
+    Writes a mono 16 bit wave file containing `seconds` of silence.
+    """
+    out = wave.open(path, 'wb')
+    try:
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(rate)
+        frame = struct.pack('<h', 0)
+        out.writeframes(frame * (rate * seconds))
+    finally:
+        out.close()
+
+
+class DummyLibraryProvider(backend.LibraryProvider):
+    """
+    Looks up the `dummy:track:N` uris.
+    """
+
+    def lookup(self, uri):
+        track = self.backend.tracks.get(uri)
+        return [track] if track is not None else []
+
+
+class DummyPlaybackProvider(backend.PlaybackProvider):
+    """
+    Plays every track from the generated wave file.
+    """
+
+    def translate_uri(self, uri):
+        if uri not in self.backend.tracks:
+            return None
+        return 'file://' + self.backend.media_path
+
+
+class DummyBackend(pykka.ThreadingActor, backend.Backend):
+    """
+    Dummy backend with `tracks` silent tracks of `track_length` seconds.
+    """
+    uri_schemes = ['dummy']
+
+    def __init__(self, config, audio, media_dir, tracks=10, track_length=60):
+        super(DummyBackend, self).__init__()
+        self.audio = audio
+        self.media_path = os.path.join(media_dir, 'silence.wav')
+        write_silence(self.media_path, track_length)
+        self.tracks = dict(
+            (uri, models.Track(uri=uri, name='Track {:d}'.format(index),
+                               length=track_length * 1000))
+            for index, uri in enumerate(self.uris(tracks)))
+        self.library = DummyLibraryProvider(backend=self)
+        self.playback = DummyPlaybackProvider(audio=audio, backend=self)
+
+    @staticmethod
+    def uris(tracks):
+        """
+        Returns the uris of the first `tracks` tracks.
+        """
+        return ['dummy:track:{:d}'.format(index) for index in range(tracks)]
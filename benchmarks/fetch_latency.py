@@ -0,0 +1,113 @@
+#
+#  Copyright 2019 Thomas Wunschel (https://github.com/wuschi)
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+"""
+Compares sequential and concurrent resolution of core futures.
+
+Runs the track controls of :class:`PhonieboxControls` with a cold state
+cache against a :class:`FakeCore` which delays every answer by a fixed
+latency, once resolving the core futures one after the other (the previous
+behaviour) and once resolving them together with `pykka.get_all`.
+
+Usage::
+
+    python -m benchmarks.fetch_latency [--rounds N] [--latency MS ...]
+"""
+from __future__ import print_function, unicode_literals
+
+import argparse
+
+import pykka
+
+from mopidy_phoniebox.compat import monotonic
+from mopidy_phoniebox.controls import PhonieboxControls
+from mopidy_phoniebox.fakecore import FakeCore
+from mopidy_phoniebox.statecache import StateCache
+
+
+CONTROLS = {
+    'cd_previous': (StateCache.TRACKLIST,
+                    StateCache.CURRENT_TL_TRACK,
+                    StateCache.TIME_POSITION),
+    'previous': (StateCache.TRACKLIST, StateCache.CURRENT_TL_TRACK),
+    'next': (StateCache.TRACKLIST, StateCache.CURRENT_TL_TRACK),
+}
+
+
+class SequentialStateCache(StateCache):
+    """
+    A state cache resolving the futures of missing values one after the
+    other.
+    """
+
+    def get_all(self, *keys):
+        return [self.convert(key, self.fetchers[key]().get())
+                for key in keys]
+
+
+def measure(controls, name, rounds):
+    """
+    Returns the mean duration of a control in milliseconds, invalidating the
+    state cache before each call.
+    """
+    fn = getattr(controls, name)
+    total = 0
+    for _ in range(rounds):
+        controls.state.invalidate()
+        started = monotonic()
+        fn()
+        total += monotonic() - started
+    return total * 1000 / rounds
+
+
+def run(latencies, rounds):
+    """
+    Runs the benchmark and returns a list of result rows.
+    """
+    rows = []
+    for latency in latencies:
+        core = FakeCore(latency=latency / 1000.0)
+        try:
+            sequential = PhonieboxControls(core, SequentialStateCache(core))
+            concurrent = PhonieboxControls(core)
+            pykka.get_all([core.playback.play()])
+            for name in sorted(CONTROLS):
+                rows.append((name, latency, len(CONTROLS[name]),
+                             measure(sequential, name, rounds),
+                             measure(concurrent, name, rounds)))
+        finally:
+            core.stop()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--rounds', type=int, default=20,
+                        help='number of calls per control (default: 20)')
+    parser.add_argument('--latency', type=float, nargs='+',
+                        default=[1, 5, 20],
+                        help='core latencies in ms (default: 1 5 20)')
+    args = parser.parse_args()
+
+    print('{:<12} {:>10} {:>8} {:>15} {:>15} {:>8}'.format(
+        'control', 'latency ms', 'fetches', 'sequential ms', 'concurrent ms',
+        'speedup'))
+    for name, latency, fetches, seq, conc in run(args.latency, args.rounds):
+        print('{:<12} {:>10.1f} {:>8d} {:>15.2f} {:>15.2f} {:>7.2f}x'.format(
+            name, latency, fetches, seq, conc, seq / conc))
+
+
+if __name__ == '__main__':
+    main()
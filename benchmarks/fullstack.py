@@ -0,0 +1,269 @@
+#
+#  Copyright 2019 Thomas Wunschel (https://github.com/wuschi)
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+"""
+Benchmarks the controls end to end against an in-process mopidy.
+
+Starts a real mopidy :class:`Core` with the software mixer, a `fakesink`
+audio output and a local :class:`DummyBackend`, starts the
+:class:`PhonieboxFrontend` with a generated config on gpiozero's MockFactory
+and replays a scripted button session. For every press it measures the time
+and the process cpu time from the button edge until the core has executed
+the resulting command, and prints the results per control as JSON.
+
+Needs mopidy with GStreamer, but no hardware and no network.
+
+Usage::
+
+    python -m benchmarks.fullstack [--rounds N] [--session FN,FN,...]
+                                   [--interval MS] [--output FILE]
+"""
+from __future__ import division, print_function, unicode_literals
+
+import argparse
+import json
+import logging
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+from gpiozero import Device
+from gpiozero.pins.mock import MockFactory
+
+from mopidy import config as config_lib
+from mopidy.audio import Audio
+from mopidy.core import Core
+from mopidy.softwaremixer.mixer import SoftwareMixer
+
+import pkg_resources
+
+import pykka
+
+from mopidy_phoniebox import Extension
+from mopidy_phoniebox.compat import monotonic, process_time
+from mopidy_phoniebox.frontend import PhonieboxFrontend
+
+from .dummybackend import DummyBackend
+
+
+# one gpio per control of PhonieboxControls, shutdown is left out
+GPIOS = (
+    (2, 'play_pause'),
+    (3, 'next'),
+    (4, 'prev'),
+    (5, 'cdprev'),
+    (6, 'vol_up'),
+    (7, 'vol_down'),
+    (8, 'mute'),
+    (9, 'seek_fwd'),
+    (10, 'seek_bwd'),
+)
+
+SESSION = ('play_pause', 'play_pause', 'next', 'next', 'next', 'prev',
+           'cdprev', 'vol_up', 'vol_up', 'vol_down', 'mute', 'mute',
+           'seek_fwd', 'seek_fwd', 'seek_bwd', 'prev', 'next')
+
+SETTLE_TIMEOUT = 10
+
+
+def load_config(data_dir):
+    """
+    Loads the mopidy config with the phoniebox buttons of :data:`GPIOS`.
+    """
+    extension = Extension()
+    overrides = [
+        ('core', 'cache_dir', data_dir),
+        ('core', 'config_dir', data_dir),
+        ('core', 'data_dir', data_dir),
+        ('core', 'restore_state', 'false'),
+        ('audio', 'mixer', 'software'),
+        ('audio', 'mixer_volume', '50'),
+        ('audio', 'output', 'fakesink sync=true'),
+    ]
+    for gpio, fn_type in GPIOS:
+        overrides.append(('phoniebox', 'gpio{:d}'.format(gpio),
+                          'pull_up,none'))
+        overrides.append(('phoniebox', 'gpio{:d}.when_pressed'.format(gpio),
+                          fn_type))
+    config, errors = config_lib.load([], [extension.get_config_schema()],
+                                     [extension.get_default_config()],
+                                     overrides)
+    errors = dict((section, error) for section, error in errors.items()
+                  if error)
+    if errors:
+        raise ValueError('invalid config: {}'.format(errors))
+    return config
+
+
+def percentile(values, percent):
+    """
+    Returns the nearest rank percentile of the sorted `values`.
+    """
+    if not values:
+        return None
+    rank = max(int(round(percent / 100.0 * len(values))), 1)
+    return values[min(rank, len(values)) - 1]
+
+
+def summarize(durations, cpu_times):
+    """
+    Summarizes the durations and cpu times of one control in milliseconds.
+    """
+    durations = sorted(durations)
+    return {
+        'count': len(durations),
+        'mean': sum(durations) / len(durations),
+        'p50': percentile(durations, 50),
+        'p99': percentile(durations, 99),
+        'max': durations[-1],
+        'cpu_mean': sum(cpu_times) / len(cpu_times),
+    }
+
+
+def settle(core, controls, executor):
+    """
+    Waits until a press has been executed by the core: drains the command
+    executor, writes pending volume changes, sends a pending seek right away
+    instead of waiting for the seek window and finally makes a round trip to
+    the core actor, which answers only after the preceding commands.
+    """
+    executor.join()
+    controls.volume_coalescer.wait(SETTLE_TIMEOUT)
+    controls.seek_accumulator.flush()
+    core.playback.get_state().get(timeout=SETTLE_TIMEOUT)
+
+
+def replay(core, frontend, session, rounds, interval):
+    """
+    Replays the session `rounds` times and returns the durations and cpu
+    times per control.
+    """
+    controller = frontend.gpio_controller.get()
+    controls = frontend.controls.get()
+    pins = dict((fn_type, Device.pin_factory.pin(gpio))
+                for gpio, fn_type in GPIOS)
+    durations = dict((fn_type, []) for fn_type in session)
+    cpu_times = dict((fn_type, []) for fn_type in session)
+
+    for _ in range(rounds):
+        for fn_type in session:
+            pin = pins[fn_type]
+            started = monotonic()
+            cpu_started = process_time()
+            pin.drive_low()
+            pin.drive_high()
+            settle(core, controls, controller.executor)
+            durations[fn_type].append((monotonic() - started) * 1000)
+            cpu_times[fn_type].append((process_time() - cpu_started) * 1000)
+            pin.clear_states()
+            time.sleep(interval / 1000.0)
+
+    return durations, cpu_times, controller.executor
+
+
+def version(name):
+    try:
+        return pkg_resources.get_distribution(name).version
+    except pkg_resources.DistributionNotFound:
+        return None
+
+
+def run(session, rounds, interval, tracks):
+    """
+    Starts mopidy, runs the benchmark and returns the results as dict.
+    """
+    Device.pin_factory = MockFactory()
+    data_dir = tempfile.mkdtemp(prefix='phoniebox-bench-')
+    try:
+        config = load_config(data_dir)
+        mixer = SoftwareMixer.start(config=config).proxy()
+        audio = Audio.start(config=config, mixer=mixer).proxy()
+        backend = DummyBackend.start(config=config, audio=audio,
+                                     media_dir=data_dir,
+                                     tracks=tracks).proxy()
+        core = Core.start(config=config, mixer=mixer, backends=[backend],
+                          audio=audio).proxy()
+        frontend = PhonieboxFrontend.start(config=config, core=core).proxy()
+
+        core.tracklist.add(uris=DummyBackend.uris(tracks)).get()
+        core.playback.play().get()
+        frontend.wait_for_gpios().get()
+
+        started = monotonic()
+        durations, cpu_times, executor = replay(core, frontend, session,
+                                                rounds, interval)
+        duration = monotonic() - started
+        stages = frontend.get_latency_stats().get()
+    finally:
+        pykka.ActorRegistry.stop_all()
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    return {
+        'python': platform.python_version(),
+        'mopidy': version('Mopidy'),
+        'pykka': version('pykka'),
+        'gpiozero': version('gpiozero'),
+        'mopidy_phoniebox': version('Mopidy-Phoniebox'),
+        'params': {
+            'session': list(session),
+            'rounds': rounds,
+            'interval_ms': interval,
+            'tracks': tracks,
+        },
+        'presses': sum(len(values) for values in durations.values()),
+        'duration_s': duration,
+        'dropped': executor.dropped,
+        'controls_ms': dict(
+            (fn_type, summarize(durations[fn_type], cpu_times[fn_type]))
+            for fn_type in durations),
+        'stages_ms': stages,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--rounds', type=int, default=5,
+                        help='number of session replays (default: 5)')
+    parser.add_argument('--session', default=','.join(SESSION),
+                        help='comma separated function types to press '
+                        + '(default: {})'.format(','.join(SESSION)))
+    parser.add_argument('--interval', type=float, default=100,
+                        help='pause between presses in ms (default: 100)')
+    parser.add_argument('--tracks', type=int, default=10,
+                        help='number of tracks in the tracklist '
+                        + '(default: 10)')
+    parser.add_argument('--output', help='write the JSON results to a file')
+    args = parser.parse_args()
+
+    fn_types = dict((fn_type, gpio) for gpio, fn_type in GPIOS)
+    session = [fn_type.strip() for fn_type in args.session.split(',')]
+    unknown = [fn_type for fn_type in session if fn_type not in fn_types]
+    if unknown:
+        parser.error('unknown function types: {}'.format(', '.join(unknown)))
+
+    logging.basicConfig(level=logging.WARNING)
+    result = run(session, args.rounds, args.interval, args.tracks)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2, sort_keys=True)
+    else:
+        json.dump(result, sys.stdout, indent=2, sort_keys=True)
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+#
+#  Copyright 2019 Thomas Wunschel (https://github.com/wuschi)
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+"""
+Benchmarks the parsing of function config values.
+
+Generates a config with `--values` function values, of which `--distinct`
+are different, and parses it with the former `literal_eval` based parser,
+with the tokenizer alone, with the tokenizer and an empty cache, as on
+startup, and with a warm cache, as on a config reload. Prints the results
+as JSON.
+
+Usage::
+
+    python -m benchmarks.functionconfig [--values N] [--distinct N]
+                                        [--rounds N] [--output FILE]
+"""
+from __future__ import division, print_function, unicode_literals
+
+import argparse
+import json
+import platform
+import sys
+from ast import literal_eval
+
+from mopidy_phoniebox import functionconfig
+from mopidy_phoniebox.compat import monotonic
+from mopidy_phoniebox.functionconfig import Tokenizer, parse_function_config
+
+TEMPLATES = (
+    "play_pause",
+    "vol_up,vol_step={:d}",
+    "seek_fwd, seconds = {:d}",
+    "radio,station='station {:d}',volume={:d},fade=0.5",
+)
+
+
+def legacy_parse(val):
+    """
+    The parser before the tokenizer: splits on `,` and `=` and evaluates
+    every value with `literal_eval`.
+    """
+    arr = val.split(',')
+    fn_type = arr[0].strip()
+    if fn_type == '':
+        raise ValueError("empty fn_type")
+    return fn_type, dict((k.strip(), literal_eval(v.strip())) for k, v in
+                         (pair.split('=') for pair in arr[1:]))
+
+
+def uncached_parse(val):
+    fn_type, fn_args = Tokenizer(val).parse()
+    return fn_type, dict(fn_args)
+
+
+def tokenizer_parse(val):
+    fn_type, fn_args = parse_function_config(val)
+    return fn_type, dict(fn_args)
+
+
+def generate(values, distinct):
+    """
+    Returns `values` function config values, `distinct` of them different.
+    """
+    result = []
+    for index in range(values):
+        key = index % distinct
+        template = TEMPLATES[key % len(TEMPLATES)]
+        result.append(template.format(key % 100 + 1, key))
+    return result
+
+
+def measure(parse, values, rounds, clear):
+    """
+    Returns the best time of `rounds` passes over `values` in seconds.
+    """
+    best = None
+    for _ in range(rounds):
+        if clear:
+            functionconfig._cache.clear()
+        started = monotonic()
+        for val in values:
+            parse(val)
+        duration = monotonic() - started
+        best = duration if best is None else min(best, duration)
+    return best
+
+
+def run(values, distinct, rounds):
+    """
+    Runs the benchmark and returns the results as dict.
+    """
+    config = generate(values, distinct)
+    for val in set(config):
+        if legacy_parse(val) != tokenizer_parse(val):
+            raise AssertionError("parsers disagree on {!r}".format(val))
+
+    durations = {
+        'legacy': measure(legacy_parse, config, rounds, True),
+        'tokenizer_uncached': measure(uncached_parse, config, rounds, True),
+        'tokenizer_cold': measure(tokenizer_parse, config, rounds, True),
+        'tokenizer_cached': measure(tokenizer_parse, config, rounds, False),
+    }
+    return {
+        'python': platform.python_version(),
+        'params': {
+            'values': values,
+            'distinct': distinct,
+            'rounds': rounds,
+        },
+        'total_ms': dict((name, duration * 1000)
+                         for name, duration in durations.items()),
+        'per_value_us': dict((name, duration * 1e6 / values)
+                             for name, duration in durations.items()),
+        'speedup': dict((name, durations['legacy'] / duration)
+                        for name, duration in durations.items()
+                        if name != 'legacy'),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--values', type=int, default=10000,
+                        help='number of function values (default: 10000)')
+    parser.add_argument('--distinct', type=int, default=1000,
+                        help='number of different values (default: 1000)')
+    parser.add_argument('--rounds', type=int, default=5,
+                        help='passes per parser, the best one counts '
+                        + '(default: 5)')
+    parser.add_argument('--output', help='write the JSON results to a file')
+    args = parser.parse_args()
+
+    result = run(args.values, args.distinct, args.rounds)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2, sort_keys=True)
+    else:
+        json.dump(result, sys.stdout, indent=2, sort_keys=True)
+        print()
+
+
+if __name__ == '__main__':
+    main()
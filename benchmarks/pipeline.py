@@ -0,0 +1,254 @@
+#
+#  Copyright 2019 Thomas Wunschel (https://github.com/wuschi)
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+"""
+Benchmarks the button to control pipeline on gpiozero's MockFactory.
+
+Drives press, release and hold edges through a real :class:`GpioController`
+with real :class:`PhonieboxControls` against a :class:`FakeCore` with a
+configurable per-call latency and prints the results as JSON.
+
+Usage::
+
+    python -m benchmarks.pipeline [--presses N] [--holds N] [--latency MS]
+                                  [--buttons N] [--queue-size N]
+                                  [--interval MS] [--engine ENGINE]
+                                  [--output FILE]
+"""
+from __future__ import division, print_function, unicode_literals
+
+import argparse
+import json
+import logging
+import platform
+import sys
+import threading
+import time
+
+from gpiozero import Device
+from gpiozero.pins.mock import MockFactory
+
+import pkg_resources
+
+from mopidy_phoniebox import FunctionConfig, GpioConfig
+from mopidy_phoniebox.compat import monotonic
+from mopidy_phoniebox.controls import PhonieboxControls
+from mopidy_phoniebox.executor import CommandExecutor
+from mopidy_phoniebox.fakecore import FakeCore
+from mopidy_phoniebox.functions import command_priority
+from mopidy_phoniebox.gpiocontroller import GpioController
+from mopidy_phoniebox.latency import DISPATCH, Histogram, LatencyStats
+
+
+FN_TYPES = ('play_pause', 'next', 'prev', 'cdprev', 'vol_up', 'vol_down',
+            'mute', 'seek_fwd', 'seek_bwd')
+
+# fine grained buckets from 10us to 10s
+BUCKETS = tuple(round(0.01 * 1.25 ** i, 3) for i in range(63))
+
+FIRST_PIN = 2
+HOLD_PIN = 27
+
+
+def build_config(buttons, hold_time, engine='gpiozero'):
+    """
+    Returns a phoniebox config with `buttons` press buttons cycling through
+    the function types and one hold-repeat volume button.
+    """
+    config = {'input_engine': engine}
+    for index in range(buttons):
+        gpio = FIRST_PIN + index
+        config['gpio{:d}'.format(gpio)] = GpioConfig().deserialize(
+            'pull_up,none')
+        config['gpio{:d}.when_pressed'.format(gpio)] = \
+            FunctionConfig().deserialize(FN_TYPES[index % len(FN_TYPES)])
+    config['gpio{:d}'.format(HOLD_PIN)] = GpioConfig().deserialize(
+        'pull_up,none,{},true'.format(hold_time))
+    config['gpio{:d}.when_held'.format(HOLD_PIN)] = \
+        FunctionConfig().deserialize('vol_up,vol_step=1')
+    return config
+
+
+def percentiles(histograms):
+    """
+    Returns p50 and p99 of the merged histograms in milliseconds.
+    """
+    merged = Histogram(BUCKETS)
+    for histogram in histograms:
+        for index, count in enumerate(histogram.counts):
+            merged.counts[index] += count
+        merged.count += histogram.count
+        merged.total += histogram.total
+        merged.max = max(merged.max, histogram.max)
+    return {
+        'count': merged.count,
+        'p50': merged.percentile(50),
+        'p99': merged.percentile(99),
+        'max': merged.max,
+    }
+
+
+def version(name):
+    try:
+        return pkg_resources.get_distribution(name).version
+    except pkg_resources.DistributionNotFound:
+        return None
+
+
+def run(presses, holds, hold_time, hold_duration, latency, buttons,
+        queue_size, interval=0, engine='gpiozero'):
+    """
+    Runs the benchmark and returns the results as dict.
+    """
+    Device.pin_factory = MockFactory()
+    threads_before = threading.active_count()
+
+    core = FakeCore(latency=latency / 1000.0)
+    controls = PhonieboxControls(core)
+    core.listener = controls.state
+    executor = CommandExecutor(max_queued=queue_size,
+                               priority=command_priority)
+    executor.latency = LatencyStats(BUCKETS)
+    controller = GpioController(build_config(buttons, hold_time, engine),
+                                controls, executor)
+    threads_setup = threading.active_count()
+    threads_peak = threads_setup
+
+    pins = [Device.pin_factory.pin(FIRST_PIN + index)
+            for index in range(buttons)]
+    edge_costs = Histogram(BUCKETS)
+    edges = 0
+    started = monotonic()
+    for press in range(presses):
+        pin = pins[press % buttons]
+        for drive in (pin.drive_low, pin.drive_high):
+            before = monotonic()
+            drive()
+            edge_costs.add((monotonic() - before) * 1000)
+            edges += 1
+        if interval:
+            time.sleep(interval / 1000.0)
+        if press % 64 == 0:
+            pin.clear_states()
+            threads_peak = max(threads_peak, threading.active_count())
+    press_duration = monotonic() - started
+
+    hold_pin = Device.pin_factory.pin(HOLD_PIN)
+    for _ in range(holds):
+        hold_pin.drive_low()
+        time.sleep(hold_duration)
+        threads_peak = max(threads_peak, threading.active_count())
+        hold_pin.drive_high()
+        edges += 2
+
+    if controller.multiplexer is not None:
+        controller.multiplexer.sync(10)
+    executor.join()
+    controls.volume_coalescer.wait(10)
+    drained = monotonic() - started
+
+    stats = executor.latency
+    dispatch = [histogram for (fn_type, stage), histogram
+                in stats.histograms.items() if stage == DISPATCH]
+    per_fn_type = dict(
+        (fn_type, percentiles([histogram]))
+        for (fn_type, stage), histogram in stats.histograms.items()
+        if stage == DISPATCH)
+    result = {
+        'python': platform.python_version(),
+        'gpiozero': version('gpiozero'),
+        'pykka': version('pykka'),
+        'mopidy_phoniebox': version('Mopidy-Phoniebox'),
+        'params': {
+            'presses': presses,
+            'holds': holds,
+            'hold_time_s': hold_time,
+            'hold_duration_s': hold_duration,
+            'latency_ms': latency,
+            'buttons': buttons,
+            'queue_size': queue_size,
+            'interval_ms': interval,
+            'engine': engine,
+        },
+        'edges': edges,
+        'press_phase_s': press_duration,
+        'events_per_sec': 2 * presses / press_duration
+        if press_duration > 0 else None,
+        'drain_s': drained,
+        'edge_callback_ms': percentiles([edge_costs]),
+        'dispatch_ms': percentiles(dispatch),
+        'dispatch_ms_per_fn_type': per_fn_type,
+        'dispatched': sum(histogram.count for histogram in dispatch),
+        'dropped': executor.dropped,
+        'repeats_merged': executor.stats()['merged'],
+        'repeats_shed': executor.stats()['shed'],
+        'repeats_cancelled': executor.stats()['cancelled'],
+        'core_calls': len(core.calls),
+        'mixer_writes': controls.volume_coalescer.writes,
+        'timers': controller.timer_stats(),
+        'threads': {
+            'before': threads_before,
+            'after_setup': threads_setup,
+            'peak': threads_peak,
+        },
+    }
+
+    controller.close()
+    controls.close()
+    core.stop()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--presses', type=int, default=2000,
+                        help='number of press/release cycles (default: 2000)')
+    parser.add_argument('--holds', type=int, default=5,
+                        help='number of holds of the hold-repeat button '
+                        + '(default: 5)')
+    parser.add_argument('--hold-time', type=float, default=0.02,
+                        help='hold time in seconds (default: 0.02)')
+    parser.add_argument('--hold-duration', type=float, default=0.2,
+                        help='duration of each hold in seconds '
+                        + '(default: 0.2)')
+    parser.add_argument('--latency', type=float, default=2,
+                        help='core latency per call in ms (default: 2)')
+    parser.add_argument('--buttons', type=int, default=9,
+                        help='number of press buttons (default: 9)')
+    parser.add_argument('--queue-size', type=int, default=16,
+                        help='command queue size (default: 16)')
+    parser.add_argument('--interval', type=float, default=0,
+                        help='pause between presses in ms (default: 0)')
+    parser.add_argument('--engine', choices=['gpiozero', 'epoll'],
+                        default='gpiozero',
+                        help='input engine (default: gpiozero)')
+    parser.add_argument('--output', help='write the JSON results to a file')
+    args = parser.parse_args()
+    # dropped commands are reported in the results, not logged per edge
+    logging.getLogger('mopidy_phoniebox').setLevel(logging.ERROR)
+
+    result = run(args.presses, args.holds, args.hold_time,
+                 args.hold_duration, args.latency, args.buttons,
+                 args.queue_size, args.interval, args.engine)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2, sort_keys=True)
+    else:
+        json.dump(result, sys.stdout, indent=2, sort_keys=True)
+        print()
+
+
+if __name__ == '__main__':
+    main()
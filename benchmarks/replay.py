@@ -0,0 +1,157 @@
+#
+#  Copyright 2019 Thomas Wunschel (https://github.com/wuschi)
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+"""
+Replays a recorded edge trace through a fresh controller.
+
+Loads the phoniebox section of a mopidy config, drives the edges of a trace
+written by `edge_trace_file` through gpiozero's MockFactory into a
+:class:`GpioController` with real :class:`PhonieboxControls` against a
+:class:`FakeCore`, and prints what the controls did as JSON. Without
+``--realtime`` the edges are replayed as fast as possible on virtual time,
+which makes the replay deterministic and measures the throughput.
+
+Usage::
+
+    python -m benchmarks.replay TRACE --config FILE [--realtime]
+                                [--speed FACTOR] [--latency MS]
+                                [--output FILE]
+"""
+from __future__ import division, print_function, unicode_literals
+
+import argparse
+import collections
+import json
+import logging
+import sys
+
+from gpiozero import Device
+from gpiozero.pins.mock import MockFactory
+
+from mopidy import config as config_lib
+
+from mopidy_phoniebox import Extension
+from mopidy_phoniebox.compat import monotonic, process_time
+from mopidy_phoniebox.controls import PhonieboxControls
+from mopidy_phoniebox.fakecore import FakeCore
+from mopidy_phoniebox.gpiocontroller import GpioController
+from mopidy_phoniebox.latency import DISPATCH
+from mopidy_phoniebox.scheduler import ManualScheduler
+from mopidy_phoniebox.trace import TraceReplayer, read_trace
+
+
+def load_config(path):
+    """
+    Loads the phoniebox section of the mopidy config file `path`.
+    """
+    extension = Extension()
+    config, errors = config_lib.load([path],
+                                     [extension.get_config_schema()],
+                                     [extension.get_default_config()],
+                                     [])
+    if errors.get('phoniebox'):
+        raise ValueError('invalid config: {}'.format(errors['phoniebox']))
+    config = dict(config['phoniebox'])
+    # the replay must not overwrite the trace, and virtual time needs the
+    # gpiozero engine
+    config['edge_trace_file'] = None
+    config['input_engine'] = 'gpiozero'
+    return config
+
+
+def run(records, config, realtime=False, speed=1.0, latency=0):
+    """
+    Replays `records` and returns the results as dict.
+    """
+    factory = MockFactory()
+    Device.pin_factory = factory
+    core = FakeCore(latency=latency / 1000.0)
+    controls = PhonieboxControls(core)
+    core.listener = controls.state
+    scheduler = None
+    if not realtime and records:
+        scheduler = ManualScheduler(records[0][2])
+    controller = GpioController(config, controls, scheduler=scheduler)
+
+    started = monotonic()
+    cpu_started = process_time()
+    edges = TraceReplayer(records, factory).replay(scheduler, speed)
+    replayed = monotonic() - started
+    controller.executor.join()
+    controls.volume_coalescer.wait(10)
+    controls.seek_accumulator.flush()
+    drained = monotonic() - started
+    cpu = process_time() - cpu_started
+
+    dispatched = dict(
+        (fn_type, histogram.count)
+        for (fn_type, stage), histogram
+        in controller.executor.latency.histograms.items()
+        if stage == DISPATCH)
+    result = {
+        'params': {
+            'realtime': realtime,
+            'speed': speed,
+            'latency_ms': latency,
+        },
+        'edges': edges,
+        'trace_s': records[-1][2] - records[0][2] if records else 0,
+        'replay_s': replayed,
+        'drain_s': drained,
+        'cpu_s': cpu,
+        'edges_per_sec': edges / replayed if replayed > 0 else None,
+        'dispatched': dispatched,
+        'dropped': controller.executor.dropped,
+        'core_calls': dict(collections.Counter(
+            name for name, _, _ in core.calls)),
+        'mixer_writes': controls.volume_coalescer.writes,
+        'debounce': controller.debounce_stats(),
+        'timers': controller.timer_stats(),
+    }
+
+    controller.close()
+    controls.close()
+    core.stop()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('trace', help='the edge trace file')
+    parser.add_argument('--config', required=True,
+                        help='the mopidy config with the phoniebox section')
+    parser.add_argument('--realtime', action='store_true',
+                        help='replay with the delays of the trace')
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help='speed factor of a real time replay '
+                        + '(default: 1.0)')
+    parser.add_argument('--latency', type=float, default=0,
+                        help='core latency per call in ms (default: 0)')
+    parser.add_argument('--output', help='write the JSON results to a file')
+    args = parser.parse_args()
+    logging.getLogger('mopidy_phoniebox').setLevel(logging.ERROR)
+
+    result = run(read_trace(args.trace), load_config(args.config),
+                 args.realtime, args.speed, args.latency)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2, sort_keys=True)
+    else:
+        json.dump(result, sys.stdout, indent=2, sort_keys=True)
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+#
+#  Copyright 2019 Thomas Wunschel (https://github.com/wuschi)
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+"""
+Benchmarks the startup of the phoniebox frontend.
+
+Starts a fresh python process per run, so every import is cold, imports the
+frontend, creates and starts a :class:`PhonieboxFrontend` against a
+:class:`FakeCore` on gpiozero's MockFactory and measures how long mopidy is
+blocked by it and how long it takes until the gpios are ready. The pins were
+opened in the constructor before, so mopidy was blocked until they were
+ready. Prints the medians of all runs as JSON.
+
+Usage::
+
+    python -m benchmarks.startup [--runs N] [--buttons N] [--output FILE]
+"""
+from __future__ import division, print_function, unicode_literals
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+
+
+CHILD = '''
+import json
+import sys
+from timeit import default_timer as timer
+
+buttons = int(sys.argv[1])
+started = timer()
+from mopidy_phoniebox.frontend import PhonieboxFrontend
+imported = timer()
+gpiozero_on_import = 'gpiozero' in sys.modules
+
+from mopidy_phoniebox import FunctionConfig, GpioConfig
+from mopidy_phoniebox.fakecore import FakeCore
+
+config = {'idle_time_before_shutdown': 0}
+for gpio in range(2, 2 + buttons):
+    config['gpio{:d}'.format(gpio)] = GpioConfig().deserialize('pull_up')
+    config['gpio{:d}.when_pressed'.format(gpio)] = \\
+        FunctionConfig().deserialize('play_pause')
+core = FakeCore()
+
+constructing = timer()
+frontend = PhonieboxFrontend({'phoniebox': config}, core)
+frontend.on_start()
+running = timer()
+frontend.wait_for_gpios()
+ready = timer()
+
+json.dump({
+    'import_ms': (imported - started) * 1000,
+    'start_ms': (running - constructing) * 1000,
+    'gpios_ready_ms': (ready - constructing) * 1000,
+    'gpiozero_on_import': gpiozero_on_import,
+    'gpiozero_imported': 'gpiozero' in sys.modules,
+    'gpios': sum(1 for gpio in frontend.gpio_controller.gpios
+                 if gpio is not None),
+}, sys.stdout)
+frontend.on_stop()
+core.stop()
+'''
+
+
+def median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    if len(values) % 2:
+        return values[middle]
+    return (values[middle - 1] + values[middle]) / 2
+
+
+def measure(buttons):
+    """
+    Starts the frontend with `buttons` buttons in a fresh process and returns
+    the measurements as dict.
+    """
+    env = dict(os.environ, GPIOZERO_PIN_FACTORY='mock')
+    output = subprocess.check_output(
+        [sys.executable, '-c', CHILD, str(buttons)], env=env)
+    return json.loads(output.decode('utf-8'))
+
+
+def run(runs, buttons):
+    """
+    Runs the benchmark with and without buttons and returns the results as
+    dict.
+    """
+    result = {
+        'python': platform.python_version(),
+        'params': {
+            'runs': runs,
+            'buttons': buttons,
+        },
+    }
+    for name, count in (('no_gpios', 0), ('buttons', buttons)):
+        samples = [measure(count) for _ in range(runs)]
+        summary = dict(
+            (key, median([sample[key] for sample in samples]))
+            for key in ('import_ms', 'start_ms', 'gpios_ready_ms'))
+        # mopidy waited for the gpios when they were opened in the
+        # constructor
+        summary['saved_ms'] = summary['gpios_ready_ms'] - summary['start_ms']
+        for key in ('gpiozero_on_import', 'gpiozero_imported', 'gpios'):
+            summary[key] = samples[-1][key]
+        result[name] = summary
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--runs', type=int, default=5,
+                        help='number of cold starts per case (default: 5)')
+    parser.add_argument('--buttons', type=int, default=9,
+                        help='number of configured buttons (default: 9)')
+    parser.add_argument('--output', help='write the JSON results to a file')
+    args = parser.parse_args()
+
+    result = run(args.runs, args.buttons)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2, sort_keys=True)
+    else:
+        json.dump(result, sys.stdout, indent=2, sort_keys=True)
+        print()
+
+
+if __name__ == '__main__':
+    main()
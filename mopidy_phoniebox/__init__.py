@@ -20,8 +20,9 @@ import os
 
 from mopidy import config, ext
 
-from .functionconfig import FunctionConfig
-from .gpioconfig import GpioConfig
+from .functionconfig import FunctionConfig  # noqa: F401
+from .gpioconfig import GpioConfig  # noqa: F401
+from .schema import PhonieboxConfigSchema
 
 
 __version__ = '0.1.0-dev'
@@ -46,18 +47,33 @@ class Extension(ext.Extension):
 
     def get_config_schema(self):
         """
-        Returns the configuration schema of this extension.
+        Returns the configuration schema of this extension. The keys of the
+        gpios, chords and encoders are accepted for any number, see
+        :class:`PhonieboxConfigSchema`.
         """
-        schema = super(Extension, self).get_config_schema()
+        schema = PhonieboxConfigSchema(self.ext_name)
+        schema['enabled'] = config.Boolean()
         schema['idle_time_before_shutdown'] = config.Integer()
-        for gpio in range(28):
-            schema['gpio{:d}'.format(gpio)] = GpioConfig()
-            schema['gpio{:d}.when_pressed'.format(gpio)] = FunctionConfig()
-            schema['gpio{:d}.when_released'.format(gpio)] = FunctionConfig()
-            schema['gpio{:d}.when_held'.format(gpio)] = FunctionConfig()
+        schema['latency_log_interval'] = config.Integer(minimum=0)
+        schema['state_max_age'] = config.Integer(minimum=0)
+        schema['input_engine'] = config.String(
+            choices=['gpiozero', 'epoll'])
+        schema['chord_grace_time'] = config.Integer(minimum=0)
+        schema['multi_tap_window'] = config.Integer(minimum=1)
+        schema['edge_trace_file'] = config.Path(optional=True)
+        schema['edge_trace_records'] = config.Integer(minimum=1)
+        schema['config_files'] = config.List(optional=True)
+        schema['config_watch_interval'] = config.Integer(minimum=0)
 
         return schema
 
+    def get_command(self):
+        """
+        Returns the `mopidy phoniebox` command.
+        """
+        from .commands import PhonieboxCommand
+        return PhonieboxCommand()
+
     def setup(self, registry):
         """
         Registers this extension in mopidy.
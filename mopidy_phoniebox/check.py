@@ -0,0 +1,272 @@
+#
+#  Copyright 2019 Thomas Wunschel (https://github.com/wuschi)
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+import logging
+from collections import namedtuple
+
+from . import latency
+from .controls import PhonieboxControls
+from .executor import CommandExecutor
+from .fakecore import FakeCore
+from .functions import command_priority
+from .gpiocontroller import GpioController, TAP_ACTIONS, chord_gpios
+from .scheduler import ManualScheduler
+
+# the virtual time between two simulated actions in seconds, longer than
+# the tap and chord windows
+SETTLE_TIME = 2.0
+SETTLE_TIMEOUT = 10
+
+
+class ActionResult(namedtuple("ActionResult", ("name", "fn_type",
+                                               "dispatched", "dispatch_ms",
+                                               "ack_ms", "calls"))):
+    """
+    The outcome of a simulated action: its config key and function type,
+    the function types dispatched by it, their highest dispatch and ack
+    latency in milliseconds and the names of the resulting core calls.
+    """
+    __slots__ = ()
+
+    @property
+    def ok(self):
+        return self.fn_type in self.dispatched
+
+
+class ErrorCollector(logging.Handler):
+    """
+    Collects the messages of the errors logged while checking.
+    """
+
+    def __init__(self):
+        logging.Handler.__init__(self, logging.ERROR)
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+class ConfigCheck:
+    """
+    Dry-runs a phoniebox config on gpiozero's MockFactory.
+
+    Sets up a :class:`GpioController` with real :class:`PhonieboxControls`
+    against a :class:`FakeCore` and collects the errors which are otherwise
+    only logged at runtime, e.g. conflicting assignments. Then simulates
+    one press, release, hold, multi-tap, chord or rotation per configured
+    function on virtual time and records which functions were dispatched,
+    with which latency and with which core calls. `shutdown` is never
+    executed.
+
+    The check always uses the gpiozero input engine and does not record
+    edge traces.
+
+    :param config: the phoniebox config
+    :param latency: the latency of the fake core per call in seconds
+    """
+    logger = logging.getLogger(__name__)
+
+    def __init__(self, config, latency=0):
+        self.config = dict(config, input_engine='gpiozero',
+                           edge_trace_file=None)
+        self.latency = latency
+        self.errors = []
+        self.warnings = []
+        self.results = []
+        self.scheduler = None
+        self.controller = None
+
+    def run(self):
+        """
+        Runs the check.
+
+        :return: True if there were no errors and every function was
+                 dispatched by its action
+        """
+        from gpiozero import Device
+        from gpiozero.pins.mock import MockFactory
+
+        previous = Device.pin_factory
+        Device.pin_factory = MockFactory()
+        collector = ErrorCollector()
+        logging.getLogger('mopidy_phoniebox').addHandler(collector)
+        core = FakeCore(self.latency)
+        controls = PhonieboxControls(core)
+        controls.shutdown = self.shutdown
+        core.listener = controls.state
+        self.scheduler = ManualScheduler()
+        executor = CommandExecutor(priority=command_priority)
+        try:
+            self.controller = GpioController(self.config, controls, executor,
+                                             self.scheduler)
+            self.check_unused()
+            for name, fn_type, simulate in self.actions():
+                self.results.append(self.simulate(
+                    name, fn_type, simulate, core, controls))
+        finally:
+            logging.getLogger('mopidy_phoniebox').removeHandler(collector)
+            if self.controller is not None:
+                self.controller.close()
+            else:
+                executor.stop()
+            controls.close()
+            core.stop()
+            Device.pin_factory.close()
+            Device.pin_factory = previous
+        self.errors.extend(collector.messages)
+        return not self.errors and all(result.ok for result in self.results)
+
+    def shutdown(self):
+        """
+        Replaces the shutdown of the controls, so the check does not power
+        off the machine.
+        """
+        self.logger.info("ConfigCheck.shutdown() - not shutting down")
+        latency.mark(latency.DECISION)
+        return 0
+
+    def check_unused(self):
+        """
+        Warns about gpios which are set up but have no function.
+        """
+        chorded = chord_gpios(self.config)
+        pins = self.controller.pin_map()
+        for gpio in pins:
+            pin = pins[gpio]
+            if (pin.config is not None and not pin.actions
+                    and gpio not in chorded):
+                self.warnings.append(
+                    "gpio{:d} is configured but has no function".format(gpio))
+
+    def actions(self):
+        """
+        Yields the config key, the function type and the simulation of every
+        function which was assigned.
+        """
+        pins = self.controller.pin_map()
+        for gpio in pins:
+            btn = self.controller.gpios.get(gpio)
+            if btn is None:
+                continue
+            for action, fn_conf in pins[gpio].actions:
+                simulate = self.simulation(btn, action)
+                yield ("gpio{:d}.{}".format(gpio, action),
+                       fn_conf.fn_type.strip(), simulate)
+
+        chords = self.controller.chords
+        for chord in sorted(chords.chords.values() if chords else (),
+                            key=str):
+            buttons = [self.controller.gpios[gpio] for gpio in chord.gpios]
+            yield str(chord), chord.fn_type, lambda: self.chord(buttons)
+
+        for key, (encoder, accumulator) in sorted(
+                self.controller.encoders.items()):
+            for action, fn, steps in (
+                    ('when_rotated_clockwise', accumulator.clockwise, 1),
+                    ('when_rotated_counter_clockwise',
+                     accumulator.counter_clockwise, -1)):
+                if fn is None:
+                    continue
+                yield ("{}.{}".format(key, action), fn[0],
+                       lambda encoder=encoder, steps=steps:
+                       self.rotate(encoder, steps))
+
+    def simulation(self, btn, action):
+        """
+        Returns the simulation of a button action.
+        """
+        if action == 'when_held':
+            return lambda: self.press(btn, btn.hold_time + 0.01)
+        if action in TAP_ACTIONS:
+            return lambda: self.tap(btn, TAP_ACTIONS[action])
+        return lambda: self.press(btn, self.short_press(btn))
+
+    def short_press(self, btn):
+        """
+        Returns a press duration in seconds, which is longer than the
+        debounce window and shorter than the hold time of a button.
+        """
+        bounce = btn.debouncer.maximum or 0
+        return min(max(0.05, 2 * bounce), float(btn.hold_time) / 2)
+
+    def wait(self, seconds):
+        self.scheduler.advance(self.scheduler.clock() + seconds)
+
+    def drive(self, btn, active):
+        pin = btn.device.pin
+        if active == bool(btn.active_value):
+            pin.drive_high()
+        else:
+            pin.drive_low()
+
+    def press(self, btn, duration):
+        self.drive(btn, True)
+        self.wait(duration)
+        self.drive(btn, False)
+
+    def tap(self, btn, taps):
+        duration = self.short_press(btn)
+        for _ in range(taps):
+            self.press(btn, duration)
+            self.wait(duration)
+
+    def chord(self, buttons):
+        duration = max(self.short_press(btn) for btn in buttons)
+        for btn in buttons:
+            self.drive(btn, True)
+        self.wait(duration)
+        for btn in buttons:
+            self.drive(btn, False)
+
+    def rotate(self, encoder, steps):
+        a, b = encoder.a.pin, encoder.b.pin
+        if steps < 0:
+            a, b = b, a
+        a.drive_low()
+        b.drive_low()
+        a.drive_high()
+        b.drive_high()
+
+    def simulate(self, name, fn_type, simulate, core, controls):
+        """
+        Runs a simulation and waits until its commands were executed.
+
+        :return: the :class:`ActionResult`
+        """
+        executor = self.controller.executor
+        executor.latency = latency.LatencyStats()
+        calls = len(core.calls)
+        simulate()
+        self.wait(SETTLE_TIME)
+        executor.join()
+        controls.volume_coalescer.wait(SETTLE_TIMEOUT)
+        controls.seek_accumulator.flush()
+        executor.latency.stop()
+
+        snapshot = executor.latency.snapshot()
+        return ActionResult(
+            name, fn_type, sorted(snapshot),
+            max_latency(snapshot, latency.DISPATCH),
+            max_latency(snapshot, latency.ACK),
+            [call[0] for call in core.calls[calls:]])
+
+
+def max_latency(snapshot, stage):
+    """
+    Returns the highest latency of a stage in a latency snapshot or None.
+    """
+    latencies = [stages[stage]['max'] for stages in snapshot.values()
+                 if stage in stages]
+    return max(latencies) if latencies else None
@@ -0,0 +1,177 @@
+#
+#  Copyright 2019 Thomas Wunschel (https://github.com/wuschi)
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+import logging
+import threading
+from functools import partial
+
+
+class Chord:
+    """
+    A function assigned to pressing several buttons together.
+
+    :param gpios: the gpio numbers of the buttons
+    :param fn_type: the function type
+    :param fn: the compiled function
+    :param grace_time: the time in seconds in which all buttons have to be
+                       pressed
+    """
+
+    def __init__(self, gpios, fn_type, fn, grace_time):
+        self.gpios = tuple(sorted(set(gpios)))
+        self.mask = 0
+        for gpio in self.gpios:
+            self.mask |= 1 << gpio
+        self.fn_type = fn_type
+        self.fn = fn
+        self.grace_time = grace_time
+
+    def __repr__(self):
+        return 'chord.' + '+'.join('gpio{:d}'.format(g) for g in self.gpios)
+
+
+class ChordDetector:
+    """
+    Detects chords of buttons.
+
+    The pressed state of the chord buttons is kept in one bitmask, which is
+    updated on every edge and looked up in the table of chords. The single
+    button press of a chord button is held back for the grace window of its
+    chords: if the chord is completed within the window, the chord function
+    is executed instead, and the buttons of the chord are marked as held, so
+    their release and hold functions are suppressed until they are released.
+    Otherwise the press is executed when the window closes or the button is
+    released, whatever comes first.
+
+    :param scheduler: the scheduler running the grace windows
+    :param executor: the :class:`CommandExecutor`
+    """
+    logger = logging.getLogger(__name__)
+
+    def __init__(self, scheduler, executor):
+        self.scheduler = scheduler
+        self.executor = executor
+        self.lock = threading.Lock()
+        self.chords = {}
+        self.buttons = {}
+        self.grace_times = {}
+        self.pressed = 0
+        self.chorded = 0
+        self.pressed_at = {}
+        self.pending = {}
+
+    def add(self, chord):
+        """
+        Adds a chord.
+
+        :raises ValueError: if the chord is invalid or already assigned
+        """
+        if len(chord.gpios) < 2:
+            raise ValueError("{} needs at least two gpios".format(chord))
+        if chord.mask in self.chords:
+            raise ValueError("cannot assign {} to {}: already assigned"
+                             .format(chord.fn_type, chord))
+        self.chords[chord.mask] = chord
+        for gpio in chord.gpios:
+            self.grace_times[gpio] = max(self.grace_times.get(gpio, 0),
+                                         chord.grace_time)
+
+    def wrap(self, gpio, btn):
+        """
+        Routes the press, release and hold functions of the button through
+        the detector.
+        """
+        self.buttons[gpio] = btn
+        press, release, held = (btn.when_pressed, btn.when_released,
+                                btn.when_held)
+        btn.when_pressed = partial(self.on_pressed, gpio, press)
+        btn.when_released = partial(self.on_released, gpio, release)
+        if held is not None:
+            btn.when_held = partial(self.on_held, gpio, held)
+
+    def on_pressed(self, gpio, action):
+        bit = 1 << gpio
+        now = self.scheduler.clock()
+        fired = []
+        with self.lock:
+            self.pressed |= bit
+            self.pressed_at[gpio] = now
+            chord = self.chords.get(self.pressed)
+            if chord is not None and now - min(
+                    self.pressed_at[g] for g in chord.gpios) \
+                    <= chord.grace_time:
+                for g in chord.gpios:
+                    pending = self.pending.pop(g, None)
+                    if pending is not None:
+                        pending[0].cancel()
+                    self.buttons[g].was_held = True
+                self.chorded |= chord.mask
+                fired.append(chord)
+            elif action is not None:
+                token = object()
+                timer = self.scheduler.schedule(
+                    now + self.grace_times[gpio],
+                    partial(self.expired, gpio, token))
+                self.pending[gpio] = (timer, action, token)
+        for chord in fired:
+            self.logger.debug("%r pressed", chord)
+            self.executor.submit(chord.fn_type, chord.fn)
+
+    def expired(self, gpio, token):
+        with self.lock:
+            pending = self.pending.get(gpio)
+            if pending is None or pending[2] is not token:
+                return
+            del self.pending[gpio]
+        pending[1]()
+
+    def flush(self, gpio):
+        """
+        Executes the held back press of the button right away.
+        """
+        with self.lock:
+            pending = self.pending.pop(gpio, None)
+        if pending is not None:
+            pending[0].cancel()
+            pending[1]()
+
+    def close(self):
+        """
+        Cancels the open grace windows, their held back presses are dropped.
+        """
+        with self.lock:
+            pending = list(self.pending.values())
+            self.pending.clear()
+        for timer, _, _ in pending:
+            timer.cancel()
+
+    def on_released(self, gpio, action, btn):
+        bit = 1 << gpio
+        with self.lock:
+            self.pressed &= ~bit
+            self.chorded &= ~bit
+        self.flush(gpio)
+        if action is not None:
+            action(btn)
+        else:
+            btn.was_held = False
+
+    def on_held(self, gpio, action, btn):
+        with self.lock:
+            chorded = self.chorded & (1 << gpio)
+        if chorded:
+            return
+        self.flush(gpio)
+        action(btn)
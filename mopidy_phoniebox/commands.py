@@ -0,0 +1,84 @@
+#
+#  Copyright 2019 Thomas Wunschel (https://github.com/wuschi)
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+from __future__ import print_function, unicode_literals
+
+from mopidy import commands
+
+from .check import ConfigCheck
+
+
+class PhonieboxCommand(commands.Command):
+    """
+    The `mopidy phoniebox` command.
+    """
+    help = "Phoniebox tools."
+
+    def __init__(self):
+        super(PhonieboxCommand, self).__init__()
+        self.add_child('check', CheckCommand())
+
+
+class CheckCommand(commands.Command):
+    """
+    The `mopidy phoniebox check` command, which dry-runs the `[phoniebox]`
+    config with a :class:`ConfigCheck` and prints the problems found and
+    the dispatch latency of every configured function.
+    """
+    help = ("Check the phoniebox config by simulating every configured "
+            + "function on mock gpios.")
+
+    def __init__(self):
+        super(CheckCommand, self).__init__()
+        self.set(base_verbosity_level=-1)
+        self.add_argument('--latency', type=int, default=0,
+                          help='simulated latency of the core per call in '
+                          + 'ms (default: 0)')
+
+    def run(self, args, config):
+        check = ConfigCheck(config['phoniebox'],
+                            float(args.latency) / 1000)
+        ok = check.run()
+
+        for message in check.errors:
+            print("error: {}".format(message))
+        for message in check.warnings:
+            print("warning: {}".format(message))
+        for result in check.results:
+            print(format_result(result))
+        print("{:d} function(s), {:d} error(s), {:d} warning(s)".format(
+            len(check.results), len(check.errors), len(check.warnings)))
+        return 0 if ok else 1
+
+
+def format_result(result):
+    """
+    Formats an :class:`ActionResult` as line.
+    """
+    if not result.ok:
+        return "FAIL {} -> {}: not dispatched".format(result.name,
+                                                      result.fn_type)
+    line = "ok   {} -> {}: dispatch {}, ack {}".format(
+        result.name, result.fn_type, format_ms(result.dispatch_ms),
+        format_ms(result.ack_ms))
+    if result.calls:
+        line += " ({})".format(", ".join(result.calls))
+    return line
+
+
+def format_ms(value):
+    if value is None:
+        return "-"
+    return "{:.2f} ms".format(value)
@@ -0,0 +1,50 @@
+#
+#  Copyright 2019 Thomas Wunschel (https://github.com/wuschi)
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+try:
+    from queue import Empty, Full, Queue
+except ImportError:  # python 2.7
+    from Queue import Empty, Full, Queue
+
+try:
+    from time import monotonic
+except ImportError:  # python 2.7
+    from time import time as monotonic
+
+try:
+    from time import process_time
+except ImportError:  # python 2.7
+    from time import clock as process_time
+
+
+def iter_entry_points(group):
+    """
+    Returns the entry points of a group from `importlib.metadata`, or from
+    `pkg_resources` on pythons without it. Imported on demand, as reading
+    the metadata of all packages is slow.
+    """
+    try:
+        from importlib.metadata import entry_points
+    except ImportError:  # python < 3.8
+        import pkg_resources
+        return list(pkg_resources.iter_entry_points(group))
+    try:
+        return list(entry_points(group=group))
+    except TypeError:  # python < 3.10
+        return list(entry_points().get(group, ()))
+
+
+__all__ = ['Empty', 'Full', 'Queue', 'iter_entry_points', 'monotonic',
+           'process_time']
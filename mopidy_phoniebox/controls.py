@@ -18,21 +18,44 @@ import subprocess
 
 from mopidy.audio import PlaybackState
 
+from . import latency
+from .seek import SeekAccumulator
+from .statecache import StateCache
+from .volume import VolumeCoalescer
+
 
 class PhonieboxControls:
     """
     Phoniebox control functions.
+
+    The controls decide what to do based on the :class:`StateCache`, which is
+    kept up to date by core events, and only block on the core when the cache
+    is cold or stale. Volume changes are written to the mixer by a
+    :class:`VolumeCoalescer`, seeks are merged by a :class:`SeekAccumulator`.
     """
     logger = logging.getLogger(__name__)
 
-    def __init__(self, core):
+    def __init__(self, core, state=None):
         self.core = core
+        if state is None:
+            state = StateCache(core)
+        self.state = state
+        self.volume_coalescer = VolumeCoalescer(core, state)
+        self.seek_accumulator = SeekAccumulator(core, state)
+
+    def close(self):
+        """
+        Stops the background writers of the controls.
+        """
+        self.volume_coalescer.stop()
+        self.seek_accumulator.stop()
 
     def shutdown(self):
         """
         Executes the phoniebox shutdown
         """
         self.logger.info("PhonieboxControls.shutdown()")
+        latency.mark(latency.DECISION)
         return_code = subprocess.call(["sudo", "/sbin/poweroff"])
         if return_code > 0:
             self.logger.error("error shutting down phoniebox: %s", return_code)
@@ -42,15 +65,23 @@ class PhonieboxControls:
         """
         Toggle play/pause.
         """
-        state = self.core.playback.get_state().get()
+        state = self.state.get(StateCache.PLAYBACK_STATE)
         self.logger.info(
                 "PhonieboxControls.play_pause() - state {}".format(state))
+        latency.mark(latency.DECISION)
+        # the state event of the call may arrive after the next press, so
+        # the expected state is written through, or if it cannot be known
+        # fetched again from the core, where it is queued behind the call
         if state == PlaybackState.PLAYING:
-            self.core.playback.pause()
+            latency.acknowledge(self.core.playback.pause())
+            self.state.update(StateCache.PLAYBACK_STATE, PlaybackState.PAUSED)
         elif state == PlaybackState.PAUSED:
-            self.core.playback.resume()
+            latency.acknowledge(self.core.playback.resume())
+            self.state.update(StateCache.PLAYBACK_STATE,
+                              PlaybackState.PLAYING)
         else:
-            self.core.playback.play()
+            self.state.invalidate(StateCache.PLAYBACK_STATE)
+            latency.acknowledge(self.core.playback.play())
 
     def cd_previous(self):
         """
@@ -61,24 +92,26 @@ class PhonieboxControls:
         If no track or the first track is played, jump to the last track of
         the tracklist.
         """
-        tl_len = self.core.tracklist.get_length().get()
-        track = self.core.playback.get_current_tl_track().get()
-        pos = self.core.playback.get_time_position().get()
-        if track is None:
-            tlid = 0
-        else:
-            tlid = track.tlid
+        tracklist, track = self.state.get_all(
+            StateCache.TRACKLIST, StateCache.CURRENT_TL_TRACK)
+        pos = self.state.time_position()
+        index = self.track_index(tracklist, track)
         self.logger.info(
             ("PhonieboxControls.cd_previous() "
-             + "- track {} of {}, position {}").format(tlid, tl_len, pos))
-        if tl_len == 0:
+             + "- track {} of {}, position {}").format(
+                 index, len(tracklist), pos))
+        latency.mark(latency.DECISION)
+        if len(tracklist) == 0:
             return
-        if tlid == 0 or (tlid == 1 and pos < 3000):
-            self.core.playback.play(tlid=tl_len)
-        elif tlid > 1 and pos < 3000:
-            self.core.playback.previous()
+        if index is None or (index == 0 and pos < 3000):
+            self.play_track(tracklist, len(tracklist) - 1)
+        elif pos < 3000:
+            self.change_track(self.core.playback.previous(),
+                              tracklist.tl_track(index - 1))
         else:
-            self.core.playback.seek(0)
+            future = self.core.playback.seek(0)
+            self.state.seeked(0)
+            latency.acknowledge(future)
 
     def previous(self):
         """
@@ -87,21 +120,20 @@ class PhonieboxControls:
         If no track or the first track is played, jump to the last track of
         the tracklist.
         """
-        tl_len = self.core.tracklist.get_length().get()
-        track = self.core.playback.get_current_tl_track().get()
-        if track is None:
-            tlid = 0
-        else:
-            tlid = track.tlid
+        tracklist, track = self.state.get_all(
+            StateCache.TRACKLIST, StateCache.CURRENT_TL_TRACK)
+        index = self.track_index(tracklist, track)
         self.logger.info(
             "PhonieboxControls.previous() - track {} of {}".format(
-                tlid, tl_len))
-        if tl_len == 0:
+                index, len(tracklist)))
+        latency.mark(latency.DECISION)
+        if len(tracklist) == 0:
             return
-        if tlid > 1:
-            self.core.playback.previous()
+        if index is None or index == 0:
+            self.play_track(tracklist, len(tracklist) - 1)
         else:
-            self.core.playback.play(tlid=tl_len)
+            self.change_track(self.core.playback.previous(),
+                              tracklist.tl_track(index - 1))
 
     def next(self):
         """
@@ -110,81 +142,95 @@ class PhonieboxControls:
         If no track or the last track is played, jump to the first track of
         the tracklist.
         """
-        tl_len = self.core.tracklist.get_length().get()
-        track = self.core.playback.get_current_tl_track().get()
-        if track is None:
-            tlid = 0
-        else:
-            tlid = track.tlid
+        tracklist, track = self.state.get_all(
+            StateCache.TRACKLIST, StateCache.CURRENT_TL_TRACK)
+        index = self.track_index(tracklist, track)
         self.logger.info(
-            "PhonieboxControls.next() - track {} of {}".format(tlid, tl_len))
-        if tl_len == 0:
+            "PhonieboxControls.next() - track {} of {}".format(
+                index, len(tracklist)))
+        latency.mark(latency.DECISION)
+        if len(tracklist) == 0:
             return
-        if tlid == 0 or tlid >= tl_len:
-            self.core.playback.play(tlid=1)
+        if index is None or index == len(tracklist) - 1:
+            self.play_track(tracklist, 0)
         else:
-            self.core.playback.next()
+            self.change_track(self.core.playback.next(),
+                              tracklist.tl_track(index + 1))
+
+    def play_track(self, tracklist, position):
+        """
+        Plays the track at the given position of the tracklist.
+        """
+        tl_track = tracklist.tl_track(position)
+        future = self.core.playback.play(tlid=tl_track.tlid)
+        self.state.update(StateCache.PLAYBACK_STATE, PlaybackState.PLAYING)
+        self.change_track(future, tl_track)
+
+    def change_track(self, future, tl_track):
+        """
+        Acknowledges a track change sent to the core and writes the expected
+        track through, as the track_playback_started event of the change may
+        arrive after the next press.
+        """
+        self.state.track_changing(tl_track)
+        latency.acknowledge(future)
+
+    def track_index(self, tracklist, tl_track):
+        """
+        Returns the 0-based position of the given track in the tracklist or
+        None if there is no track or it is not in the tracklist.
+        """
+        if tl_track is None:
+            return None
+        return tracklist.index(tl_track.tlid)
 
     def seek_bwd(self, seconds=5):
         """
         Seek backward by the given number of seconds.
         """
-        pos = self.core.playback.get_time_position().get()
+        pos = self.seek_accumulator.seek(-int(round(seconds * 1000)))
+        latency.mark(latency.DECISION)
         self.logger.info(
-            "PhonieboxControls.seek_bwd() - current pos {}".format(pos))
-        pos = pos - (seconds * 1000)
-        if (pos < 0):
-            pos = 0
-        self.core.playback.seek(pos)
+            "PhonieboxControls.seek_bwd() - target pos {}".format(pos))
 
     def seek_fwd(self, seconds=5):
         """
         Seek forward by the given number of seconds.
         """
-        pos = self.core.playback.get_time_position().get()
+        pos = self.seek_accumulator.seek(int(round(seconds * 1000)))
+        latency.mark(latency.DECISION)
         self.logger.info(
-            "PhonieboxControls.seek_fwd() - current pos {}".format(pos))
-        pos = pos + (seconds * 1000)
-
-        self.core.playback.seek(pos)
+            "PhonieboxControls.seek_fwd() - target pos {}".format(pos))
 
     def volume_up(self, vol_step=5):
         """
         Increase the volume by 5.
         """
-        volume = self.core.mixer.get_volume().get()
+        volume = self.volume_coalescer.adjust(vol_step)
+        latency.mark(latency.DECISION)
         self.logger.info(
-            "PhonieboxControls.volume_up() - current vol {}".format(volume))
-        if volume is None:
-            volume = 50
-
-        volume += vol_step
-        volume = min(volume, 100)
-        self.core.mixer.set_volume(volume)
+            "PhonieboxControls.volume_up() - target vol {}".format(volume))
 
     def volume_down(self, vol_step=5):
         """
         Decrease the volume by 5.
         """
-        volume = self.core.mixer.get_volume().get()
+        volume = self.volume_coalescer.adjust(-vol_step)
+        latency.mark(latency.DECISION)
         self.logger.info(
-            "PhonieboxControls.volume_down() - current vol {}".format(volume))
-        if volume is None:
-            volume = 50
-
-        volume -= vol_step
-        volume = max(volume, 0)
-        self.core.mixer.set_volume(volume)
+            "PhonieboxControls.volume_down() - target vol {}".format(volume))
 
     def mute_unmute(self):
         """
         Mute/unmute mopidy.
         """
-        mute = self.core.mixer.get_mute().get()
+        mute = self.state.get(StateCache.MUTE)
         self.logger.info(
             "PhonieboxControls.mute_unmute() - current is {}".format(mute))
+        latency.mark(latency.DECISION)
         if mute is None or mute is True:
             mute = False
         else:
             mute = True
-        self.core.mixer.set_mute(mute)
+        latency.acknowledge(self.core.mixer.set_mute(mute))
+        self.state.update(StateCache.MUTE, mute)
@@ -0,0 +1,137 @@
+#
+#  Copyright 2019 Thomas Wunschel (https://github.com/wuschi)
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+import logging
+
+from .latency import Histogram
+
+# upper bounds of the bounce interval histogram buckets in milliseconds
+BOUNCE_BUCKETS = (0.5, 1, 2, 5, 10, 20, 50, 100, 200)
+
+
+class Debouncer:
+    """
+    Software debounce filter of a single pin, counting accepted edges and
+    rejected glitches.
+
+    An edge within `window` seconds of the last accepted edge is rejected.
+    Every edge within `maximum` seconds of the last accepted edge is taken
+    as a bounce and its interval is recorded in a histogram. If `minimum`
+    is less than `maximum` the window adapts to the pin: it follows the
+    longest bounce seen with a safety margin right away, and shrinks slowly
+    with every edge that did not bounce, always staying within `minimum`
+    and `maximum`. Otherwise the window is fixed.
+
+    Not thread-safe, the caller has to serialize the edges of the pin.
+    """
+    logger = logging.getLogger(__name__)
+
+    # the window is this many times the longest bounce seen
+    margin = 1.5
+    # the fraction the bounce estimate shrinks by per clean edge
+    release = 0.05
+
+    def __init__(self, minimum, maximum=None):
+        """
+        :param minimum: the minimum window in seconds
+        :param maximum: the maximum window in seconds, the window is fixed
+                        to `minimum` if None
+        """
+        if maximum is None:
+            maximum = minimum
+        if minimum > maximum:
+            raise ValueError("minimum bounce time {} is greater than the"
+                             " maximum {}".format(minimum, maximum))
+        self.minimum = minimum
+        self.maximum = maximum
+        self.adaptive = minimum < maximum
+        # start conservative and shrink on a clean pin
+        self.window = maximum
+        self.estimate = maximum / self.margin
+        self.last_edge = None
+        self.accepted = 0
+        self.rejected = 0
+        self.intervals = Histogram(BOUNCE_BUCKETS)
+
+    def accept(self, timestamp):
+        """
+        Filters an edge at the monotonic time `timestamp`.
+
+        :return: True if the edge is accepted, False if it is a glitch
+        """
+        if self.last_edge is not None:
+            interval = timestamp - self.last_edge
+            if interval < self.maximum:
+                self.intervals.add(interval * 1000)
+                rejected = interval < self.window
+                # a late bounce is accepted, but widens the window for the
+                # next ones
+                if self.adaptive and interval > self.estimate:
+                    self.estimate = interval
+                    self.adapt()
+                if rejected:
+                    self.rejected += 1
+                    return False
+            elif self.adaptive:
+                self.estimate *= 1 - self.release
+                self.adapt()
+        self.last_edge = timestamp
+        self.accepted += 1
+        return True
+
+    def force(self, timestamp):
+        """
+        Accepts an edge at the monotonic time `timestamp` regardless of the
+        window, e.g. the level the pin settled at after a rejected edge.
+        """
+        self.last_edge = timestamp
+        self.accepted += 1
+
+    def closes_at(self):
+        """
+        Returns the monotonic time when the window of the last accepted edge
+        closes, after which the next edge is accepted.
+        """
+        return self.last_edge + self.window
+
+    def adapt(self):
+        self.window = min(max(self.estimate * self.margin, self.minimum),
+                          self.maximum)
+
+    def stats(self):
+        """
+        Returns the current window in milliseconds, the number of accepted
+        edges and rejected glitches and the bounce interval histogram as
+        dict.
+        """
+        return {
+            'window': self.window * 1000,
+            'adaptive': self.adaptive,
+            'accepted': self.accepted,
+            'rejected': self.rejected,
+            'bounces': self.intervals.snapshot(),
+        }
+
+    def log_stats(self, name):
+        """
+        Logs a summary of the glitches of the pin `name`.
+        """
+        if self.rejected == 0:
+            return
+        bounces = self.intervals.snapshot()
+        self.logger.info(
+            "%s: %d edges, %d glitches, bounce p99 %.1f ms, "
+            "window %.1f ms", name, self.accepted, self.rejected,
+            bounces['p99'], self.window * 1000)
@@ -0,0 +1,88 @@
+#
+#  Copyright 2019 Thomas Wunschel (https://github.com/wuschi)
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+from collections import namedtuple
+
+from mopidy import config
+
+
+class EncoderConfig(config.ConfigValue):
+    """
+    For serialization / deserialization of rotary encoder config values
+    """
+    tuple_encoderconfig = namedtuple("EncoderConfig", ("pin_a",
+                                                       "pin_b",
+                                                       "acceleration"))
+
+    def __init__(self):
+        pass
+
+    def deserialize(self, val):
+        """
+        Deserializes a config value to the corresponding EncoderConfig tuple.
+        """
+        if val is None:
+            return None
+
+        val = config.decode(val).strip()
+        if val == "":
+            return None
+
+        val = val.split(',')
+        if len(val) < 2 or len(val) > 3:
+            raise ValueError("invalid config string for encoder config: {}"
+                             .format(val))
+
+        pins = []
+        for pin in val[:2]:
+            pin = pin.strip()
+            try:
+                pin = int(pin)
+            except ValueError:
+                raise ValueError("invalid pin for encoder config: {}"
+                                 .format(pin))
+            if pin < 0:
+                raise ValueError("pin must not be negative: {}"
+                                 .format(pin))
+            pins.append(pin)
+        if pins[0] == pins[1]:
+            raise ValueError("pin_a and pin_b must differ: {}"
+                             .format(pins[0]))
+
+        acceleration = 4.0
+        if len(val) > 2:
+            acceleration = val[2].strip()
+            try:
+                acceleration = float(acceleration)
+            except ValueError:
+                raise ValueError("invalid acceleration for encoder config: {}"
+                                 .format(acceleration))
+            if acceleration < 1:
+                raise ValueError("acceleration must not be less than 1: {}"
+                                 .format(acceleration))
+
+        return self.tuple_encoderconfig(pins[0], pins[1], acceleration)
+
+    def serialize(self, value, display=False):
+        """
+        Serializes an EncoderConfig tuple to the corresponding string value.
+        """
+        if value is None:
+            return ""
+
+        value = "{:d},{:d},{}".format(value.pin_a, value.pin_b,
+                                      value.acceleration)
+
+        return config.encode(value)
@@ -0,0 +1,133 @@
+#
+#  Copyright 2019 Thomas Wunschel (https://github.com/wuschi)
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+import threading
+
+
+def repeat(fn, times):
+    """
+    Calls `fn` `times` times.
+    """
+    for _ in range(times):
+        fn()
+
+
+class StepAccumulator:
+    """
+    Accumulates the steps of a rotary encoder into a single function call
+    per flush interval.
+
+    Every step is weighted by the rotation speed: steps which follow the
+    previous step within `slow_interval` seconds count more, up to
+    `acceleration` times at `slow_interval / acceleration` seconds. The
+    first step of a burst starts a flush interval, after which the net
+    number of steps is submitted to the executor as one job, which calls the
+    clockwise or counter-clockwise function once per step. The volume and
+    seek functions coalesce those calls into absolute targets, so a fast
+    spin neither floods the executor nor the mixer.
+    """
+
+    slow_interval = 0.1
+
+    def __init__(self, scheduler, executor, clockwise, counter_clockwise,
+                 acceleration=1, interval=0.05):
+        """
+        :param scheduler: the scheduler which runs the flush
+        :param executor: the executor to submit the functions to
+        :param clockwise: tuple of function type and compiled function for
+                          clockwise steps, or None
+        :param counter_clockwise: tuple of function type and compiled
+                                  function for counter-clockwise steps, or
+                                  None
+        :param acceleration: the maximum weight of a step
+        :param interval: the flush interval in seconds
+        """
+        self.scheduler = scheduler
+        self.executor = executor
+        self.clockwise = clockwise
+        self.counter_clockwise = counter_clockwise
+        self.acceleration = acceleration
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.steps = 0.0
+        self.last_step = None
+        self.timer = None
+        self.flushes = 0
+
+    def rotated_clockwise(self):
+        """
+        Callback for a clockwise step of the encoder.
+        """
+        self.step(1)
+
+    def rotated_counter_clockwise(self):
+        """
+        Callback for a counter-clockwise step of the encoder.
+        """
+        self.step(-1)
+
+    def step(self, direction):
+        """
+        Adds a step.
+
+        :param direction: 1 for clockwise, -1 for counter-clockwise
+        """
+        now = self.scheduler.clock()
+        with self.lock:
+            weight = 1.0
+            if self.last_step is not None and now > self.last_step:
+                weight = min(max(self.slow_interval / (now - self.last_step),
+                                 1.0), self.acceleration)
+            elif self.last_step is not None:
+                weight = self.acceleration
+            self.last_step = now
+            if self.timer is None and weight == 1.0:
+                # a new burst, drop the fraction left by the previous one
+                self.steps = 0.0
+            self.steps += direction * weight
+            if self.timer is None:
+                self.timer = self.scheduler.schedule(now + self.interval,
+                                                     self.flush)
+
+    def flush(self):
+        """
+        Submits the whole steps accumulated so far. The fraction is kept
+        while the encoder keeps spinning.
+        """
+        with self.lock:
+            self.timer = None
+            steps = int(self.steps)
+            self.steps -= steps
+        if steps > 0:
+            function = self.clockwise
+        elif steps < 0:
+            function = self.counter_clockwise
+        else:
+            return
+        if function is None:
+            return
+        fn_type, fn = function
+        self.flushes += 1
+        self.executor.submit(fn_type, repeat, fn, abs(steps))
+
+    def close(self):
+        """
+        Drops pending steps.
+        """
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            self.steps = 0.0
@@ -0,0 +1,324 @@
+#
+#  Copyright 2019 Thomas Wunschel (https://github.com/wuschi)
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+import logging
+import threading
+from collections import deque
+
+from . import latency
+from .compat import Full, Queue, monotonic
+from .latency import LatencyStats
+
+QUEUE = 'queue'
+MERGE = 'merge'
+DROP = 'drop'
+
+CRITICAL = 0
+INTERACTIVE = 1
+BULK = 2
+LANES = ('critical', 'interactive', 'bulk')
+# the lane of the stop marker, behind all commands
+STOP = len(LANES)
+
+
+class LaneQueue(Queue):
+    """
+    A bounded queue with a FIFO lane per priority. Items are put as
+    `(lane, item)` tuples and :meth:`get` returns the oldest item of the
+    most urgent lane which is not empty.
+    """
+
+    def _init(self, maxsize):
+        self.lanes = [deque() for _ in range(STOP + 1)]
+
+    def _qsize(self):
+        return sum(len(lane) for lane in self.lanes)
+
+    def _put(self, item):
+        lane, item = item
+        self.lanes[lane].append(item)
+
+    def _get(self):
+        for lane in self.lanes:
+            if lane:
+                return lane.popleft()
+
+    def discard(self, lanes, match, limit=None):
+        """
+        Removes queued items, newest first, and marks them as done.
+
+        :param lanes: the lanes to remove the items from, in this order
+        :param match: called with an item, returns True if it is removed
+        :param limit: the maximum number of items to remove or None
+        :return: the removed items
+        """
+        removed = []
+        with self.mutex:
+            for lane in lanes:
+                kept = deque()
+                for item in reversed(self.lanes[lane]):
+                    if ((limit is None or len(removed) < limit)
+                            and match(item)):
+                        removed.append(item)
+                    else:
+                        kept.appendleft(item)
+                self.lanes[lane] = kept
+            if removed:
+                self.unfinished_tasks -= len(removed)
+                if self.unfinished_tasks == 0:
+                    self.all_tasks_done.notify_all()
+                self.not_full.notify(len(removed))
+        return removed
+
+
+def same_priority(name):
+    """
+    The default priority of :class:`CommandExecutor`, which puts all
+    commands into the :data:`INTERACTIVE` lane.
+    """
+    return INTERACTIVE
+
+
+class CommandExecutor:
+    """
+    Executes control commands on a dedicated worker thread.
+
+    The gpio callbacks only enqueue commands, so the gpiozero event and hold
+    threads never wait for the core or for subprocesses. The queue is
+    bounded: when it is full, new commands are dropped and counted in
+    `dropped` instead of piling up behind a slow core.
+
+    The commands are queued in three lanes, :data:`CRITICAL`,
+    :data:`INTERACTIVE` and :data:`BULK`, and the most urgent one is
+    executed first. If the queue is full, a command evicts the newest
+    command of a less urgent lane. A command more urgent than
+    :data:`BULK` cancels the bulk repeats which are still in flight, as
+    they are stale once the user moved on.
+
+    Repeated commands, e.g. of a held button, can be submitted with
+    :meth:`submit_repeat`, which tracks them in flight from their submission
+    until they have been executed. A repeat of a command still in flight is
+    merged into it or dropped, so a busy core does not build up a backlog
+    of queued commands that is worked off after the button was released.
+    The merged repeats are counted and executed back to back right after
+    the command in flight, so functions which only move a target, like the
+    volume and seek functions, apply every step with one core call. The
+    shed repeats are counted per command name in `merged`, `shed` and
+    `cancelled`.
+
+    The latencies of the executed commands are collected in `latency`.
+
+    :param max_queued: the maximum number of queued commands
+    :param priority: called with the name of a command, returns its lane
+    """
+    logger = logging.getLogger(__name__)
+
+    def __init__(self, max_queued=16, priority=same_priority):
+        self.queue = LaneQueue(max_queued)
+        self.priority = priority
+        self.dropped = 0
+        self.lock = threading.Lock()
+        self.in_flight = {}
+        self.merged = {}
+        self.shed = {}
+        self.cancelled = {}
+        self.latency = LatencyStats()
+        self.thread = threading.Thread(target=self.run,
+                                       name='PhonieboxCommandExecutor')
+        self.thread.daemon = True
+        self.thread.start()
+
+    def submit(self, name, fn, *args):
+        """
+        Enqueues a command without blocking.
+
+        :param name: the name of the command, used for logging
+        :param fn: the function to execute
+        :param args: the positional arguments to pass to `fn`
+        :return: True if the command was enqueued, False if it was dropped
+        """
+        lane = self.priority(name)
+        command = (name, fn, args, monotonic())
+        if lane < BULK and self.in_flight:
+            self.cancel_repeats()
+        try:
+            self.queue.put_nowait((lane, command))
+        except Full:
+            if self.evict(lane):
+                try:
+                    self.queue.put_nowait((lane, command))
+                    return True
+                except Full:
+                    pass
+            with self.lock:
+                self.dropped += 1
+            self.logger.warning("command queue full, dropping %s", name)
+            return False
+        return True
+
+    def evict(self, lane):
+        """
+        Drops the newest queued command of a lane less urgent than `lane`.
+
+        :return: True if a command was dropped
+        """
+        with self.lock:
+            removed = self.queue.discard(range(BULK, lane, -1),
+                                         lambda command: True, limit=1)
+            for name, fn, args, edge in removed:
+                self.dropped += 1
+                if fn == self.run_repeat:
+                    del self.in_flight[args[0]]
+                self.logger.warning("command queue full, dropping %s", name)
+        return bool(removed)
+
+    def cancel_repeats(self):
+        """
+        Cancels the bulk repeats in flight: the queued ones are removed and
+        the repeats merged into a running one are not executed.
+        """
+        with self.lock:
+            removed = self.queue.discard(
+                [BULK], lambda command: command[1] == self.run_repeat)
+            for name, fn, (key, repeated), edge in removed:
+                pending = self.in_flight.pop(key)
+                self.cancelled[name] = \
+                    self.cancelled.get(name, 0) + pending[0]
+            for pending in self.in_flight.values():
+                if pending[1] == BULK and pending[0] > 0:
+                    self.cancelled[pending[2]] = \
+                        self.cancelled.get(pending[2], 0) + pending[0]
+                    pending[0] = 0
+
+    def submit_repeat(self, key, name, fn, policy=QUEUE):
+        """
+        Enqueues a repeated command without blocking, unless a command with
+        the same key is still in flight.
+
+        :param key: identifies the repeated command, e.g. by button and name
+        :param name: the name of the command, used for logging
+        :param fn: the function to execute, without arguments
+        :param policy: what to do with a repeat while the previous command
+                       is in flight: :data:`QUEUE` enqueues it anyway,
+                       :data:`MERGE` counts it and executes it right after
+                       the command in flight, back to back with the other
+                       merged repeats, and :data:`DROP` drops it
+        :return: True if the command was enqueued or merged, False if it
+                 was dropped
+        """
+        if policy == QUEUE:
+            return self.submit(name, fn)
+        with self.lock:
+            pending = self.in_flight.get(key)
+            if pending is not None:
+                if policy == MERGE:
+                    pending[0] += 1
+                    self.merged[name] = self.merged.get(name, 0) + 1
+                    return True
+                self.shed[name] = self.shed.get(name, 0) + 1
+                return False
+            self.in_flight[key] = [1, self.priority(name), name]
+        if self.submit(name, self.run_repeat, key, fn):
+            return True
+        with self.lock:
+            self.in_flight.pop(key, None)
+        return False
+
+    def run_repeat(self, key, fn):
+        """
+        Executes a command submitted by :meth:`submit_repeat` and then the
+        repeats merged into it, once per merged repeat, until no more
+        repeats are pending.
+        """
+        try:
+            while True:
+                with self.lock:
+                    pending = self.in_flight[key]
+                    count = pending[0]
+                    if count == 0:
+                        del self.in_flight[key]
+                        return
+                    pending[0] = 0
+                for _ in range(count):
+                    fn()
+        except Exception:
+            with self.lock:
+                self.in_flight.pop(key, None)
+            raise
+
+    def stats(self):
+        """
+        Returns the number of commands dropped because the queue was full
+        and the number of repeats merged, shed and cancelled per command
+        name.
+        """
+        with self.lock:
+            return {
+                'dropped': self.dropped,
+                'merged': dict(self.merged),
+                'shed': dict(self.shed),
+                'cancelled': dict(self.cancelled),
+            }
+
+    def log_stats(self):
+        """
+        Logs the commands and repeats which were not executed on their own,
+        if any.
+        """
+        stats = self.stats()
+        if (stats['dropped'] or stats['merged'] or stats['shed']
+                or stats['cancelled']):
+            self.logger.info(
+                ("commands dropped: {}, repeats merged: {}, shed: {},"
+                 + " cancelled: {}").format(
+                    stats['dropped'], stats['merged'], stats['shed'],
+                    stats['cancelled']))
+
+    def run(self):
+        """
+        Executes the enqueued commands until stopped.
+        """
+        while True:
+            command = self.queue.get()
+            try:
+                if command is None:
+                    return
+                name, fn, args, edge = command
+                self.latency.begin(name, edge)
+                try:
+                    latency.mark(latency.DISPATCH)
+                    fn(*args)
+                except Exception:
+                    self.logger.exception("error executing %s", name)
+                finally:
+                    self.latency.end()
+            finally:
+                self.queue.task_done()
+
+    def join(self):
+        """
+        Blocks until all enqueued commands have been executed.
+        """
+        self.queue.join()
+
+    def stop(self):
+        """
+        Stops the worker thread after the enqueued commands have been
+        executed.
+        """
+        if self.thread.is_alive():
+            self.queue.put((STOP, None))
+            self.thread.join()
+        self.latency.stop()
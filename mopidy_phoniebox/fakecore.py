@@ -0,0 +1,306 @@
+#
+#  Copyright 2019 Thomas Wunschel (https://github.com/wuschi)
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+import heapq
+import itertools
+import threading
+
+from mopidy.audio import PlaybackState
+from mopidy.models import TlTrack, Track
+
+import pykka
+
+from .compat import monotonic
+
+
+class FakeCore:
+    """
+    A fake mopidy core for benchmarks and dry runs without a real mopidy.
+
+    Every call returns a pykka future which is resolved `latency` seconds
+    later by a single delivery thread, which models the actor round trip of
+    a busy core. Calls are processed in the order they were made. If a
+    `listener` is given, the core events a real core would send are called
+    on it from the delivery thread.
+
+    All calls are recorded in `calls` as `(name, args, timestamp)` tuples.
+    """
+
+    def __init__(self, latency=0, tracks=10, track_length=180000,
+                 listener=None):
+        self.latency = latency
+        self.listener = listener
+        self.calls = []
+        self.condition = threading.Condition()
+        self.pending = []
+        self.sequence = itertools.count()
+        self.running = True
+
+        self.state = PlaybackState.STOPPED
+        self.volume = 50
+        self.mute = False
+        self.tl_tracks = [
+            TlTrack(tlid, Track(uri='fake:track:{:d}'.format(tlid),
+                                length=track_length))
+            for tlid in range(1, tracks + 1)]
+        self.current_tl_track = None
+        self.position = 0
+        self.position_since = None
+
+        self.playback = FakePlaybackController(self)
+        self.mixer = FakeMixerController(self)
+        self.tracklist = FakeTracklistController(self)
+
+        self.thread = threading.Thread(target=self.run, name='FakeCore')
+        self.thread.daemon = True
+        self.thread.start()
+
+    def call(self, name, fn, *args):
+        """
+        Schedules a call and returns the future for its result.
+
+        :param name: the name of the call, e.g. `playback.get_state`
+        :param fn: the function computing the result
+        :param args: the arguments to pass to `fn`
+        """
+        future = pykka.ThreadingFuture()
+        now = monotonic()
+        with self.condition:
+            self.calls.append((name, args, now))
+            heapq.heappush(self.pending, (now + self.latency,
+                                          next(self.sequence),
+                                          future, fn, args))
+            self.condition.notify()
+        return future
+
+    def run(self):
+        """
+        Resolves the pending futures when they are due.
+        """
+        while True:
+            with self.condition:
+                while self.running:
+                    if len(self.pending) > 0:
+                        timeout = self.pending[0][0] - monotonic()
+                        if timeout <= 0:
+                            break
+                    else:
+                        timeout = None
+                    self.condition.wait(timeout)
+                if not self.running:
+                    return
+                due, _, future, fn, args = heapq.heappop(self.pending)
+            future.set(fn(*args))
+
+    def stop(self):
+        """
+        Stops the delivery thread. Pending futures are never resolved.
+        """
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        self.thread.join()
+
+    def send(self, event, **kwargs):
+        """
+        Sends a core event to the listener, if any.
+        """
+        if self.listener is not None:
+            getattr(self.listener, event)(**kwargs)
+
+    def time_position(self):
+        """
+        Returns the current time position in milliseconds.
+        """
+        if self.position_since is None:
+            return self.position
+        return self.position + int((monotonic() - self.position_since) * 1000)
+
+    def set_state(self, state):
+        """
+        Changes the playback state and sends the corresponding events.
+        """
+        old_state = self.state
+        if state == PlaybackState.PLAYING:
+            self.position_since = monotonic()
+        else:
+            self.position = self.time_position()
+            self.position_since = None
+        self.state = state
+        if old_state != state:
+            self.send('playback_state_changed', old_state=old_state,
+                      new_state=state)
+
+    def change_track(self, tl_track):
+        """
+        Changes the current track and starts playing it.
+        """
+        if self.current_tl_track is not None and \
+                self.state != PlaybackState.STOPPED:
+            self.send('track_playback_ended',
+                      tl_track=self.current_tl_track,
+                      time_position=self.time_position())
+        self.current_tl_track = tl_track
+        self.position = 0
+        if tl_track is None:
+            self.set_state(PlaybackState.STOPPED)
+            return
+        self.set_state(PlaybackState.PLAYING)
+        self.send('track_playback_started', tl_track=tl_track)
+
+    def index(self, tl_track):
+        """
+        Returns the index of the given track in the tracklist or None.
+        """
+        for index, candidate in enumerate(self.tl_tracks):
+            if candidate == tl_track:
+                return index
+        return None
+
+
+class FakePlaybackController:
+    """
+    Fake of the mopidy core playback controller.
+    """
+
+    def __init__(self, core):
+        self.core = core
+
+    def get_state(self):
+        return self.core.call('playback.get_state', lambda: self.core.state)
+
+    def get_current_tl_track(self):
+        return self.core.call('playback.get_current_tl_track',
+                              lambda: self.core.current_tl_track)
+
+    def get_time_position(self):
+        return self.core.call('playback.get_time_position',
+                              self.core.time_position)
+
+    def play(self, tl_track=None, tlid=None):
+        return self.core.call('playback.play', self._play, tl_track, tlid)
+
+    def _play(self, tl_track, tlid):
+        core = self.core
+        if tlid is not None:
+            tl_track = next(
+                (t for t in core.tl_tracks if t.tlid == tlid), None)
+            if tl_track is None:
+                return
+        if tl_track is None:
+            if core.state == PlaybackState.PAUSED:
+                core.set_state(PlaybackState.PLAYING)
+                return
+            tl_track = core.current_tl_track
+        if tl_track is None and len(core.tl_tracks) > 0:
+            tl_track = core.tl_tracks[0]
+        if tl_track is not None:
+            core.change_track(tl_track)
+
+    def pause(self):
+        return self.core.call('playback.pause', self._transition,
+                              PlaybackState.PLAYING, PlaybackState.PAUSED)
+
+    def resume(self):
+        return self.core.call('playback.resume', self._transition,
+                              PlaybackState.PAUSED, PlaybackState.PLAYING)
+
+    def stop(self):
+        return self.core.call('playback.stop', self.core.set_state,
+                              PlaybackState.STOPPED)
+
+    def _transition(self, from_state, to_state):
+        if self.core.state == from_state:
+            self.core.set_state(to_state)
+
+    def next(self):
+        return self.core.call('playback.next', self._skip, 1)
+
+    def previous(self):
+        return self.core.call('playback.previous', self._skip, -1)
+
+    def _skip(self, offset):
+        core = self.core
+        index = core.index(core.current_tl_track)
+        if index is None:
+            return
+        index += offset
+        if 0 <= index < len(core.tl_tracks):
+            core.change_track(core.tl_tracks[index])
+        else:
+            core.change_track(None)
+
+    def seek(self, time_position):
+        return self.core.call('playback.seek', self._seek, time_position)
+
+    def _seek(self, time_position):
+        core = self.core
+        if core.current_tl_track is None:
+            return False
+        core.position = time_position
+        if core.position_since is not None:
+            core.position_since = monotonic()
+        core.send('seeked', time_position=time_position)
+        return True
+
+
+class FakeMixerController:
+    """
+    Fake of the mopidy core mixer controller.
+    """
+
+    def __init__(self, core):
+        self.core = core
+
+    def get_volume(self):
+        return self.core.call('mixer.get_volume', lambda: self.core.volume)
+
+    def set_volume(self, volume):
+        return self.core.call('mixer.set_volume', self._set_volume, volume)
+
+    def _set_volume(self, volume):
+        if self.core.volume != volume:
+            self.core.volume = volume
+            self.core.send('volume_changed', volume=volume)
+        return True
+
+    def get_mute(self):
+        return self.core.call('mixer.get_mute', lambda: self.core.mute)
+
+    def set_mute(self, mute):
+        return self.core.call('mixer.set_mute', self._set_mute, mute)
+
+    def _set_mute(self, mute):
+        if self.core.mute != mute:
+            self.core.mute = mute
+            self.core.send('mute_changed', mute=mute)
+        return True
+
+
+class FakeTracklistController:
+    """
+    Fake of the mopidy core tracklist controller.
+    """
+
+    def __init__(self, core):
+        self.core = core
+
+    def get_length(self):
+        return self.core.call('tracklist.get_length',
+                              lambda: len(self.core.tl_tracks))
+
+    def get_tl_tracks(self):
+        return self.core.call('tracklist.get_tl_tracks',
+                              lambda: list(self.core.tl_tracks))
@@ -14,20 +14,30 @@
 #  limitations under the License.
 #
 import logging
+import os
+from threading import Thread, Timer
 
-from mopidy import core
+from mopidy import config as config_lib, core
 
 import pykka
 
+from .compat import monotonic
 from .controls import PhonieboxControls
 from .gpiocontroller import GpioController
+from .statecache import StateCache
 
 
 class PhonieboxFrontend(pykka.ThreadingActor, core.CoreListener):
     """
     Phoniebox frontend.
     Creates an :class:`IdleWatchdog` if idle_time_before_shutdown > 0.
-    Initializes the :class:`GpioController`.
+    Initializes the :class:`GpioController`, whose gpios are opened on a
+    background thread after the start, so mopidy does not wait for them.
+    Forwards the core events to the :class:`StateCache` of the controls,
+    whose values are fetched again after state_max_age seconds if > 0.
+    Logs the button latencies every latency_log_interval minutes if > 0.
+    Reloads the button config from config_files when they change if
+    config_watch_interval > 0, or when :meth:`reload_config` is called.
     """
     logger = logging.getLogger(__name__)
 
@@ -35,15 +45,27 @@ class PhonieboxFrontend(pykka.ThreadingActor, core.CoreListener):
         super(PhonieboxFrontend, self).__init__()
         self.core = core
         self.config = config['phoniebox']
-        self.controls = PhonieboxControls(core)
+        max_age = self.config.get('state_max_age', 60)
+        self.controls = PhonieboxControls(
+            core, StateCache(core, max_age=max_age or None))
         self.idle_watchdog = None
-        self.gpio_controller = GpioController(self.config, self.controls)
+        self.latency_log_timer = None
+        self.config_watch_timer = None
+        self.config_mtimes = None
+        self.gpio_setup = None
+        self.gpio_controller = GpioController(self.config, self.controls,
+                                              deferred=True)
 
     def on_start(self):
         """
         If idle_time_before_shutdown > 0, an IdleWatchdog will be created with
-        the specified idle time.
+        the specified idle time. Starts the setup of the gpios.
         """
+        self.gpio_setup = Thread(target=self.setup_gpios,
+                                 name='PhonieboxGpioSetup')
+        self.gpio_setup.daemon = True
+        self.gpio_setup.start()
+
         idle_time = self.config['idle_time_before_shutdown']
         if idle_time > 0:
             from .idle_watchdog import IdleWatchdog
@@ -53,9 +75,231 @@ class PhonieboxFrontend(pykka.ThreadingActor, core.CoreListener):
             self.idle_watchdog = None
             self.logger.info("idle timer disabled")
 
+        if self.config.get('latency_log_interval', 0) > 0:
+            self.start_latency_log_timer()
+
+        if (self.config.get('config_watch_interval', 0) > 0
+                and self.config.get('config_files')):
+            self.config_mtimes = self.get_config_mtimes()
+            self.start_config_watch_timer()
+
     def on_stop(self):
         """
-        Stops the IdleWatchdog if it has been started previously
+        Stops the IdleWatchdog if it has been started previously and closes
+        the GpioController and the controls.
         """
         if self.idle_watchdog is not None:
             self.idle_watchdog.stop()
+        if self.latency_log_timer is not None:
+            self.latency_log_timer.cancel()
+            self.latency_log_timer = None
+        if self.config_watch_timer is not None:
+            self.config_watch_timer.cancel()
+            self.config_watch_timer = None
+        self.wait_for_gpios()
+        self.gpio_controller.close()
+        self.controls.close()
+
+    def setup_gpios(self):
+        """
+        Opens the gpios, called on the setup thread.
+        """
+        started = monotonic()
+        try:
+            self.gpio_controller.setup()
+        except Exception:
+            self.logger.exception("error setting up the gpios")
+            return
+        self.logger.info("gpios set up in {:.0f} ms".format(
+            (monotonic() - started) * 1000))
+
+    def wait_for_gpios(self):
+        """
+        Blocks until the setup of the gpios is finished.
+        """
+        if self.gpio_setup is not None:
+            self.gpio_setup.join()
+
+    def start_latency_log_timer(self):
+        """
+        Starts the timer logging the button latencies.
+        """
+        interval = self.config['latency_log_interval'] * 60
+        self.latency_log_timer = Timer(interval, self.on_latency_log_timer)
+        self.latency_log_timer.daemon = True
+        self.latency_log_timer.start()
+
+    def on_latency_log_timer(self):
+        """
+        Logs the button latencies and restarts the timer.
+        """
+        self.log_latency_stats()
+        self.start_latency_log_timer()
+
+    def start_config_watch_timer(self):
+        """
+        Starts the timer checking the config files for changes.
+        """
+        interval = self.config['config_watch_interval']
+        self.config_watch_timer = Timer(interval, self.on_config_watch_timer)
+        self.config_watch_timer.daemon = True
+        self.config_watch_timer.start()
+
+    def on_config_watch_timer(self):
+        """
+        Reloads the config in the actor if a config file changed and
+        restarts the timer.
+        """
+        mtimes = self.get_config_mtimes()
+        if mtimes != self.config_mtimes:
+            self.config_mtimes = mtimes
+            self.actor_ref.proxy().reload_config()
+        self.start_config_watch_timer()
+
+    def get_config_mtimes(self):
+        """
+        Returns the modification times of the config files, None for
+        missing files.
+        """
+        mtimes = []
+        for path in self.config.get('config_files') or ():
+            try:
+                mtimes.append(os.path.getmtime(path))
+            except OSError:
+                mtimes.append(None)
+        return mtimes
+
+    def load_config(self):
+        """
+        Loads the phoniebox section from the config files.
+
+        :return: the config section or None if it is invalid
+        """
+        from . import Extension
+        extension = Extension()
+        config, errors = config_lib.load(
+            list(self.config.get('config_files') or ()),
+            [extension.get_config_schema()],
+            [extension.get_default_config()], [])
+        if errors.get(extension.ext_name):
+            self.logger.error("not reloading invalid config: {}".format(
+                errors[extension.ext_name]))
+            return None
+        return config[extension.ext_name]
+
+    def reload_config(self, config=None):
+        """
+        Applies a changed phoniebox config to the buttons without a restart,
+        see :meth:`GpioController.reload`.
+
+        :param config: the new phoniebox config section, loaded from
+                       config_files if None
+        :return: the changes or None if the config could not be loaded
+        """
+        if config is None:
+            if not self.config.get('config_files'):
+                self.logger.error("cannot reload config: no config_files")
+                return None
+            config = self.load_config()
+            if config is None:
+                return None
+        self.wait_for_gpios()
+        result = self.gpio_controller.reload(config)
+        self.config = config
+        return result
+
+    def get_latency_stats(self):
+        """
+        Returns the button latency histograms per function type and stage,
+        see :meth:`LatencyStats.snapshot`.
+        """
+        return self.gpio_controller.executor.latency.snapshot()
+
+    def get_timer_stats(self):
+        """
+        Returns the statistics of the button hold and repeat timers,
+        including their drift, see :meth:`TimerQueue.stats`.
+        """
+        return self.gpio_controller.timer_stats()
+
+    def get_debounce_stats(self):
+        """
+        Returns the accepted edges, rejected glitches and bounce intervals
+        per gpio, see :meth:`Debouncer.stats`.
+        """
+        return self.gpio_controller.debounce_stats()
+
+    def get_command_stats(self):
+        """
+        Returns the number of dropped commands and of merged and shed hold
+        repeats, see :meth:`CommandExecutor.stats`.
+        """
+        return self.gpio_controller.executor.stats()
+
+    def log_latency_stats(self):
+        """
+        Logs a summary of the button latencies, the timer drift, the shed
+        commands and the glitches of the gpios.
+        """
+        self.gpio_controller.executor.latency.log()
+        if self.gpio_controller.scheduler is not None:
+            self.gpio_controller.scheduler.log_stats()
+        self.gpio_controller.executor.log_stats()
+        self.gpio_controller.log_debounce_stats()
+
+    def playback_state_changed(self, old_state, new_state):
+        """
+        Called by mopidy when the playback state has changed.
+        """
+        self.controls.state.playback_state_changed(old_state, new_state)
+
+    def volume_changed(self, volume):
+        """
+        Called by mopidy when the volume has changed.
+        """
+        self.controls.state.volume_changed(volume)
+
+    def mute_changed(self, mute):
+        """
+        Called by mopidy when the mute state has changed.
+        """
+        self.controls.state.mute_changed(mute)
+
+    def track_playback_started(self, tl_track):
+        """
+        Called by mopidy when a track starts playing.
+        """
+        self.controls.state.track_playback_started(tl_track)
+
+    def track_playback_ended(self, tl_track, time_position):
+        """
+        Called by mopidy when a track stops playing.
+        """
+        self.controls.state.track_playback_ended(tl_track, time_position)
+
+    def track_playback_paused(self, tl_track, time_position):
+        """
+        Called by mopidy when a track is paused.
+        """
+        self.controls.state.track_playback_paused(tl_track, time_position)
+
+    def track_playback_resumed(self, tl_track, time_position):
+        """
+        Called by mopidy when a track is resumed.
+        """
+        self.controls.state.track_playback_resumed(tl_track, time_position)
+
+    def seeked(self, time_position):
+        """
+        Called by mopidy when the time position has changed.
+        """
+        self.controls.state.seeked(time_position)
+
+    def tracklist_changed(self):
+        """
+        Called by mopidy when the tracklist has changed. Rebuilds the
+        tracklist index right away, so the next button press does not have to
+        wait for it.
+        """
+        self.controls.state.tracklist_changed()
+        self.controls.state.get(StateCache.TRACKLIST)
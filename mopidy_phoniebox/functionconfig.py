@@ -13,11 +13,186 @@
 #  See the License for the specific language governing permissions and
 #  limitations under the License.
 #
-from ast import literal_eval
 from collections import namedtuple
 
 from mopidy import config
 
+# the number of parsed config values kept by parse_function_config
+CACHE_SIZE = 1024
+
+BOOLEANS = {'true': True, 'True': True, 'false': False, 'False': False}
+ESCAPES = {'\\': '\\', "'": "'", '"': '"', 'n': '\n', 't': '\t'}
+KEY_CHARS = frozenset('abcdefghijklmnopqrstuvwxyz'
+                      'ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_')
+NUMBER_CHARS = frozenset('0123456789+-.eE')
+
+_cache = {}
+
+
+class Tokenizer:
+    """
+    Reads the `fn_type,key=value,...` grammar of a function config value.
+
+    A value is a string in single or double quotes, in which a backslash
+    escapes the quote, a backslash, `n` and `t`, a number like `5`, `-2` or
+    `0.5` or a boolean, `true` or `false`. Whitespace around the fn_type,
+    the keys and the values is ignored.
+
+    :param text: the config value
+    """
+
+    def __init__(self, text):
+        self.text = text
+        self.pos = 0
+
+    def error(self, message, pos=None):
+        """
+        Returns a ValueError for `message` at `pos`, the current position if
+        None.
+        """
+        if pos is None:
+            pos = self.pos
+        return ValueError(("malformed function arguments for function config"
+                           + " '{}': {} at position {:d}").format(
+                               self.text, message, pos))
+
+    def skip_space(self):
+        text = self.text
+        while self.pos < len(text) and text[self.pos].isspace():
+            self.pos += 1
+
+    def parse(self):
+        """
+        Returns the fn_type and the arguments as tuple of `(key, value)`
+        pairs.
+
+        :raises ValueError: on a malformed value
+        """
+        text = self.text
+        end = text.find(',')
+        if end < 0:
+            end = len(text)
+        fn_type = text[:end].strip()
+        if fn_type == '':
+            raise ValueError(("empty fn_type for function config '{}' not"
+                             + " allowed").format(text))
+        self.pos = end
+        args = []
+        keys = set()
+        while self.pos < len(text):
+            # skip the comma
+            self.pos += 1
+            start = self.pos
+            key, value = self.parse_argument()
+            if key in keys:
+                raise self.error("duplicate argument '{}'".format(key),
+                                 start)
+            keys.add(key)
+            args.append((key, value))
+            self.skip_space()
+            if self.pos < len(text) and text[self.pos] != ',':
+                raise self.error("expected ','")
+        return fn_type, tuple(args)
+
+    def parse_argument(self):
+        """
+        Reads a `key=value` pair.
+        """
+        text = self.text
+        self.skip_space()
+        start = self.pos
+        while self.pos < len(text) and text[self.pos] in KEY_CHARS:
+            self.pos += 1
+        key = text[start:self.pos]
+        if key == '':
+            raise self.error("expected argument name")
+        self.skip_space()
+        if self.pos >= len(text) or text[self.pos] != '=':
+            raise self.error("expected '='")
+        self.pos += 1
+        self.skip_space()
+        return key, self.parse_value()
+
+    def parse_value(self):
+        """
+        Reads a quoted string, a number or a boolean.
+        """
+        text = self.text
+        if self.pos >= len(text):
+            raise self.error("expected value")
+        char = text[self.pos]
+        if char in '\'"':
+            return self.parse_string(char)
+        start = self.pos
+        while self.pos < len(text) and text[self.pos] in NUMBER_CHARS:
+            self.pos += 1
+        if self.pos > start:
+            return self.parse_number(text[start:self.pos], start)
+        while self.pos < len(text) and text[self.pos] in KEY_CHARS:
+            self.pos += 1
+        word = text[start:self.pos]
+        if word in BOOLEANS:
+            return BOOLEANS[word]
+        raise self.error("expected string, number or boolean", start)
+
+    def parse_string(self, quote):
+        text = self.text
+        start = self.pos
+        self.pos += 1
+        chars = []
+        while self.pos < len(text):
+            char = text[self.pos]
+            self.pos += 1
+            if char == quote:
+                return ''.join(chars)
+            if char == '\\':
+                if self.pos >= len(text):
+                    break
+                escaped = text[self.pos]
+                if escaped not in ESCAPES:
+                    raise self.error("invalid escape '\\{}'".format(escaped),
+                                     self.pos - 1)
+                chars.append(ESCAPES[escaped])
+                self.pos += 1
+            else:
+                chars.append(char)
+        raise self.error("unterminated string", start)
+
+    def parse_number(self, token, start):
+        try:
+            if '.' in token or 'e' in token or 'E' in token:
+                return float(token)
+            return int(token)
+        except ValueError:
+            raise self.error("invalid number '{}'".format(token), start)
+
+
+def parse_function_config(text):
+    """
+    Parses a stripped, non-empty function config value, see
+    :class:`Tokenizer`. The results are memoized by the value.
+
+    :return: the fn_type and the arguments as tuple of `(key, value)` pairs
+    :raises ValueError: on a malformed value
+    """
+    try:
+        return _cache[text]
+    except KeyError:
+        pass
+    result = Tokenizer(text).parse()
+    if len(_cache) >= CACHE_SIZE:
+        _cache.clear()
+    _cache[text] = result
+    return result
+
+
+def quote(value):
+    """
+    Returns a string argument in single quotes, escaping the quotes and
+    backslashes in it.
+    """
+    return "'{}'".format(value.replace('\\', '\\\\').replace("'", "\\'"))
+
 
 class FunctionConfig(config.ConfigValue):
     """
@@ -39,24 +214,8 @@ class FunctionConfig(config.ConfigValue):
         if val == "":
             return None
 
-        arr = val.split(',')
-        fn_type = arr[0].strip()
-        if fn_type == '':
-            raise ValueError(("empty fn_type for function config '{}' not"
-                             + " allowed").format(val))
-        del arr[0]
-        fn_args = None
-        if len(arr) > 0:
-            try:
-                fn_args = dict((k.strip(), literal_eval(v.strip())) for k, v in
-                               (pair.split('=') for pair in arr))
-            except ValueError:
-                raise ValueError(("malformed function arguments for function"
-                                 + " config '{}'").format(val))
-        else:
-            fn_args = dict()
-
-        return self.tuple_functionconfig(fn_type, fn_args)
+        fn_type, fn_args = parse_function_config(val)
+        return self.tuple_functionconfig(fn_type, dict(fn_args))
 
     def serialize(self, value, display=False):
         """
@@ -72,9 +231,11 @@ class FunctionConfig(config.ConfigValue):
         for key in value.fn_args:
             val = value.fn_args[key]
             if isinstance(val, str) or isinstance(val, unicode):
-                pair = "{}='{}'".format(key, val)
+                pair = "{}={}".format(key, quote(val))
+            elif isinstance(val, bool):
+                pair = "{}={}".format(key, 'true' if val else 'false')
             else:
-                pair = "{}={}".format(key, val)
+                pair = "{}={!r}".format(key, val)
             arr = arr + [pair]
 
         return config.encode(",".join(arr))
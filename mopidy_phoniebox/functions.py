@@ -0,0 +1,247 @@
+#
+#  Copyright 2019 Thomas Wunschel (https://github.com/wuschi)
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+import logging
+from functools import partial
+from numbers import Number
+
+from .compat import iter_entry_points
+from .executor import BULK, CRITICAL, DROP, INTERACTIVE, MERGE, QUEUE
+
+ENTRY_POINT_GROUP = 'mopidy_phoniebox.fn_types'
+
+
+class Argument:
+    """
+    A typed argument of a :class:`FunctionType`.
+
+    :param name: the name of the argument in the function config
+    :param kind: the accepted type, `int` or `float`
+    :param default: the value used when the argument is not configured
+    :param minimum: the smallest accepted value or None
+    :param maximum: the largest accepted value or None
+    :param above: the value the accepted values have to be greater than or
+                  None
+    """
+
+    def __init__(self, name, kind, default, minimum=None, maximum=None,
+                 above=None):
+        self.name = name
+        self.kind = kind
+        self.default = default
+        self.minimum = minimum
+        self.maximum = maximum
+        self.above = above
+
+    def convert(self, value):
+        """
+        Checks a configured value and converts it to the argument type.
+
+        :raises ValueError: if the value has the wrong type or is out of range
+        """
+        if isinstance(value, bool) or not isinstance(value, Number):
+            raise ValueError("{} must be a number, not {!r}".format(
+                self.name, value))
+        if self.kind is int and value != int(value):
+            raise ValueError("{} must be an integer, not {!r}".format(
+                self.name, value))
+        value = self.kind(value)
+        if self.minimum is not None and value < self.minimum:
+            raise ValueError("{} must be at least {}, not {}".format(
+                self.name, self.minimum, value))
+        if self.above is not None and value <= self.above:
+            raise ValueError("{} must be greater than {}, not {}".format(
+                self.name, self.above, value))
+        if self.maximum is not None and value > self.maximum:
+            raise ValueError("{} must be at most {}, not {}".format(
+                self.name, self.maximum, value))
+        return value
+
+
+class FunctionType:
+    """
+    A button function type, e.g. `vol_up`, calling a method of the
+    `PhonieboxControls` with the typed arguments of its schema.
+
+    :param name: the fn_type used in the function config
+    :param method: the name of the `PhonieboxControls` method, or a function
+                   which is called with the `PhonieboxControls` followed by
+                   the arguments
+    :param arguments: the :class:`Argument` schema, in the positional order
+                      of the method parameters
+    :param repeat: the policy for hold repeats while the previous call is
+                   still in flight, see :meth:`CommandExecutor.submit_repeat`
+    :param priority: the lane of the :class:`CommandExecutor` the calls are
+                     queued in
+    """
+
+    def __init__(self, name, method, arguments=(), repeat=QUEUE,
+                 priority=INTERACTIVE):
+        self.name = name
+        self.method = method
+        self.arguments = tuple(arguments)
+        self.repeat = repeat
+        self.priority = priority
+
+    def compile(self, controls, fn_args=None):
+        """
+        Checks the configured arguments against the schema and binds them to
+        the controls method, so calling the result needs no further lookups.
+
+        :param controls: the `PhonieboxControls`
+        :param fn_args: the configured arguments as dict
+        :return: a callable without parameters
+        :raises ValueError: on unknown or invalid arguments
+        """
+        fn_args = fn_args or {}
+        names = set(argument.name for argument in self.arguments)
+        unknown = sorted(set(fn_args) - names)
+        if unknown:
+            raise ValueError("unknown argument(s) {} for fn type '{}'".format(
+                ", ".join(unknown), self.name))
+
+        values = []
+        for argument in self.arguments:
+            try:
+                values.append(argument.convert(
+                    fn_args.get(argument.name, argument.default)))
+            except ValueError as e:
+                raise ValueError("invalid argument for fn type '{}': {}"
+                                 .format(self.name, e))
+
+        if callable(self.method):
+            return partial(self.method, controls, *values)
+        fn = getattr(controls, self.method)
+        if values:
+            return partial(fn, *values)
+        return fn
+
+
+class FunctionRegistry:
+    """
+    The function types by name: the built-in ones and the ones provided by
+    other packages through the `mopidy_phoniebox.fn_types` entry point
+    group, e.g.::
+
+        entry_points={
+            'mopidy_phoniebox.fn_types': [
+                'radio = mopidy_radio.phoniebox:RADIO',
+            ],
+        }
+
+    where `RADIO` is a :class:`FunctionType` named `radio`. The entry points
+    are only looked up for names which are not built in, and a provider is
+    only imported when its function type is referenced by the config.
+
+    :param builtins: the built-in function types by name
+    """
+    logger = logging.getLogger(__name__)
+
+    def __init__(self, builtins, group=ENTRY_POINT_GROUP):
+        self.builtins = builtins
+        self.group = group
+        self.entry_points = None
+        self.loaded = {}
+
+    def __getitem__(self, name):
+        """
+        Returns the function type `name`, loading its provider if needed.
+
+        :raises KeyError: if there is no such function type
+        :raises ValueError: if the provider cannot be loaded
+        """
+        try:
+            return self.builtins[name]
+        except KeyError:
+            pass
+        try:
+            return self.loaded[name]
+        except KeyError:
+            pass
+
+        entry_point = self.find_entry_points()[name]
+        try:
+            fn_type = entry_point.load()
+        except Exception as e:
+            raise ValueError("cannot load fn type '{}' from {}: {}".format(
+                name, entry_point, e))
+        if not isinstance(fn_type, FunctionType) or fn_type.name != name:
+            raise ValueError("entry point {} does not provide fn type '{}'"
+                             .format(entry_point, name))
+        self.loaded[name] = fn_type
+        return fn_type
+
+    def __contains__(self, name):
+        return name in self.builtins or name in self.find_entry_points()
+
+    def names(self):
+        """
+        Returns the names of all function types without loading any
+        provider.
+        """
+        return sorted(set(self.builtins) | set(self.find_entry_points()))
+
+    def find_entry_points(self):
+        """
+        Returns the entry points of the group by name. Only reads the
+        package metadata, the providers are not imported.
+        """
+        if self.entry_points is None:
+            entry_points = {}
+            for entry_point in iter_entry_points(self.group):
+                if entry_point.name in self.builtins:
+                    self.logger.warning(
+                        "ignoring %s: built-in fn type", entry_point)
+                elif entry_point.name in entry_points:
+                    self.logger.warning(
+                        "ignoring %s: fn type already provided by %s",
+                        entry_point, entry_points[entry_point.name])
+                else:
+                    entry_points[entry_point.name] = entry_point
+            self.entry_points = entry_points
+        return self.entry_points
+
+
+FUNCTION_TYPES = dict((fn_type.name, fn_type) for fn_type in (
+    FunctionType('shutdown', 'shutdown', repeat=DROP, priority=CRITICAL),
+    FunctionType('play_pause', 'play_pause', repeat=DROP),
+    FunctionType('cdprev', 'cd_previous', repeat=DROP),
+    FunctionType('prev', 'previous', repeat=DROP),
+    FunctionType('next', 'next', repeat=DROP),
+    FunctionType('seek_bwd', 'seek_bwd',
+                 [Argument('seconds', float, 5, above=0)], MERGE, BULK),
+    FunctionType('seek_fwd', 'seek_fwd',
+                 [Argument('seconds', float, 5, above=0)], MERGE, BULK),
+    FunctionType('vol_down', 'volume_down',
+                 [Argument('vol_step', int, 5, minimum=1, maximum=100)],
+                 MERGE, BULK),
+    FunctionType('vol_up', 'volume_up',
+                 [Argument('vol_step', int, 5, minimum=1, maximum=100)],
+                 MERGE, BULK),
+    FunctionType('mute', 'mute_unmute', repeat=DROP),
+))
+
+REGISTRY = FunctionRegistry(FUNCTION_TYPES)
+
+
+def command_priority(name):
+    """
+    Returns the executor lane of the function type `name`,
+    :data:`INTERACTIVE` if there is no such function type.
+    """
+    try:
+        return REGISTRY[name].priority
+    except (KeyError, ValueError):
+        return INTERACTIVE
@@ -18,6 +18,16 @@ from collections import namedtuple
 from mopidy import config
 
 
+class BounceRange(namedtuple("BounceRange", ("minimum", "maximum"))):
+    """
+    The bounds of an adaptive bounce time in milliseconds.
+    """
+    __slots__ = ()
+
+    def __str__(self):
+        return "{:d}-{:d}".format(self.minimum, self.maximum)
+
+
 class GpioConfig(config.ConfigValue):
     """
     For serialization / deserialization of gpio config values
@@ -60,18 +70,7 @@ class GpioConfig(config.ConfigValue):
                              ))
 
         if len(val) > 1:
-            bounce_time = val[1].strip()
-            if bounce_time.lower() == "none":
-                bounce_time = None
-            else:
-                try:
-                    bounce_time = int(bounce_time)
-                except ValueError:
-                    raise ValueError("invalid bounce_time for gpio config: {}"
-                                     .format(bounce_time))
-                if bounce_time <= 0:
-                    raise ValueError("bounce_time must not be zero or"
-                                     + " negative: {}".format(bounce_time))
+            bounce_time = self.deserialize_bounce_time(val[1].strip())
 
         if len(val) > 2:
             hold_time = val[2].strip()
@@ -97,6 +96,32 @@ class GpioConfig(config.ConfigValue):
         return self.tuple_gpioconfig(pull_up_down, bounce_time,
                                      hold_time, hold_repeat)
 
+    def deserialize_bounce_time(self, bounce_time):
+        """
+        Deserializes a bounce time, which is either `none`, a number of
+        milliseconds or a range `<min>-<max>` of milliseconds for an adaptive
+        bounce time.
+        """
+        if bounce_time.lower() == "none":
+            return None
+        bounds = []
+        for bound in bounce_time.split('-', 1):
+            try:
+                bound = int(bound)
+            except ValueError:
+                raise ValueError("invalid bounce_time for gpio config: {}"
+                                 .format(bounce_time))
+            if bound <= 0:
+                raise ValueError("bounce_time must not be zero or"
+                                 + " negative: {}".format(bounce_time))
+            bounds.append(bound)
+        if len(bounds) == 1:
+            return bounds[0]
+        if bounds[0] >= bounds[1]:
+            raise ValueError("minimum of bounce_time must be less than the"
+                             + " maximum: {}".format(bounce_time))
+        return BounceRange(*bounds)
+
     def serialize(self, value, display=False):
         """
         Serializes a GpioConfig tuple to the corresponding string value.
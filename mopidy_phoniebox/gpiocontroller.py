@@ -14,86 +14,251 @@
 #  limitations under the License.
 #
 import logging
+from functools import partial
+
+from .chords import Chord, ChordDetector
+from .encoders import StepAccumulator
+from .executor import CommandExecutor, QUEUE
+from .functions import REGISTRY, command_priority
+from .inputs import DeviceButton
+from .pinmap import PinMap
+from .scheduler import Scheduler
+from .schema import parse_chord
+from .taps import TapCounter
+from .trace import EdgeRecorder
+
+# number of taps of the multi-tap actions
+TAP_ACTIONS = {
+    'when_double_pressed': 2,
+    'when_triple_pressed': 3,
+}
+
+# config keys which only take effect on a restart
+RESTART_KEYS = ('input_engine', 'edge_trace_file', 'edge_trace_records')
+
+
+class StagedButton(object):
+    """
+    Collects the new functions of a button while reloading the config. The
+    button keeps its old functions until :meth:`install` swaps them.
+    """
+    when_pressed = None
+    when_released = None
+    when_held = None
+
+    def __init__(self, btn):
+        self.btn = btn
+
+    @property
+    def was_held(self):
+        return self.btn.was_held
 
-from gpiozero import Button
+    @was_held.setter
+    def was_held(self, value):
+        self.btn.was_held = value
+
+    def install(self):
+        """
+        Assigns the collected functions to the button.
+        """
+        self.btn.when_pressed = self.when_pressed
+        self.btn.when_released = self.when_released
+        self.btn.when_held = self.when_held
 
 
 class GpioController:
     """
-    Sets up gpios and button functions
+    Sets up gpios and button functions.
+
+    The button callbacks only submit the assigned functions to a
+    :class:`CommandExecutor`, which executes them on its own thread, in the
+    lane of their function type, e.g. `shutdown` before `play_pause` before
+    `vol_up`. The functions are compiled once when the buttons are
+    configured, see :meth:`FunctionType.compile`.
+
+    The buttons are :class:`DeviceButton` fed by gpiozero input devices, or
+    with `input_engine = epoll` :class:`EdgeButton` fed by a single
+    :class:`EdgeMultiplexer`. Their hold and repeat deadlines are run by one
+    shared scheduler, so the number of threads does not grow with the number
+    of buttons.
+
+    Chords of buttons (`chord.gpio<N>+gpio<M>`) are detected by a
+    :class:`ChordDetector`, which is only set up if chords are configured.
+    Likewise the presses of a button are only counted by a
+    :class:`TapCounter` if it has multi-tap functions.
+
+    Rotary encoders (`encoder<N>`) are gpiozero `RotaryEncoder` devices,
+    whose steps are accumulated by a :class:`StepAccumulator`.
+
+    With `edge_trace_file` set, the raw edges of the buttons are recorded
+    by an :class:`EdgeRecorder`.
     """
-    Button.was_held = False
     config = None
     controls = None
+    executor = None
     gpios = None
+    pins = None
     logger = logging.getLogger(__name__)
-    fn_mapping = None
-
-    def __init__(self, config, controls):
+    fn_types = None
+    multiplexer = None
+    scheduler = None
+    chords = None
+    tap_counters = None
+    encoders = None
+    recorder = None
+
+    def __init__(self, config, controls, executor=None, scheduler=None,
+                 deferred=False):
+        """
+        :param config: the phoniebox config
+        :param controls: the :class:`PhonieboxControls`
+        :param executor: the :class:`CommandExecutor`, a new one with the
+                         lanes of the function types if None
+        :param scheduler: the scheduler of the gpiozero engine, a new
+                          :class:`Scheduler` if None
+        :param deferred: if True, the gpios are not opened until
+                         :meth:`setup` is called
+        """
         self.config = config
-        self.controls = GpioControls(controls)
-        self.gpios = [None] * 28
-
-        self.fn_mapping = {
-            "shutdown": self.controls.shutdown,
-            "play_pause": self.controls.play_pause,
-            "cdprev": self.controls.cd_previous,
-            "prev": self.controls.previous,
-            "next": self.controls.next,
-            "seek_bwd": self.controls.seek_bwd,
-            "seek_fwd": self.controls.seek_fwd,
-            "vol_down": self.controls.volume_down,
-            "vol_up": self.controls.volume_up,
-            "mute": self.controls.mute_unmute
-        }
+        self.controls = controls
+        if executor is None:
+            executor = CommandExecutor(priority=command_priority)
+        self.executor = executor
+        self.gpios = {}
+        self.fn_types = REGISTRY
+        self.tap_actions = {}
+        self.tap_counters = {}
+        self.encoders = {}
+
+        if config.get('input_engine') != 'epoll':
+            if scheduler is None:
+                scheduler = Scheduler()
+            self.scheduler = scheduler
+        if not deferred:
+            self.setup()
+
+    def setup(self):
+        """
+        Opens the gpios and assigns their functions. With the gpiozero
+        engine, gpiozero is only imported if a gpio or encoder is configured.
+        """
+        if self.config.get('input_engine') == 'epoll':
+            from .inputs import EdgeMultiplexer
+            self.multiplexer = EdgeMultiplexer.for_factory()
+            self.scheduler = self.multiplexer
         self.configure_gpios()
+        self.configure_recorder()
         self.configure_buttons()
+        self.configure_taps()
+        self.configure_chords()
+        self.configure_encoders()
+
+    def pin_map(self):
+        """
+        Returns the :class:`PinMap` of the current config, which is compiled
+        once per config.
+        """
+        if self.pins is None or self.pins.config is not self.config:
+            self.pins = PinMap(self.config)
+        return self.pins
 
     def configure_gpios(self):
         """
         Configures the gpios.
         """
-        for gpio in range(28):
-            key = "gpio{:d}".format(gpio)
-            try:
-                gpioconfig = self.config[key]
-            except KeyError:
-                continue
-            if gpioconfig is None:
-                continue
+        for gpio in self.pin_map():
+            btn = self.configure_gpio(gpio)
+            if btn is not None:
+                self.gpios[gpio] = btn
 
-            if gpioconfig.pull_up_down == "pull_up":
-                pull_up = True
-                active_state = None
-            elif gpioconfig.pull_up_down == "pull_down":
-                pull_up = False
-                active_state = None
-            elif gpioconfig.pull_up_down == "none_invert":
-                pull_up = None
-                active_state = False
-            else:  # none
-                pull_up = None
-                active_state = True
-
-            bounce_time = gpioconfig.bounce_time
-            if bounce_time is not None:
-                bounce_time = float(bounce_time) / 1000
-            hold_time = gpioconfig.hold_time
-            hold_repeat = gpioconfig.hold_repeat
-
-            self.gpios[gpio] = Button(gpio, pull_up, active_state,
-                                      bounce_time, hold_time, hold_repeat)
-
-    def configure_buttons(self):
-        """
-        Configures all button functions.
-        """
-        for gpio in range(28):
-            for action in "when_pressed", "when_released", "when_held":
-                try:
-                    self.configure_button(gpio, action)
-                except ValueError as e:
-                    self.logger.error(str(e))
+    def configure_gpio(self, gpio):
+        """
+        Creates the button of a gpio from its config.
+
+        :param gpio: the gpio number
+        :return: the button or None if the gpio is not configured
+        """
+        pin = self.pin_map().get(gpio)
+        if pin is None or pin.config is None:
+            return None
+        gpioconfig = pin.config
+
+        if gpioconfig.pull_up_down == "pull_up":
+            pull_up = True
+            active_state = None
+        elif gpioconfig.pull_up_down == "pull_down":
+            pull_up = False
+            active_state = None
+        elif gpioconfig.pull_up_down == "none_invert":
+            pull_up = None
+            active_state = False
+        else:  # none
+            pull_up = None
+            active_state = True
+
+        bounce_time = gpioconfig.bounce_time
+        if isinstance(bounce_time, tuple):
+            bounce_time = tuple(float(bound) / 1000
+                                for bound in bounce_time)
+        elif bounce_time is not None:
+            bounce_time = float(bounce_time) / 1000
+        hold_time = gpioconfig.hold_time
+        hold_repeat = gpioconfig.hold_repeat
+
+        return self.create_button(gpio, pull_up, active_state, bounce_time,
+                                  hold_time, hold_repeat)
+
+    def configure_recorder(self):
+        """
+        Sets up the edge recorder of the buttons if `edge_trace_file` is
+        configured.
+        """
+        path = self.config.get('edge_trace_file')
+        if not path:
+            return
+        capacity = self.config.get('edge_trace_records') or 65536
+        try:
+            self.recorder = EdgeRecorder(path, capacity,
+                                         flush_interval=1.0)
+        except (IOError, OSError) as e:
+            self.logger.error("cannot open edge trace {}: {}".format(path, e))
+            return
+        for btn in self.gpios.values():
+            btn.recorder = self.recorder
+        self.logger.info("recording edges to {}".format(path))
+
+    def create_button(self, gpio, *args):
+        """
+        Creates the button of a gpio, taking the arguments of gpiozero's
+        `Button`.
+        """
+        if self.multiplexer is not None:
+            return self.multiplexer.button(gpio, *args)
+        return DeviceButton(self.scheduler, gpio, *args)
+
+    def configure_buttons(self, gpios=None):
+        """
+        Configures all button functions. The multi-tap functions are
+        configured last, as they wrap the press functions.
+
+        :param gpios: the gpio numbers to configure the functions of, all
+                      configured gpios if None
+        """
+        pins = self.pin_map()
+        if gpios is None:
+            gpios = pins
+        for taps in False, True:
+            for gpio in gpios:
+                pin = pins.get(gpio)
+                if pin is None:
+                    continue
+                for action, fn_conf in pin.actions:
+                    if (action in TAP_ACTIONS) != taps:
+                        continue
+                    try:
+                        self.configure_button(gpio, action)
+                    except ValueError as e:
+                        self.logger.error(str(e))
 
     def configure_button(self, gpio, action):
         """
@@ -103,178 +268,406 @@ class GpioController:
         :param action: the action to configure (when_pressed or when_held)
         """
 
-        key = "gpio{:d}.{}".format(gpio, action)
-        try:
-            fn_conf = self.config[key]
-        except KeyError:
-            fn_conf = None
-
+        pin = self.pin_map().get(gpio)
+        fn_conf = pin.function(action) if pin is not None else None
         if fn_conf is None:
             return
 
-        try:
-            fn = self.fn_mapping[fn_conf.fn_type.strip()]
-        except KeyError:
-            raise ValueError(
-                    "cannot assign gpio{:d}.{}: unknown fn type '{}'".format(
-                        gpio, action, fn_conf.fn_type))
-
-        btn = self.gpios[gpio]
-        fn_type = fn_conf.fn_type
-        fn_args = fn_conf.fn_args
+        btn = self.gpios.get(gpio)
         if btn is None:
             raise ValueError(("cannot configure {:d}.{}"
                               + " - gpio{:d} not configured").format(
                                   gpio, action, gpio))
 
+        fn_type, fn = self.compile_function(
+            "gpio{:d}.{}".format(gpio, action), fn_conf)
+
         if action == 'when_pressed':
             if btn.when_pressed is not None:
                 raise ValueError(("cannot assign {} to gpio{:d}.when_pressed:"
                                   + " already assigned").format(
                                       fn_type, gpio))
-            btn.when_pressed = lambda: fn(**fn_args)
+            btn.when_pressed = partial(self.executor.submit, fn_type, fn)
         elif action == 'when_released':
             if btn.when_released is not None:
                 raise ValueError(("cannot assign {} to gpio{:d}.when_released:"
                                   + " already assigned").format(
                                       fn_type, gpio))
-            btn.when_released = lambda bt: self.on_released(bt, fn, **fn_args)
+            btn.when_released = partial(self.on_released, fn_type, fn)
         elif action == 'when_held':
             if btn.when_held is not None:
                 raise ValueError(("cannot assign {} to gpio{:d}.when_held:"
                                   + " already assigned").format(
                                       fn_type, gpio))
-            btn.when_held = lambda bt: self.on_held(bt, fn, **fn_args)
+            btn.when_held = partial(self.on_held, fn_type, fn)
+        elif action in TAP_ACTIONS:
+            self.tap_actions.setdefault(gpio, {})[TAP_ACTIONS[action]] = \
+                partial(self.executor.submit, fn_type, fn)
 
         self.logger.info("{} assigned to gpio{:d}.{}".format(
             fn_type, gpio, action))
 
-    def on_held(self, btn, fn, **fn_args):
+    def configure_taps(self, gpios=None):
         """
-        Wrapper around a buttons when_held fn.
+        Routes the presses of the buttons with multi-tap functions through a
+        :class:`TapCounter`. The single tap function is executed when the tap
+        window has closed. Buttons without multi-tap functions are left
+        alone, so their press functions are executed without delay.
 
-        :param btn: the button that was held
-        :param fn: the function to wrap
+        :param gpios: the gpio numbers to configure the taps of, all if None
         """
-        btn.was_held = True
-        self.logger.debug("{} is held".format(btn))
-        fn(**fn_args)
-
-    def on_released(self, btn, fn, **fn_args):
+        window = self.config.get('multi_tap_window')
+        if window is None:
+            window = 300
+        for gpio, actions in sorted(self.tap_actions.items()):
+            if gpios is not None and gpio not in gpios:
+                continue
+            btn = self.gpios[gpio]
+            actions[1] = btn.when_pressed
+            counter = TapCounter(self.scheduler, float(window) / 1000,
+                                 actions)
+            btn.when_pressed = counter.pressed
+            self.tap_counters[gpio] = counter
+
+    def compile_function(self, name, fn_conf):
         """
-        Wrapper around a buttons when_released fn. Only executes the wrapped
-        function when the button does not have a when_held function or the
-        button was not held previously.
+        Compiles a function config.
 
-        :param btn: the button that was released
-        :param fn: the function to wrap
+        :param name: the config key, used in error messages
+        :param fn_conf: the :class:`FunctionConfig` tuple
+        :return: the function type and the compiled function
+        :raises ValueError: on unknown function types or invalid arguments
         """
-        if btn.was_held:
-            btn.was_held = False
-            self.logger.debug("{} is released but was held".format(btn))
-        else:
-            self.logger.debug("{} is released and was not held".format(btn))
-            fn(**fn_args)
-
+        fn_type = fn_conf.fn_type.strip()
+        try:
+            function_type = self.fn_types[fn_type]
+        except KeyError:
+            raise ValueError(
+                    "cannot assign {}: unknown fn type '{}'".format(
+                        name, fn_conf.fn_type))
+        try:
+            fn = function_type.compile(self.controls, fn_conf.fn_args)
+        except ValueError as e:
+            raise ValueError("cannot assign {}: {}".format(name, e))
+        return fn_type, fn
 
-class GpioControls():
-    """
-    Wrapper around the `PhonieboxControls` which accepts `**kwargs` in it's
-    methods for passing optional parameters.
-    """
+    def configure_chords(self):
+        """
+        Configures the chords and routes the functions of their buttons
+        through a :class:`ChordDetector`.
+        """
+        keys = sorted(key for key in self.config
+                      if key.startswith('chord.')
+                      and not key.endswith('.grace_time'))
+        if not keys:
+            return
 
-    controls = None
+        detector = ChordDetector(self.scheduler, self.executor)
+        default_grace_time = self.config.get('chord_grace_time')
+        if default_grace_time is None:
+            default_grace_time = 100
+        for key in keys:
+            fn_conf = self.config[key]
+            if fn_conf is None:
+                continue
+            grace_time = self.config.get(key + '.grace_time')
+            if grace_time is None:
+                grace_time = default_grace_time
+            try:
+                gpios = parse_chord(key)
+                for gpio in gpios:
+                    if self.gpios.get(gpio) is None:
+                        raise ValueError(("cannot configure {}"
+                                          + " - gpio{:d} not configured")
+                                         .format(key, gpio))
+                fn_type, fn = self.compile_function(key, fn_conf)
+                detector.add(Chord(gpios, fn_type, fn,
+                                   float(grace_time) / 1000))
+            except ValueError as e:
+                self.logger.error(str(e))
+                continue
+            self.logger.info("{} assigned to {}".format(fn_type, key))
 
-    def __init__(self, controls):
-        self.controls = controls
+        if not detector.chords:
+            return
+        for gpio in sorted(detector.grace_times):
+            detector.wrap(gpio, self.gpios[gpio])
+        self.chords = detector
 
-    def shutdown(self, **kwargs):
-        """
-        Wraps `PhonieboxControls.shutdown()`. No optional parameters accepted.
+    def configure_encoders(self, keys=None):
         """
-        self.controls.shutdown()
+        Configures the rotary encoders and their functions.
 
-    def play_pause(self, **kwargs):
+        :param keys: the keys of the encoders to configure, all if None
         """
-        Wraps `PhonieboxControls.play_pause()`. No optional parameters
-        accepted.
-        """
-        self.controls.play_pause()
+        if keys is None:
+            keys = encoder_keys(self.config)
+        for key in sorted(keys):
+            encoder_conf = self.config.get(key)
+            if encoder_conf is None:
+                continue
+            try:
+                self.configure_encoder(key, encoder_conf)
+            except ValueError as e:
+                self.logger.error(str(e))
 
-    def cd_previous(self, **kwargs):
-        """
-        Wraps `PhonieboxControls.cd_previous()`. No optional parameters
-        accepted.
+    def configure_encoder(self, key, encoder_conf):
         """
-        self.controls.cd_previous()
+        Configures a rotary encoder.
 
-    def previous(self, **kwargs):
+        :param key: the config key of the encoder, e.g. `encoder0`
+        :param encoder_conf: the EncoderConfig tuple of the encoder
         """
-        Wraps `PhonieControls.previous()`. No optional parameters accepted.
-        """
-        self.controls.previous()
-
-    def next(self, **kwargs):
+        pins = encoder_conf.pin_a, encoder_conf.pin_b
+        used = [pin for encoder, _ in self.encoders.values()
+                for pin in (encoder.a.pin.number, encoder.b.pin.number)]
+        for pin in pins:
+            if pin in self.gpios or pin in used:
+                raise ValueError(("cannot configure {}"
+                                  + " - gpio{:d} already in use")
+                                 .format(key, pin))
+
+        functions = []
+        for action in ("when_rotated_clockwise",
+                       "when_rotated_counter_clockwise"):
+            name = "{}.{}".format(key, action)
+            fn_conf = self.config.get(name)
+            if fn_conf is None:
+                functions.append(None)
+                continue
+            functions.append(self.compile_function(name, fn_conf))
+            self.logger.info("{} assigned to {}".format(
+                functions[-1][0], name))
+        if functions == [None, None]:
+            raise ValueError("cannot configure {} - no functions assigned"
+                             .format(key))
+
+        accumulator = StepAccumulator(self.scheduler, self.executor,
+                                      functions[0], functions[1],
+                                      encoder_conf.acceleration)
+        from gpiozero import RotaryEncoder
+
+        encoder = RotaryEncoder(pins[0], pins[1], max_steps=0)
+        encoder.when_rotated_clockwise = accumulator.rotated_clockwise
+        encoder.when_rotated_counter_clockwise = \
+            accumulator.rotated_counter_clockwise
+        self.encoders[key] = encoder, accumulator
+
+    def reload(self, config):
         """
-        Wraps `PhonieControls.next()`. No optional parameters accepted.
+        Applies a changed config to the running buttons.
+
+        Only the gpios whose config changed are reopened. The functions of
+        a gpio are compiled again if one of them, or a chord or the tap
+        window they depend on, changed. The new functions are collected on
+        a :class:`StagedButton` and swapped in at once, so the gpios keep
+        their state and do not miss edges. Gpios which did not change are
+        not touched at all.
+
+        :param config: the new phoniebox config
+        :return: dict with the reopened and rebound gpios, whether the
+                 chords were rebuilt and the reconfigured encoders
         """
-        self.controls.next()
+        old = self.config
+        for key in RESTART_KEYS:
+            if old.get(key) != config.get(key):
+                self.logger.warning(
+                    "{} changed, restart mopidy to apply".format(key))
+
+        old_pins = self.pin_map()
+        new_pins = PinMap(config)
+        reopen = set()
+        dirty = set()
+        for gpio in set(old_pins) | set(new_pins):
+            old_pin = old_pins.get(gpio)
+            new_pin = new_pins.get(gpio)
+            if old_pin is None or new_pin is None:
+                dirty.add(gpio)
+                if (old_pin or new_pin).config is not None:
+                    reopen.add(gpio)
+                continue
+            if old_pin.config != new_pin.config:
+                reopen.add(gpio)
+                dirty.add(gpio)
+            elif old_pin.actions != new_pin.actions:
+                dirty.add(gpio)
+        if old.get('multi_tap_window') != config.get('multi_tap_window'):
+            dirty.update(self.tap_actions)
+
+        chorded = chord_gpios(old) | chord_gpios(config)
+        rebuild_chords = (chord_config(old) != chord_config(config)
+                          or bool(dirty & chorded))
+        if rebuild_chords:
+            dirty.update(chorded)
 
-    def seek_bwd(self, **kwargs):
-        """
-        Wraps `PhonieboxControls.seek_bwd()`. Uses the following optional
-        parameters:
+        self.config = config
+        self.pins = new_pins
+        for gpio in sorted(reopen):
+            btn = self.gpios.pop(gpio, None)
+            if btn is not None:
+                btn.close()
+            btn = self.configure_gpio(gpio)
+            if btn is not None:
+                if self.recorder is not None:
+                    btn.recorder = self.recorder
+                self.gpios[gpio] = btn
+
+        staged = {}
+        for gpio in dirty:
+            self.tap_actions.pop(gpio, None)
+            counter = self.tap_counters.pop(gpio, None)
+            if counter is not None:
+                counter.close()
+            if gpio in self.gpios:
+                staged[gpio] = self.gpios[gpio]
+                self.gpios[gpio] = StagedButton(staged[gpio])
+        try:
+            self.configure_buttons(sorted(dirty))
+            self.configure_taps(sorted(dirty))
+            if rebuild_chords:
+                if self.chords is not None:
+                    self.chords.close()
+                self.chords = None
+                self.configure_chords()
+        finally:
+            for gpio, btn in staged.items():
+                self.gpios[gpio].install()
+                self.gpios[gpio] = btn
+
+        encoders = set()
+        for key in encoder_keys(old) | encoder_keys(config):
+            prefix = key + '.'
+            if any(old.get(name) != config.get(name)
+                   for name in set(old) | set(config)
+                   if name == key or name.startswith(prefix)):
+                encoders.add(key)
+        for key in encoders:
+            if key in self.encoders:
+                encoder, accumulator = self.encoders.pop(key)
+                encoder.close()
+                accumulator.close()
+        self.configure_encoders(encoders)
+
+        result = {
+            'reopened': sorted(reopen),
+            'rebound': sorted(dirty - reopen),
+            'chords': rebuild_chords,
+            'encoders': sorted(encoders),
+        }
+        self.logger.info("config reloaded: {}".format(result))
+        return result
 
-        - `seconds`: The number of seconds to seek backwards
+    def on_held(self, fn_type, fn, btn):
         """
-        try:
-            seconds = kwargs['seconds']
-            self.controls.seek_bwd(seconds)
-        except KeyError:
-            self.controls.seek_bwd()
+        Wrapper around a buttons when_held fn. A repeat while the previous
+        call of the button is still in flight is merged or dropped according
+        to the repeat policy of the function type.
 
-    def seek_fwd(self, **kwargs):
+        :param fn_type: the function type of `fn`
+        :param fn: the compiled function to wrap
+        :param btn: the button that was held
         """
-        Wraps `PhonieboxControls.seek_fwd()`. Uses the following optional
-        parameters:
+        btn.was_held = True
+        self.logger.debug("%s is held", btn)
+        self.executor.submit_repeat((btn, fn_type), fn_type, fn,
+                                    self.repeat_policy(fn_type))
 
-        - `seconds`: The number of seconds to seek forwards
+    def repeat_policy(self, fn_type):
+        """
+        Returns the hold repeat policy of a function type, see
+        :meth:`CommandExecutor.submit_repeat`.
         """
         try:
-            seconds = kwargs['seconds']
-            self.controls.seek_fwd(seconds)
+            return self.fn_types[fn_type].repeat
         except KeyError:
-            self.controls.seek_fwd()
+            return QUEUE
 
-    def volume_down(self, **kwargs):
+    def on_released(self, fn_type, fn, btn):
         """
-        Wraps `PhonieboxControls.volume_down()`. Uses the following optional
-        parameters:
+        Wrapper around a buttons when_released fn. Only executes the wrapped
+        function when the button does not have a when_held function or the
+        button was not held previously.
 
-        - `vol_step`: The percentage to decrease the volume by.
+        :param fn_type: the function type of `fn`
+        :param fn: the compiled function to wrap
+        :param btn: the button that was released
         """
-        try:
-            vol_step = kwargs['vol_step']
-            self.controls.volume_down(vol_step)
-        except KeyError:
-            self.controls.volume_down()
+        if btn.was_held:
+            btn.was_held = False
+            self.logger.debug("%s is released but was held", btn)
+        else:
+            self.logger.debug("%s is released and was not held", btn)
+            self.executor.submit(fn_type, fn)
 
-    def volume_up(self, **kwargs):
+    def close(self):
+        """
+        Closes all gpios and stops the command executor.
         """
-        Wraps `PhonieboxControls.volume_up()`. Uses the following optional
-        parameters:
+        for btn in self.gpios.values():
+            btn.close()
+        self.gpios.clear()
+        for counter in self.tap_counters.values():
+            counter.close()
+        self.tap_counters.clear()
+        if self.chords is not None:
+            self.chords.close()
+        for encoder, accumulator in self.encoders.values():
+            encoder.close()
+            accumulator.close()
+        self.encoders.clear()
+        if self.multiplexer is not None:
+            self.multiplexer.close()
+        elif self.scheduler is not None:
+            self.scheduler.stop()
+        if self.recorder is not None:
+            self.recorder.close()
+        self.executor.stop()
+
+    def debounce_stats(self):
+        """
+        Returns the debounce statistics of the configured gpios by name,
+        see :meth:`Debouncer.stats`.
+        """
+        return dict(("gpio{:d}".format(gpio), btn.debouncer.stats())
+                    for gpio, btn in self.gpios.items())
 
-        - `vol_step`: The percentage to increase the volume by.
+    def log_debounce_stats(self):
         """
-        try:
-            vol_step = kwargs['vol_step']
-            self.controls.volume_up(vol_step)
-        except KeyError:
-            self.controls.volume_up()
+        Logs a summary of the glitches of every gpio which had glitches.
+        """
+        for gpio, btn in sorted(self.gpios.items()):
+            btn.debouncer.log_stats("gpio{:d}".format(gpio))
 
-    def mute_unmute(self, **kwargs):
+    def timer_stats(self):
         """
-        Wraps `PhonieboxControls.mute_unmute()`. No optional parameters
-        accepted.
+        Returns the statistics of the hold and repeat timers, see
+        :meth:`TimerQueue.stats`, or an empty dict before :meth:`setup`.
         """
-        self.controls.mute_unmute()
+        if self.scheduler is None:
+            return {}
+        return self.scheduler.stats()
+
+
+def chord_config(config):
+    """
+    Returns the chord settings of a config.
+    """
+    return dict((key, value) for key, value in config.items()
+                if key.startswith('chord.') or key == 'chord_grace_time')
+
+
+def chord_gpios(config):
+    """
+    Returns the gpio numbers of all chords of a config.
+    """
+    return set(gpio for key in config
+               if key.startswith('chord.') and not key.endswith('.grace_time')
+               for gpio in parse_chord(key))
+
+
+def encoder_keys(config):
+    """
+    Returns the keys of the rotary encoders of a config.
+    """
+    return set(key.split('.', 1)[0] for key in config
+               if key.startswith('encoder'))
@@ -0,0 +1,668 @@
+#
+#  Copyright 2019 Thomas Wunschel (https://github.com/wuschi)
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+import errno
+import fcntl
+import inspect
+import logging
+import os
+import select
+import struct
+import threading
+import time
+from functools import partial
+
+from .compat import monotonic
+from .debounce import Debouncer
+from .scheduler import TimerQueue
+
+
+def nonblocking_pipe():
+    """
+    Returns a pipe whose read end does not block.
+    """
+    read_fd, write_fd = os.pipe()
+    flags = fcntl.fcntl(read_fd, fcntl.F_GETFL)
+    fcntl.fcntl(read_fd, fcntl.F_SETFL, flags | os.O_NONBLOCK)
+    return read_fd, write_fd
+
+
+def read_available(fd, size=4096):
+    """
+    Reads everything available from a non-blocking file descriptor.
+    """
+    chunks = []
+    while True:
+        try:
+            chunk = os.read(fd, size)
+        except (IOError, OSError) as e:
+            if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                break
+            raise
+        if not chunk:
+            break
+        chunks.append(chunk)
+    return b''.join(chunks)
+
+
+def default_factory():
+    """
+    Returns gpiozero's pin factory, setting up the default one if there is
+    none yet. gpiozero is imported on the first call, so it is not loaded
+    unless a gpio is configured.
+    """
+    from gpiozero import Device
+
+    if Device.pin_factory is None:
+        Device.pin_factory = Device._default_pin_factory()
+    return Device.pin_factory
+
+
+def wrap_callback(fn, device):
+    """
+    Returns `fn` if it can be called without arguments, otherwise `fn` bound
+    to `device`, like gpiozero does for its event handlers.
+    """
+    if fn is None:
+        return None
+    args = ()
+    wrapped = fn
+    while isinstance(wrapped, partial):
+        args = wrapped.args + args
+        wrapped = wrapped.func
+    try:
+        inspect.getcallargs(wrapped, *args)
+        return fn
+    except TypeError:
+        return partial(fn, device)
+
+
+class MockEdgeSource:
+    """
+    Stand-in for :class:`SysfsEdgeSource` on gpiozero's MockFactory.
+
+    The mock pins report their edges synchronously in the driving thread, so
+    they are written to a pipe, which the multiplexer watches like the sysfs
+    value files.
+    """
+    record = struct.Struct(str('<Hd?'))
+    # the pipe is readable while edges are pending
+    events = select.EPOLLIN
+
+    def __init__(self, factory=None):
+        self.factory = factory or default_factory()
+        self.read_fd, self.write_fd = nonblocking_pipe()
+        self.pins = {}
+        self.handlers = {}
+        self.buffer = b''
+
+    def open(self, gpio, pull):
+        """
+        Sets up `gpio` as input with `pull` and returns the file descriptor
+        to watch and the current value.
+        """
+        pin = self.factory.pin(gpio)
+        pin.function = 'input'
+        pin.pull = pull
+        pin.edges = 'both'
+        # the pin only keeps a weak reference to its handler
+        self.handlers[gpio] = handler = partial(self.changed, gpio)
+        pin.when_changed = handler
+        self.pins[gpio] = pin
+        return self.read_fd, int(pin.state)
+
+    def level(self, gpio):
+        """
+        Returns the current level of `gpio` or None if it is not open.
+        """
+        pin = self.pins.get(gpio)
+        return None if pin is None else int(pin.state)
+
+    def changed(self, gpio, ticks, state):
+        os.write(self.write_fd, self.record.pack(gpio, monotonic(),
+                                                 bool(state)))
+
+    def read(self, fd):
+        """
+        Returns the pending edges as list of (gpio, value, timestamp).
+        """
+        data = self.buffer + read_available(fd)
+        size = self.record.size
+        complete = len(data) - len(data) % size
+        self.buffer = data[complete:]
+        edges = []
+        for offset in range(0, complete, size):
+            gpio, timestamp, state = self.record.unpack_from(data, offset)
+            edges.append((gpio, int(state), timestamp))
+        return edges
+
+    def close(self, gpio):
+        pin = self.pins.pop(gpio, None)
+        self.handlers.pop(gpio, None)
+        if pin is not None:
+            pin.when_changed = None
+
+    def shutdown(self):
+        for gpio in list(self.pins):
+            self.close(gpio)
+        os.close(self.read_fd)
+        os.close(self.write_fd)
+
+
+class SysfsEdgeSource:
+    """
+    Reads the edges of the gpios from the sysfs value files. The pull
+    resistors are set up through the gpiozero pin factory, which does not
+    get to see the edges.
+    """
+    path = '/sys/class/gpio'
+    # the value files are always readable, an edge is signalled as priority
+    # event
+    events = select.EPOLLPRI | select.EPOLLERR
+    logger = logging.getLogger(__name__)
+
+    def __init__(self, factory=None):
+        self.factory = factory or default_factory()
+        self.base = self.find_base()
+        self.pins = {}
+        self.files = {}
+        self.gpios = {}
+
+    def find_base(self):
+        """
+        Returns the sysfs number of gpio 0 of the SoC gpio chip, which is not
+        0 on newer kernels.
+        """
+        try:
+            chips = [name for name in os.listdir(self.path)
+                     if name.startswith('gpiochip')]
+        except OSError:
+            return 0
+        for chip in sorted(chips):
+            try:
+                with open(os.path.join(self.path, chip, 'label')) as f:
+                    label = f.read().strip()
+                with open(os.path.join(self.path, chip, 'base')) as f:
+                    base = int(f.read().strip())
+            except (IOError, OSError, ValueError):
+                continue
+            if label.startswith('pinctrl-bcm'):
+                return base
+        return 0
+
+    def write(self, name, value):
+        with open(os.path.join(self.path, name), 'w') as f:
+            f.write(value)
+
+    def open(self, gpio, pull):
+        """
+        Exports `gpio` as input with edge detection and returns the file
+        descriptor to watch and the current value.
+        """
+        pin = self.factory.pin(gpio)
+        pin.function = 'input'
+        pin.pull = pull
+        self.pins[gpio] = pin
+
+        number = self.base + gpio
+        name = 'gpio{:d}'.format(number)
+        if not os.path.exists(os.path.join(self.path, name)):
+            self.write('export', str(number))
+        # udev may need a moment to grant access to the new files
+        for _ in range(50):
+            try:
+                self.write(os.path.join(name, 'direction'), 'in')
+                self.write(os.path.join(name, 'edge'), 'both')
+                break
+            except (IOError, OSError):
+                time.sleep(0.01)
+        else:
+            raise IOError("cannot set up edge detection on gpio{:d}".format(
+                gpio))
+
+        fd = os.open(os.path.join(self.path, name, 'value'), os.O_RDONLY)
+        self.files[gpio] = fd
+        self.gpios[fd] = gpio
+        return fd, self.read_value(fd)
+
+    def level(self, gpio):
+        """
+        Returns the current level of `gpio` or None if it is not open. The
+        level is read through the pin factory, reading the value file would
+        consume its pending edge.
+        """
+        pin = self.pins.get(gpio)
+        return None if pin is None else int(pin.state)
+
+    def read_value(self, fd):
+        os.lseek(fd, 0, os.SEEK_SET)
+        return int(os.read(fd, 2)[:1])
+
+    def read(self, fd):
+        """
+        Returns the edge of the gpio as list of (gpio, value, timestamp).
+        """
+        return [(self.gpios[fd], self.read_value(fd), monotonic())]
+
+    def close(self, gpio):
+        fd = self.files.pop(gpio, None)
+        if fd is not None:
+            del self.gpios[fd]
+            os.close(fd)
+            try:
+                self.write('unexport', str(self.base + gpio))
+            except (IOError, OSError) as e:
+                self.logger.debug("cannot unexport gpio%d: %s", gpio, e)
+        pin = self.pins.pop(gpio, None)
+        if pin is not None:
+            pin.close()
+
+    def shutdown(self):
+        for gpio in list(self.files):
+            self.close(gpio)
+
+
+class EdgeMultiplexer:
+    """
+    Watches the edges of all configured pins from a single thread with a
+    single epoll set, instead of gpiozero's per button machinery.
+
+    The edges are timestamped when they are read and dispatched in
+    timestamp order to their :class:`EdgeButton`. The multiplexer is also
+    the scheduler of the buttons: their hold and repeat deadlines run on the
+    same thread from a :class:`TimerQueue`, in order with the edges.
+
+    :param source: the edge source, :class:`SysfsEdgeSource` or
+                   :class:`MockEdgeSource`, whose file descriptors are
+                   watched for its epoll `events`
+    """
+    logger = logging.getLogger(__name__)
+    clock = staticmethod(monotonic)
+
+    def __init__(self, source):
+        self.source = source
+        self.epoll = select.epoll()
+        self.buttons = {}
+        self.fds = set()
+        self.lock = threading.Lock()
+        self.timers = TimerQueue()
+        self.edges = 0
+        self.running = True
+        self.wake_read, self.wake_write = nonblocking_pipe()
+        self.epoll.register(self.wake_read, select.EPOLLIN)
+        self.thread = threading.Thread(target=self.run,
+                                       name='PhonieboxEdgeMultiplexer')
+        self.thread.daemon = True
+        self.thread.start()
+
+    @classmethod
+    def for_factory(cls, factory=None):
+        """
+        Creates a multiplexer with the edge source matching the gpiozero pin
+        factory.
+        """
+        from gpiozero.pins.mock import MockFactory
+
+        factory = factory or default_factory()
+        if isinstance(factory, MockFactory):
+            return cls(MockEdgeSource(factory))
+        return cls(SysfsEdgeSource(factory))
+
+    def button(self, gpio, pull_up=True, active_state=None, bounce_time=None,
+               hold_time=1, hold_repeat=False):
+        """
+        Creates an :class:`EdgeButton` on `gpio`, taking the same arguments
+        as gpiozero's `Button`.
+        """
+        btn = MultiplexedButton(self, gpio, pull_up, active_state,
+                                bounce_time, hold_time, hold_repeat)
+        with self.lock:
+            if gpio in self.buttons:
+                raise ValueError("gpio{:d} is already in use".format(gpio))
+            fd, value = self.source.open(gpio, btn.pull)
+            self.buttons[gpio] = btn
+            btn.value = value
+            if fd not in self.fds:
+                self.fds.add(fd)
+                self.epoll.register(fd, self.source.events)
+        return btn
+
+    def remove(self, btn):
+        """
+        Stops watching the gpio of `btn`.
+        """
+        with self.lock:
+            if self.buttons.get(btn.pin) is btn:
+                del self.buttons[btn.pin]
+                self.source.close(btn.pin)
+
+    def schedule(self, when, callback):
+        """
+        Calls `callback` on the multiplexer thread at the monotonic time
+        `when`.
+
+        :return: the :class:`Timer`, which can be cancelled
+        """
+        with self.timers.lock:
+            timer, earliest = self.timers.push(when, callback)
+        if earliest and threading.current_thread() is not self.thread:
+            self.wake()
+        return timer
+
+    def call_later(self, delay, callback):
+        """
+        Calls `callback` on the multiplexer thread in `delay` seconds.
+        """
+        return self.schedule(self.clock() + delay, callback)
+
+    def wake(self):
+        os.write(self.wake_write, b'x')
+
+    def sync(self, timeout=None):
+        """
+        Blocks until the edges that happened before the call have been
+        dispatched.
+
+        :return: False if the timeout expired
+        """
+        done = threading.Event()
+        self.schedule(monotonic(), done.set)
+        return done.wait(timeout)
+
+    def stats(self):
+        """
+        Returns the timer statistics, see :meth:`TimerQueue.stats`, and the
+        number of dispatched edges.
+        """
+        stats = self.timers.stats()
+        stats['edges'] = self.edges
+        return stats
+
+    def log_stats(self):
+        self.timers.log_stats()
+
+    def run(self):
+        """
+        Dispatches the edges and deadlines until closed.
+        """
+        while self.running:
+            with self.timers.lock:
+                timeout = self.timers.timeout()
+            try:
+                events = self.epoll.poll(-1 if timeout is None else timeout)
+            except (IOError, OSError) as e:
+                if e.errno == errno.EINTR:
+                    continue
+                raise
+            self.timers.wakeups += 1
+            edges = []
+            for fd, _ in events:
+                if fd == self.wake_read:
+                    read_available(fd)
+                    continue
+                with self.lock:
+                    edges.extend(self.source.read(fd))
+            edges.sort(key=lambda edge: edge[2])
+            for gpio, value, timestamp in edges:
+                self.timers.run_due(timestamp)
+                btn = self.buttons.get(gpio)
+                if btn is not None:
+                    self.edges += 1
+                    btn.edge(value, timestamp)
+            self.timers.run_due(monotonic())
+
+    def close(self):
+        """
+        Stops the multiplexer thread and releases the gpios.
+        """
+        self.running = False
+        if self.thread.is_alive():
+            self.wake()
+            self.thread.join()
+        with self.lock:
+            self.buttons.clear()
+            self.source.shutdown()
+        self.epoll.close()
+        os.close(self.wake_read)
+        os.close(self.wake_write)
+
+
+class EdgeButton(object):
+    """
+    A button fed with edges, with the hold and repeat deadlines run by a
+    shared scheduler. Provides the parts of gpiozero's `Button` used by the
+    :class:`GpioController`: the `when_pressed`, `when_released` and
+    `when_held` handlers, `hold_time`, `hold_repeat` and `close()`.
+
+    The edges are debounced in software by a :class:`Debouncer`. Unlike
+    gpiozero, `bounce_time` may also be a tuple of the minimum and maximum
+    window in seconds to let the window adapt to the pin. When an edge is
+    rejected, the pin level is read again when the window closes, and the
+    missed edge is emitted if the pin stayed at the rejected level.
+
+    :param scheduler: the :class:`Scheduler` or :class:`EdgeMultiplexer`
+    """
+    was_held = False
+    # the EdgeRecorder of the raw edges, if tracing
+    recorder = None
+
+    def __init__(self, scheduler, pin, pull_up=True, active_state=None,
+                 bounce_time=None, hold_time=1, hold_repeat=False):
+        if pull_up is None:
+            if active_state is None:
+                raise ValueError("active_state must be set if pull_up is "
+                                 + "None")
+            self.active_value = int(bool(active_state))
+            self.pull = 'floating'
+        else:
+            self.active_value = 0 if pull_up else 1
+            self.pull = 'up' if pull_up else 'down'
+        self.scheduler = scheduler
+        self.pin = pin
+        self.pull_up = pull_up
+        self.bounce_time = bounce_time
+        if isinstance(bounce_time, tuple):
+            self.debouncer = Debouncer(*bounce_time)
+        else:
+            self.debouncer = Debouncer(bounce_time or 0)
+        self.hold_time = hold_time
+        self.hold_repeat = hold_repeat
+        self.lock = threading.Lock()
+        self.value = None
+        self.pressed_at = None
+        self.hold_timer = None
+        self.settle_timer = None
+        self.closed = False
+        self._when_pressed = self._when_released = self._when_held = None
+        self._call_pressed = self._call_released = self._call_held = None
+
+    def __repr__(self):
+        return '<{} gpio{:d} pull={}>'.format(
+            self.__class__.__name__, self.pin, self.pull)
+
+    @property
+    def when_pressed(self):
+        return self._when_pressed
+
+    @when_pressed.setter
+    def when_pressed(self, fn):
+        self._when_pressed = fn
+        self._call_pressed = wrap_callback(fn, self)
+
+    @property
+    def when_released(self):
+        return self._when_released
+
+    @when_released.setter
+    def when_released(self, fn):
+        self._when_released = fn
+        self._call_released = wrap_callback(fn, self)
+
+    @property
+    def when_held(self):
+        return self._when_held
+
+    @when_held.setter
+    def when_held(self, fn):
+        self._when_held = fn
+        self._call_held = wrap_callback(fn, self)
+
+    @property
+    def is_pressed(self):
+        return self.value == self.active_value
+
+    def level(self):
+        """
+        Returns the current level of the pin, or None if it cannot be read.
+        """
+        return None
+
+    def edge(self, value, timestamp):
+        """
+        Handles an edge of the pin value at the monotonic time `timestamp`.
+        """
+        if self.recorder is not None:
+            self.recorder.record(self.pin, value, timestamp)
+        self.update(value, timestamp)
+
+    def update(self, value, timestamp, debounce=True):
+        """
+        Debounces a change of the pin value and calls the handlers.
+
+        :param debounce: False if the window has closed already, e.g. for
+                         the level read after a rejected edge
+        """
+        with self.lock:
+            if value == self.value:
+                return
+            if not debounce:
+                self.debouncer.force(timestamp)
+            elif not self.debouncer.accept(timestamp):
+                if self.settle_timer is None and not self.closed:
+                    self.settle_timer = self.scheduler.schedule(
+                        self.debouncer.closes_at(), self.settle)
+                return
+            self.value = value
+            pressed = self.is_pressed
+            if pressed:
+                self.pressed_at = timestamp
+                if self._call_held is not None:
+                    self.hold_timer = self.scheduler.schedule(
+                        timestamp + self.hold_time, self.held)
+            else:
+                self.pressed_at = None
+                if self.hold_timer is not None:
+                    self.hold_timer.cancel()
+                    self.hold_timer = None
+        if pressed:
+            if self._call_pressed is not None:
+                self._call_pressed()
+        elif self._call_released is not None:
+            self._call_released()
+
+    def settle(self):
+        """
+        Called by the scheduler when the debounce window after a rejected
+        edge has closed. Emits the edge if the pin stayed at its level.
+        """
+        with self.lock:
+            self.settle_timer = None
+            if self.closed:
+                return
+            level = self.level()
+        if level is not None:
+            self.update(level, self.scheduler.clock(), False)
+
+    def held(self):
+        """
+        Called by the scheduler when the hold time has passed. The pin is
+        read again, so a missed release does not keep the button held.
+        """
+        with self.lock:
+            timer = self.hold_timer
+            self.hold_timer = None
+            if timer is None or not self.is_pressed:
+                return
+            level = self.level()
+            released = level is not None and level != self.active_value
+            if self.hold_repeat and not released:
+                self.hold_timer = self.scheduler.schedule(
+                    timer.when + self.hold_time, self.held)
+            call_held = self._call_held
+        if released:
+            self.update(level, self.scheduler.clock())
+        elif call_held is not None:
+            call_held()
+
+    def close(self):
+        with self.lock:
+            if self.hold_timer is not None:
+                self.hold_timer.cancel()
+                self.hold_timer = None
+            if self.settle_timer is not None:
+                self.settle_timer.cancel()
+                self.settle_timer = None
+            self.closed = True
+
+
+class MultiplexedButton(EdgeButton):
+    """
+    An :class:`EdgeButton` fed by an :class:`EdgeMultiplexer`, which is also
+    its scheduler. The handlers are called on the multiplexer thread.
+    """
+
+    def level(self):
+        return self.scheduler.source.level(self.pin)
+
+    def close(self):
+        EdgeButton.close(self)
+        self.scheduler.remove(self)
+
+
+class DeviceButton(EdgeButton):
+    """
+    An :class:`EdgeButton` fed by a gpiozero `DigitalInputDevice`, which
+    unlike gpiozero's `Button` does not start a hold thread. The hold and
+    repeat deadlines run on the shared :class:`Scheduler`.
+    """
+
+    def __init__(self, scheduler, pin, pull_up=True, active_state=None,
+                 bounce_time=None, hold_time=1, hold_repeat=False):
+        from gpiozero import DigitalInputDevice
+
+        EdgeButton.__init__(self, scheduler, pin, pull_up, active_state,
+                            bounce_time, hold_time, hold_repeat)
+        # debounced by the Debouncer, which also counts the glitches
+        self.device = DigitalInputDevice(pin, pull_up=pull_up,
+                                         active_state=active_state)
+        self.value = self.pin_value(self.device.is_active)
+        self.device.when_activated = self.activated
+        self.device.when_deactivated = self.deactivated
+
+    def pin_value(self, active):
+        return self.active_value if active else 1 - self.active_value
+
+    def level(self):
+        return self.pin_value(self.device.is_active)
+
+    def activated(self):
+        self.edge(self.active_value, self.scheduler.clock())
+
+    def deactivated(self):
+        self.edge(1 - self.active_value, self.scheduler.clock())
+
+    def close(self):
+        EdgeButton.close(self)
+        self.device.close()
@@ -0,0 +1,258 @@
+#
+#  Copyright 2019 Thomas Wunschel (https://github.com/wuschi)
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+import bisect
+import logging
+import threading
+
+from .compat import Queue, monotonic
+
+
+DISPATCH = 'dispatch'
+DECISION = 'decision'
+ACK = 'ack'
+STAGES = (DISPATCH, DECISION, ACK)
+
+# upper bounds of the histogram buckets in milliseconds
+BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+_local = threading.local()
+
+
+def mark(stage):
+    """
+    Records the latency from the gpio edge to `stage` for the command that
+    is executed on the current thread. Does nothing if no command is traced.
+
+    :param stage: one of `DISPATCH` or `DECISION`
+    """
+    trace = current()
+    if trace is not None:
+        trace.mark(stage)
+
+
+def current():
+    """
+    Returns the :class:`Trace` of the command that is executed on the
+    current thread, or None if no command is traced. Used to acknowledge a
+    command whose core call is made later on another thread.
+    """
+    return getattr(_local, 'trace', None)
+
+
+def acknowledge(future, trace=None):
+    """
+    Records the latency from the gpio edge to the resolution of `future` for
+    the command that is executed on the current thread, without waiting for
+    the future. Does nothing if no command is traced.
+
+    :param future: the core future of the command
+    :param trace: the :class:`Trace` of the command, if it was executed on
+                  another thread, see :func:`current`
+    """
+    if trace is None:
+        trace = current()
+    if trace is not None and future is not None:
+        trace.stats.acknowledge(trace, future)
+
+
+class Histogram:
+    """
+    Latency histogram with fixed buckets.
+    """
+
+    def __init__(self, bounds=BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value):
+        """
+        Adds a latency in milliseconds.
+        """
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def percentile(self, percent):
+        """
+        Returns the upper bound of the bucket containing the given
+        percentile, or the maximum if it is in the overflow bucket.
+        """
+        if self.count == 0:
+            return None
+        rank = percent * self.count / 100.0
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count > 0:
+                if index < len(self.bounds):
+                    return min(self.bounds[index], self.max)
+                break
+        return self.max
+
+    def snapshot(self):
+        """
+        Returns the histogram as dict.
+        """
+        return {
+            'count': self.count,
+            'mean': self.total / self.count if self.count > 0 else None,
+            'p50': self.percentile(50),
+            'p99': self.percentile(99),
+            'max': self.max,
+            'buckets': dict(zip([str(b) for b in self.bounds] + ['inf'],
+                                self.counts)),
+        }
+
+
+class Trace:
+    """
+    The timestamps of a single command, starting at the gpio edge.
+    """
+
+    def __init__(self, stats, fn_type, edge):
+        self.stats = stats
+        self.fn_type = fn_type
+        self.edge = edge
+        self.marked = set()
+
+    def mark(self, stage):
+        """
+        Records the latency of `stage` once per command.
+        """
+        if stage not in self.marked:
+            self.marked.add(stage)
+            self.stats.record(self.fn_type, stage,
+                              (monotonic() - self.edge) * 1000)
+
+
+class LatencyStats:
+    """
+    Collects the latencies of the button commands per function type in
+    histograms. For every command, the latencies from the gpio edge to the
+    following stages are recorded:
+
+    - `dispatch`: the command is dispatched by the `CommandExecutor`
+    - `decision`: the `PhonieboxControls` decided what to do
+    - `ack`: the core resolved the future of the resulting call
+
+    The resolution of core futures is awaited on a separate thread, so the
+    commands never block for the instrumentation.
+    """
+    logger = logging.getLogger(__name__)
+
+    def __init__(self, bounds=BUCKETS):
+        self.bounds = bounds
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.acks = Queue()
+        self.ack_thread = None
+
+    def begin(self, fn_type, edge):
+        """
+        Starts tracing a command on the current thread.
+
+        :param fn_type: the function type of the command
+        :param edge: the monotonic timestamp of the gpio edge
+        """
+        _local.trace = Trace(self, fn_type, edge)
+        return _local.trace
+
+    def end(self):
+        """
+        Stops tracing the command on the current thread.
+        """
+        _local.trace = None
+
+    def record(self, fn_type, stage, latency):
+        """
+        Records a latency in milliseconds.
+        """
+        with self.lock:
+            histogram = self.histograms.get((fn_type, stage))
+            if histogram is None:
+                histogram = Histogram(self.bounds)
+                self.histograms[(fn_type, stage)] = histogram
+            histogram.add(latency)
+
+    def acknowledge(self, trace, future):
+        """
+        Records the `ack` stage of `trace` when `future` is resolved.
+        """
+        with self.lock:
+            if self.ack_thread is None:
+                self.ack_thread = threading.Thread(
+                    target=self.run_acks, name='PhonieboxLatencyAck')
+                self.ack_thread.daemon = True
+                self.ack_thread.start()
+        self.acks.put((trace, future))
+
+    def run_acks(self):
+        """
+        Waits for the acknowledged futures in order until stopped.
+        """
+        while True:
+            item = self.acks.get()
+            if item is None:
+                return
+            trace, future = item
+            try:
+                future.get(timeout=10)
+            except Exception as e:
+                self.logger.debug("%s not acknowledged: %s",
+                                  trace.fn_type, e)
+                continue
+            trace.mark(ACK)
+
+    def stop(self):
+        """
+        Stops waiting for acknowledgements.
+        """
+        with self.lock:
+            thread = self.ack_thread
+            self.ack_thread = None
+        if thread is not None:
+            self.acks.put(None)
+            thread.join()
+
+    def snapshot(self):
+        """
+        Returns the histograms as dict of function types to dicts of stages
+        to histogram dicts.
+        """
+        result = {}
+        with self.lock:
+            for (fn_type, stage), histogram in self.histograms.items():
+                result.setdefault(fn_type, {})[stage] = histogram.snapshot()
+        return result
+
+    def log(self):
+        """
+        Logs a summary line per function type.
+        """
+        snapshot = self.snapshot()
+        if len(snapshot) == 0:
+            self.logger.info("no button latencies recorded")
+        for fn_type in sorted(snapshot):
+            stages = snapshot[fn_type]
+            self.logger.info("latency %s: %s", fn_type, ", ".join(
+                "{} n={} p50={:.1f}ms p99={:.1f}ms max={:.1f}ms".format(
+                    stage, stages[stage]['count'], stages[stage]['p50'],
+                    stages[stage]['p99'], stages[stage]['max'])
+                for stage in STAGES if stage in stages))
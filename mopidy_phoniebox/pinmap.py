@@ -0,0 +1,89 @@
+#
+#  Copyright 2019 Thomas Wunschel (https://github.com/wuschi)
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+import re
+from collections import namedtuple
+
+# matches the keys `gpio<N>` and `gpio<N>.<action>`
+GPIO_KEY_PATTERN = re.compile(r'^gpio(\d+)(?:\.(when_[a-z_]+))?$')
+
+
+class Pin(namedtuple('Pin', ('gpio', 'config', 'actions'))):
+    """
+    The settings of a configured gpio: its number, its `GpioConfig` tuple
+    or None and its function configs as sorted `(action, FunctionConfig)`
+    tuples.
+    """
+    __slots__ = ()
+
+    def function(self, action):
+        """
+        Returns the function config of an action or None.
+        """
+        for name, fn_conf in self.actions:
+            if name == action:
+                return fn_conf
+        return None
+
+
+class PinMap:
+    """
+    The configured gpios of a phoniebox config, compiled once into a sparse
+    map from the gpio number to its :class:`Pin`. Only gpios with a
+    `gpio<N>` setting or a function appear in the map, so iterating it does
+    not depend on the number of pins of the board, and any gpio number is
+    accepted.
+
+    :param config: the phoniebox config
+    """
+
+    def __init__(self, config):
+        self.config = config
+        settings = {}
+        actions = {}
+        for key, value in config.items():
+            if value is None:
+                continue
+            match = GPIO_KEY_PATTERN.match(key)
+            if match is None:
+                continue
+            gpio = int(match.group(1))
+            if match.group(2) is None:
+                settings[gpio] = value
+            else:
+                actions.setdefault(gpio, []).append((match.group(2), value))
+        self.pins = dict(
+            (gpio, Pin(gpio, settings.get(gpio),
+                       tuple(sorted(actions.get(gpio, ())))))
+            for gpio in set(settings) | set(actions))
+        self.gpios = tuple(sorted(self.pins))
+
+    def __getitem__(self, gpio):
+        return self.pins[gpio]
+
+    def __contains__(self, gpio):
+        return gpio in self.pins
+
+    def __iter__(self):
+        return iter(self.gpios)
+
+    def __len__(self):
+        return len(self.gpios)
+
+    def get(self, gpio):
+        """
+        Returns the :class:`Pin` of a gpio or None if it is not configured.
+        """
+        return self.pins.get(gpio)
@@ -0,0 +1,242 @@
+#
+#  Copyright 2019 Thomas Wunschel (https://github.com/wuschi)
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+import heapq
+import itertools
+import logging
+import threading
+
+from .compat import monotonic
+from .latency import Histogram
+
+# upper bounds of the drift histogram buckets in milliseconds
+DRIFT_BUCKETS = (0.1, 0.2, 0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+class Timer:
+    """
+    A deadline in a :class:`TimerQueue`.
+    """
+    cancelled = False
+
+    def __init__(self, when, callback):
+        self.when = when
+        self.callback = callback
+
+    def cancel(self):
+        """
+        Cancels the timer. The callback is not called if it has not been
+        called yet.
+        """
+        self.cancelled = True
+
+
+class TimerQueue:
+    """
+    A heap of deadlines, run by the thread owning the queue.
+
+    The drift between the deadline and the time the callback is actually
+    called is recorded in a histogram. The deadlines are on the time of
+    `clock()`, which is the monotonic clock unless replaying a trace, see
+    :class:`ManualScheduler`.
+    """
+    logger = logging.getLogger(__name__)
+    clock = staticmethod(monotonic)
+
+    def __init__(self, bounds=DRIFT_BUCKETS):
+        self.lock = threading.Lock()
+        self.heap = []
+        self.sequence = itertools.count()
+        self.drift = Histogram(bounds)
+        self.wakeups = 0
+
+    def push(self, when, callback):
+        """
+        Adds a deadline at the monotonic time `when`. Must be called with
+        the lock held.
+
+        :return: the :class:`Timer` and whether it is the earliest deadline
+        """
+        timer = Timer(when, callback)
+        heapq.heappush(self.heap, (when, next(self.sequence), timer))
+        return timer, self.heap[0][2] is timer
+
+    def timeout(self):
+        """
+        Returns the seconds until the earliest deadline or None if there is
+        none. Must be called with the lock held.
+        """
+        while self.heap and self.heap[0][2].cancelled:
+            heapq.heappop(self.heap)
+        if not self.heap:
+            return None
+        return max(self.heap[0][0] - self.clock(), 0)
+
+    def run_due(self, until):
+        """
+        Calls the callbacks of the deadlines up to the monotonic time
+        `until`, in order. Must be called without the lock held.
+        """
+        while True:
+            with self.lock:
+                if not self.heap or self.heap[0][0] > until:
+                    return
+                timer = heapq.heappop(self.heap)[2]
+            if timer.cancelled:
+                continue
+            self.drift.add(max(self.clock() - timer.when, 0) * 1000)
+            try:
+                timer.callback()
+            except Exception:
+                self.logger.exception("error in timer callback")
+
+    def stats(self):
+        """
+        Returns the number of pending deadlines, the number of wakeups of
+        the owning thread and the drift histogram as dict.
+        """
+        with self.lock:
+            pending = sum(1 for entry in self.heap if not entry[2].cancelled)
+        return {
+            'pending': pending,
+            'wakeups': self.wakeups,
+            'drift': self.drift.snapshot(),
+        }
+
+    def log_stats(self):
+        """
+        Logs a summary of the timer drift.
+        """
+        drift = self.drift.snapshot()
+        if drift['count'] > 0:
+            self.logger.info(
+                "timers: %d fired, %d wakeups, drift p50 %.1f ms, "
+                "p99 %.1f ms, max %.1f ms", drift['count'], self.wakeups,
+                drift['p50'], drift['p99'], drift['max'])
+
+
+class Scheduler(TimerQueue):
+    """
+    Runs the hold and repeat deadlines of all buttons on a single thread,
+    instead of a hold thread per button. The thread is started with the
+    first deadline and only wakes up when a deadline is due or an earlier
+    one has been added.
+    """
+
+    def __init__(self, bounds=DRIFT_BUCKETS):
+        TimerQueue.__init__(self, bounds)
+        self.condition = threading.Condition(self.lock)
+        self.thread = None
+        self.running = True
+
+    def schedule(self, when, callback):
+        """
+        Calls `callback` on the scheduler thread at the monotonic time
+        `when`.
+
+        :return: the :class:`Timer`, which can be cancelled
+        """
+        with self.lock:
+            timer, earliest = self.push(when, callback)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run,
+                                               name='PhonieboxScheduler')
+                self.thread.daemon = True
+                self.thread.start()
+            elif earliest:
+                self.condition.notify()
+        return timer
+
+    def call_later(self, delay, callback):
+        """
+        Calls `callback` on the scheduler thread in `delay` seconds.
+        """
+        return self.schedule(self.clock() + delay, callback)
+
+    def run(self):
+        """
+        Runs the deadlines until stopped.
+        """
+        while True:
+            with self.lock:
+                while self.running:
+                    timeout = self.timeout()
+                    if timeout == 0:
+                        break
+                    self.condition.wait(timeout)
+                    self.wakeups += 1
+                if not self.running:
+                    return
+            self.run_due(self.clock())
+
+    def stop(self):
+        """
+        Stops the scheduler thread, pending deadlines are dropped.
+        """
+        with self.lock:
+            self.running = False
+            self.condition.notify()
+            thread = self.thread
+        if thread is not None:
+            thread.join()
+
+
+class ManualScheduler(TimerQueue):
+    """
+    A scheduler on virtual time, which runs the deadlines on the calling
+    thread when the time is advanced. Used to replay edge traces as fast as
+    possible, but with the timing of the trace.
+
+    :param now: the initial virtual time
+    """
+
+    def __init__(self, now=0.0, bounds=DRIFT_BUCKETS):
+        TimerQueue.__init__(self, bounds)
+        self.now = now
+
+    def clock(self):
+        return self.now
+
+    def schedule(self, when, callback):
+        """
+        Calls `callback` when the time is advanced to `when`.
+
+        :return: the :class:`Timer`, which can be cancelled
+        """
+        with self.lock:
+            return self.push(when, callback)[0]
+
+    def call_later(self, delay, callback):
+        return self.schedule(self.now + delay, callback)
+
+    def advance(self, until):
+        """
+        Advances the time to `until`, calling the callbacks of the deadlines
+        on the way at their time.
+        """
+        while True:
+            with self.lock:
+                if self.timeout() is None or self.heap[0][0] > until:
+                    break
+                self.now = max(self.now, self.heap[0][0])
+            self.run_due(self.now)
+        self.now = max(self.now, until)
+
+    def stop(self):
+        """
+        Drops the pending deadlines.
+        """
+        with self.lock:
+            del self.heap[:]
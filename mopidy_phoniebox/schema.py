@@ -0,0 +1,88 @@
+#
+#  Copyright 2019 Thomas Wunschel (https://github.com/wuschi)
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+import re
+
+from mopidy import config
+
+from .encoderconfig import EncoderConfig
+from .functionconfig import FunctionConfig
+from .gpioconfig import GpioConfig
+
+# the functions of a gpio, `gpio<N>.<action>`
+GPIO_ACTIONS = ('when_pressed', 'when_released', 'when_held',
+                'when_double_pressed', 'when_triple_pressed')
+
+
+class PhonieboxConfigSchema(config.ConfigSchema):
+    """
+    Config schema of the phoniebox section. Besides the fixed keys it accepts
+    the keys of any gpio number, the chord keys, which are named after the
+    gpios of the chord, and the rotary encoder keys:
+
+    - `gpio<N>`: the settings of the button
+    - `gpio<N>.when_pressed`, `gpio<N>.when_held`, ...: the functions of the
+      button
+    - `chord.gpio<N>+gpio<M>[+...]`: the function of the chord
+    - `chord.gpio<N>+gpio<M>[+...].grace_time`: the grace window of the
+      chord in milliseconds
+    - `encoder<N>`: the pins of the encoder
+    - `encoder<N>.when_rotated_clockwise` /
+      `encoder<N>.when_rotated_counter_clockwise`: the functions of the
+      encoder
+    """
+    gpio_pattern = re.compile(r'^gpio\d+$')
+    gpio_function_pattern = re.compile(
+        r'^gpio\d+\.(' + '|'.join(GPIO_ACTIONS) + ')$')
+    chord_pattern = re.compile(r'^chord\.gpio\d+(\+gpio\d+)+$')
+    grace_time_pattern = re.compile(
+        r'^chord\.gpio\d+(\+gpio\d+)+\.grace_time$')
+    encoder_pattern = re.compile(r'^encoder\d+$')
+    encoder_function_pattern = re.compile(
+        r'^encoder\d+\.when_rotated_(counter_)?clockwise$')
+
+    def __missing__(self, key):
+        if self.gpio_pattern.match(key):
+            return GpioConfig()
+        if self.gpio_function_pattern.match(key):
+            return FunctionConfig()
+        if self.chord_pattern.match(key):
+            return FunctionConfig()
+        if self.grace_time_pattern.match(key):
+            return config.Integer(minimum=0)
+        if self.encoder_pattern.match(key):
+            return EncoderConfig()
+        if self.encoder_function_pattern.match(key):
+            return FunctionConfig()
+        raise KeyError(key)
+
+    def serialize(self, values, display=False):
+        result = super(PhonieboxConfigSchema, self).serialize(values, display)
+        for key in sorted(values):
+            if key not in result and key.startswith(
+                    ('gpio', 'chord.', 'encoder')):
+                try:
+                    result[key] = self[key].serialize(values[key], display)
+                except KeyError:
+                    pass
+        return result
+
+
+def parse_chord(key):
+    """
+    Returns the gpio numbers of a chord key like `chord.gpio13+gpio19`.
+    """
+    return [int(gpio[len('gpio'):])
+            for gpio in key[len('chord.'):].split('+')]
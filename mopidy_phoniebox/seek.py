@@ -0,0 +1,120 @@
+#
+#  Copyright 2019 Thomas Wunschel (https://github.com/wuschi)
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+import logging
+import threading
+
+from . import latency
+from .statecache import StateCache
+
+
+class SeekAccumulator:
+    """
+    Accumulates seek requests into a single seek.
+
+    The first request of a burst starts a window of `window` seconds. All
+    requests within the window are applied to a target position, which is
+    based on the position estimate of the :class:`StateCache` and clamped to
+    the current track, and a single `seek()` is sent when the window closes,
+    which acknowledges all requests of the burst.
+    """
+    logger = logging.getLogger(__name__)
+
+    def __init__(self, core, state, window=0.3):
+        self.core = core
+        self.state = state
+        self.window = window
+        self.lock = threading.Lock()
+        self.target = None
+        self.length = None
+        self.traces = []
+        self.timer = None
+        self.seeks = 0
+
+    def seek(self, delta):
+        """
+        Moves the target position by `delta` milliseconds.
+
+        :param delta: the number of milliseconds to seek by, negative values
+                      seek backwards
+        :return: the new target position or None if there is no current track
+        """
+        position = None
+        with self.lock:
+            pending = self.target is not None
+        if not pending:
+            tl_track = self.state.get(StateCache.CURRENT_TL_TRACK)
+            if tl_track is None:
+                return None
+            length = tl_track.track.length if tl_track.track else None
+            position = self.state.time_position()
+
+        with self.lock:
+            if self.target is not None:
+                position = self.target
+                length = self.length
+            if position is not None:
+                target = max(position + delta, 0)
+                if length is not None:
+                    target = min(target, length)
+                self.target = target
+                self.length = length
+                trace = latency.current()
+                if trace is not None:
+                    self.traces.append(trace)
+                if self.timer is None:
+                    self.timer = threading.Timer(self.window, self.flush)
+                    self.timer.daemon = True
+                    self.timer.start()
+        if position is None:
+            # flushed in the meantime, start over from the estimate
+            return self.seek(delta)
+        return target
+
+    def flush(self):
+        """
+        Sends the accumulated seek to the core immediately.
+        """
+        with self.lock:
+            target = self.target
+            traces = self.traces
+            timer = self.timer
+            self.target = None
+            self.length = None
+            self.traces = []
+            self.timer = None
+        if timer is not None:
+            timer.cancel()
+        if target is None:
+            return
+
+        self.logger.debug("seeking to %s", target)
+        self.state.seeked(target)
+        future = self.core.playback.seek(target)
+        for trace in traces:
+            latency.acknowledge(future, trace)
+        self.seeks += 1
+
+    def stop(self):
+        """
+        Cancels a pending seek.
+        """
+        with self.lock:
+            timer = self.timer
+            self.target = None
+            self.traces = []
+            self.timer = None
+        if timer is not None:
+            timer.cancel()
@@ -0,0 +1,336 @@
+#
+#  Copyright 2019 Thomas Wunschel (https://github.com/wuschi)
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+import logging
+import threading
+
+from mopidy.audio import PlaybackState
+
+import pykka
+
+from .compat import monotonic
+
+
+class StateCache:
+    """
+    Caches the playback and mixer state of the mopidy core.
+
+    The cache is fed by the core events forwarded from the
+    :class:`PhonieboxFrontend`, so the controls can decide what to do without
+    a blocking round trip to the core actor. A value is only fetched from the
+    core when it is cold (never seen or invalidated) or stale (older than
+    `max_age` seconds, if set). Volatile values like the time position are
+    never cached. Instead, :meth:`time_position` extrapolates the position
+    from the last known position and the monotonic clock.
+
+    Use :meth:`get_all` to look up several values at once: the requests for
+    all missing values are sent to the core up front and resolved together,
+    so a cache miss costs a single round trip.
+    """
+    logger = logging.getLogger(__name__)
+
+    PLAYBACK_STATE = 'playback_state'
+    VOLUME = 'volume'
+    MUTE = 'mute'
+    CURRENT_TL_TRACK = 'current_tl_track'
+    TRACKLIST = 'tracklist'
+    TIME_POSITION = 'time_position'
+
+    volatile = frozenset([TIME_POSITION])
+
+    def __init__(self, core, max_age=None):
+        self.core = core
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.position_anchor = None
+        self.fetchers = {
+            self.PLAYBACK_STATE: lambda: self.core.playback.get_state(),
+            self.VOLUME: lambda: self.core.mixer.get_volume(),
+            self.MUTE: lambda: self.core.mixer.get_mute(),
+            self.CURRENT_TL_TRACK:
+                lambda: self.core.playback.get_current_tl_track(),
+            self.TRACKLIST: lambda: self.core.tracklist.get_tl_tracks(),
+            self.TIME_POSITION:
+                lambda: self.core.playback.get_time_position(),
+        }
+        self.converters = {
+            self.TRACKLIST: TracklistIndex,
+        }
+
+    def lookup(self, key):
+        """
+        Returns a `(hit, value)` tuple for the given key without contacting
+        the core. `hit` is False if the value is cold or stale.
+
+        :param key: the state key
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+        if entry is None:
+            return False, None
+        value, timestamp = entry
+        if self.max_age is not None and \
+                monotonic() - timestamp > self.max_age:
+            return False, None
+        return True, value
+
+    def get(self, key):
+        """
+        Returns the cached value for the given key, fetching it from the core
+        if the cache is cold or stale.
+
+        :param key: the state key
+        """
+        return self.get_all(key)[0]
+
+    def get_all(self, *keys):
+        """
+        Returns a list with the values for the given keys. All values that
+        are cold or stale are requested from the core at once and resolved
+        together.
+
+        :param keys: the state keys
+        """
+        values = {}
+        missing = []
+        for key in keys:
+            hit, value = self.lookup(key)
+            if hit:
+                values[key] = value
+            elif key not in missing:
+                missing.append(key)
+
+        if len(missing) > 0:
+            started = monotonic()
+            futures = [self.fetchers[key]() for key in missing]
+            for key, value in zip(missing, pykka.get_all(futures)):
+                value = self.convert(key, value)
+                self.logger.debug("state cache miss for %s, fetched %s",
+                                  key, value)
+                values[key] = value
+                self.update(key, value, since=started)
+
+        return [values[key] for key in keys]
+
+    def convert(self, key, value):
+        """
+        Converts a value fetched from the core to the cached representation,
+        e.g. the tracklist to a :class:`TracklistIndex`.
+
+        :param key: the state key
+        :param value: the value fetched from the core
+        """
+        converter = self.converters.get(key)
+        if converter is None:
+            return value
+        return converter(value)
+
+    def update(self, key, value, since=None):
+        """
+        Stores a value in the cache.
+
+        :param key: the state key
+        :param value: the new value
+        :param since: if set, the value is only stored when the entry has not
+                      been updated after this timestamp (used for fetched
+                      values, which may be older than a concurrent event)
+        """
+        if key in self.volatile:
+            return
+        now = monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if since is not None and entry is not None and entry[1] > since:
+                return
+            self.entries[key] = (value, now)
+
+    def invalidate(self, *keys):
+        """
+        Invalidates the given keys or the whole cache if no keys are given.
+        """
+        with self.lock:
+            if len(keys) == 0:
+                self.entries.clear()
+                self.position_anchor = None
+            for key in keys:
+                self.entries.pop(key, None)
+
+    def anchor_position(self, time_position, playing, since=None):
+        """
+        Stores the last known time position.
+
+        :param time_position: the time position in milliseconds
+        :param playing: True if the position advances
+        :param since: if set, the position is only stored when it has not
+                      been updated after this timestamp
+        """
+        now = monotonic()
+        with self.lock:
+            anchor = self.position_anchor
+            if since is not None and anchor is not None and anchor[1] > since:
+                return
+            self.position_anchor = (time_position, now, playing)
+
+    def time_position(self):
+        """
+        Returns the estimated time position in milliseconds. The position is
+        extrapolated from the last known position if playing, and fetched
+        from the core if no position is known.
+        """
+        with self.lock:
+            anchor = self.position_anchor
+        if anchor is None:
+            started = monotonic()
+            state, time_position = self.get_all(self.PLAYBACK_STATE,
+                                                self.TIME_POSITION)
+            self.anchor_position(time_position,
+                                 state == PlaybackState.PLAYING,
+                                 since=started)
+            return time_position
+
+        time_position, timestamp, playing = anchor
+        if playing:
+            time_position += int((monotonic() - timestamp) * 1000)
+        return time_position
+
+    def playback_state_changed(self, old_state, new_state):
+        """
+        Updates the cache from the core's `playback_state_changed` event.
+        """
+        self.update(self.PLAYBACK_STATE, new_state)
+        if new_state == PlaybackState.STOPPED:
+            with self.lock:
+                self.position_anchor = None
+
+    def volume_changed(self, volume):
+        """
+        Updates the cache from the core's `volume_changed` event.
+        """
+        self.update(self.VOLUME, volume)
+
+    def mute_changed(self, mute):
+        """
+        Updates the cache from the core's `mute_changed` event.
+        """
+        self.update(self.MUTE, mute)
+
+    def track_playback_started(self, tl_track):
+        """
+        Updates the cache from the core's `track_playback_started` event.
+        """
+        self.update(self.CURRENT_TL_TRACK, tl_track)
+        self.anchor_position(0, True)
+
+    def track_changing(self, tl_track):
+        """
+        Writes the track through which a track change sent to the core is
+        expected to play. The core reports it as current only when its
+        stream has started, so the next press would otherwise still see the
+        previous track.
+
+        :param tl_track: the expected track
+        """
+        self.update(self.CURRENT_TL_TRACK, tl_track)
+        self.seeked(0)
+
+    def track_playback_paused(self, tl_track, time_position):
+        """
+        Updates the time position from the core's `track_playback_paused`
+        event.
+        """
+        self.anchor_position(time_position, False)
+
+    def track_playback_resumed(self, tl_track, time_position):
+        """
+        Updates the time position from the core's `track_playback_resumed`
+        event.
+        """
+        self.anchor_position(time_position, True)
+
+    def seeked(self, time_position):
+        """
+        Updates the time position from the core's `seeked` event.
+        """
+        hit, state = self.lookup(self.PLAYBACK_STATE)
+        if hit:
+            playing = state == PlaybackState.PLAYING
+        else:
+            with self.lock:
+                anchor = self.position_anchor
+            playing = anchor is not None and anchor[2]
+        self.anchor_position(time_position, playing)
+
+    def track_playback_ended(self, tl_track, time_position):
+        """
+        Invalidates the current track on the core's `track_playback_ended`
+        event, as the core may have no current track afterwards.
+        """
+        self.invalidate(self.CURRENT_TL_TRACK)
+        with self.lock:
+            self.position_anchor = None
+
+    def tracklist_changed(self):
+        """
+        Invalidates the tracklist state on the core's `tracklist_changed`
+        event.
+        """
+        self.invalidate(self.TRACKLIST, self.CURRENT_TL_TRACK)
+
+
+class TracklistIndex:
+    """
+    Index of the tracklist: the ordered tlids of the tracklist and a map of
+    each tlid to its position, so the neighbours of a track can be looked up
+    locally. tlids are unique, but not positions: they keep increasing when
+    tracks are added to the tracklist.
+    """
+
+    def __init__(self, tl_tracks):
+        self.tl_tracks = tuple(tl_tracks)
+        self.tlids = tuple(tl_track.tlid for tl_track in self.tl_tracks)
+        self.positions = dict(
+            (tlid, position) for position, tlid in enumerate(self.tlids))
+
+    def __len__(self):
+        return len(self.tlids)
+
+    def __repr__(self):
+        return "TracklistIndex({})".format(list(self.tlids))
+
+    def index(self, tlid):
+        """
+        Returns the 0-based position of the given tlid in the tracklist or
+        None if it is not in the tracklist.
+        """
+        return self.positions.get(tlid)
+
+    def tl_track(self, position):
+        """
+        Returns the track at the given 0-based position.
+        """
+        return self.tl_tracks[position]
+
+    def first(self):
+        """
+        Returns the tlid of the first track or None if the tracklist is empty.
+        """
+        return self.tlids[0] if len(self.tlids) > 0 else None
+
+    def last(self):
+        """
+        Returns the tlid of the last track or None if the tracklist is empty.
+        """
+        return self.tlids[-1] if len(self.tlids) > 0 else None
@@ -0,0 +1,93 @@
+#
+#  Copyright 2019 Thomas Wunschel (https://github.com/wuschi)
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+import threading
+from functools import partial
+
+
+class TapCounter:
+    """
+    Counts the taps of a button with multi-tap functions.
+
+    Every press restarts the tap window. When the window closes, the
+    function for the number of taps is executed, or the single tap function
+    once per tap if there is no function for that number. Reaching the
+    highest configured number of taps executes its function right away.
+
+    :param scheduler: the scheduler running the tap windows
+    :param window: the tap window in seconds
+    :param actions: the callables without parameters by number of taps, the
+                    single tap action may be None
+    """
+
+    def __init__(self, scheduler, window, actions):
+        self.scheduler = scheduler
+        self.window = window
+        self.actions = actions
+        self.max_taps = max(actions)
+        self.lock = threading.Lock()
+        self.taps = 0
+        self.timer = None
+
+    def pressed(self):
+        """
+        Counts a tap, called when the button is pressed.
+        """
+        now = self.scheduler.clock()
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            self.taps += 1
+            taps = self.taps
+            if taps < self.max_taps:
+                self.timer = self.scheduler.schedule(
+                    now + self.window, partial(self.expired, taps))
+                return
+            self.taps = 0
+        self.fire(taps)
+
+    def expired(self, taps):
+        """
+        Called by the scheduler when the tap window after the `taps`th tap
+        has closed.
+        """
+        with self.lock:
+            if self.timer is None or self.taps != taps:
+                return
+            self.timer = None
+            taps = self.taps
+            self.taps = 0
+        self.fire(taps)
+
+    def close(self):
+        """
+        Cancels the open tap window, its taps are dropped.
+        """
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            self.taps = 0
+
+    def fire(self, taps):
+        action = self.actions.get(taps)
+        if action is not None:
+            action()
+            return
+        single = self.actions.get(1)
+        if single is not None:
+            for _ in range(taps):
+                single()
@@ -0,0 +1,282 @@
+#
+#  Copyright 2019 Thomas Wunschel (https://github.com/wuschi)
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+import logging
+import struct
+import threading
+import time
+
+from .compat import monotonic
+
+MAGIC = b'PBXT'
+VERSION = 2
+# magic, version, capacity in records, number of records ever written
+HEADER = struct.Struct('<4sHIQ')
+# gpio, pin level, monotonic timestamp
+RECORD = struct.Struct('<HBd')
+
+
+class EdgeRecorder:
+    """
+    Records the raw edges of the buttons to a ring file.
+
+    The file holds the last `capacity` edges as fixed size records after a
+    header, which counts the edges ever written. An existing trace with the
+    same capacity is continued, so the edges before a restart are kept.
+    The edges are buffered and written in one go by a writer thread
+    `flush_interval` seconds after the first buffered edge, which keeps the
+    writes to the SD card rare and the edge callbacks cheap. A slow write
+    never delays the input threads.
+
+    :param path: the path of the trace file
+    :param capacity: the number of edges kept
+    :param flush_interval: the maximum delay of a write in seconds, or None
+                           to only flush on :meth:`flush` and :meth:`close`
+    """
+    logger = logging.getLogger(__name__)
+
+    def __init__(self, path, capacity=65536, flush_interval=None):
+        self.path = path
+        self.capacity = capacity
+        self.flush_interval = flush_interval
+        self.condition = threading.Condition()
+        self.write_lock = threading.Lock()
+        self.buffer = []
+        self.running = True
+        self.thread = None
+        self.count = 0
+        self.file = self.open()
+
+    def open(self):
+        """
+        Opens the trace file, continuing a trace of the same capacity.
+        """
+        try:
+            f = open(self.path, 'r+b')
+        except IOError:
+            f = None
+        if f is not None:
+            header = f.read(HEADER.size)
+            if len(header) == HEADER.size:
+                magic, version, capacity, count = HEADER.unpack(header)
+                if (magic == MAGIC and version == VERSION
+                        and capacity == self.capacity):
+                    self.count = count
+                    return f
+            f.close()
+            self.logger.info("starting new edge trace {}".format(self.path))
+        f = open(self.path, 'w+b')
+        f.write(HEADER.pack(MAGIC, VERSION, self.capacity, 0))
+        f.truncate(HEADER.size + self.capacity * RECORD.size)
+        f.flush()
+        return f
+
+    def record(self, gpio, value, timestamp):
+        """
+        Buffers an edge.
+
+        :param gpio: the gpio number
+        :param value: the pin level, 0 or 1
+        :param timestamp: the monotonic time of the edge
+        """
+        with self.condition:
+            self.buffer.append(RECORD.pack(gpio, value, timestamp))
+            if (len(self.buffer) == 1 and self.running
+                    and self.flush_interval is not None):
+                self.start()
+                self.condition.notify_all()
+
+    def start(self):
+        """
+        Starts the writer thread if not started yet. Must be called with the
+        condition held.
+        """
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run,
+                                           name='PhonieboxEdgeRecorder')
+            self.thread.daemon = True
+            self.thread.start()
+
+    def run(self):
+        """
+        Writes the buffered edges `flush_interval` seconds after the first
+        one until closed.
+        """
+        while True:
+            with self.condition:
+                while not self.buffer and self.running:
+                    self.condition.wait()
+                if not self.running:
+                    return
+                self.condition.wait(self.flush_interval)
+            self.flush()
+
+    def flush(self):
+        """
+        Writes the buffered edges to the file.
+        """
+        with self.condition:
+            records = self.buffer
+            self.buffer = []
+            if not records or self.file is None:
+                return
+            # only the last capacity records survive anyway
+            start = self.count + max(len(records) - self.capacity, 0)
+            self.count += len(records)
+            count = self.count
+            records = records[-self.capacity:]
+        try:
+            self.write(start, records, count)
+        except (IOError, OSError) as e:
+            self.logger.error("cannot write edge trace {}: {}".format(
+                self.path, e))
+
+    def write(self, start, records, count):
+        """
+        Writes `records` to the ring, starting at the `start`th edge, and
+        the new number of edges `count` to the header. The edge callbacks
+        are not blocked while writing.
+        """
+        with self.write_lock:
+            if self.file is None:
+                return
+            position = start % self.capacity
+            while records:
+                chunk = records[:self.capacity - position]
+                records = records[len(chunk):]
+                self.file.seek(HEADER.size + position * RECORD.size)
+                self.file.write(b''.join(chunk))
+                position = 0
+            self.file.seek(0)
+            self.file.write(HEADER.pack(MAGIC, VERSION, self.capacity,
+                                        count))
+            self.file.flush()
+
+    def close(self):
+        """
+        Stops the writer thread, writes the buffered edges and closes the
+        file.
+        """
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+            thread = self.thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+        self.flush()
+        with self.write_lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+
+def read_trace(path):
+    """
+    Reads the edges of a trace file, oldest first.
+
+    :return: list of `(gpio, value, timestamp)` tuples
+    """
+    with open(path, 'rb') as f:
+        header = f.read(HEADER.size)
+        if len(header) != HEADER.size:
+            raise ValueError("not an edge trace: {}".format(path))
+        magic, version, capacity, count = HEADER.unpack(header)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("not an edge trace: {}".format(path))
+        data = f.read(capacity * RECORD.size)
+    records = [RECORD.unpack_from(data, index * RECORD.size)
+               for index in range(min(count, capacity))]
+    if count > capacity:
+        position = count % capacity
+        records = records[position:] + records[:position]
+    return records
+
+
+class TraceReplayer:
+    """
+    Replays the edges of a trace through gpiozero's `MockFactory`.
+
+    In real time the edges are driven with the delays of the trace. As fast
+    as possible they are driven back to back, and the controller runs on a
+    :class:`ManualScheduler` which is advanced to the timestamp of every
+    edge, so debouncing, hold and repeat timers, taps and chords see the
+    timing of the trace. Time going backwards in the trace, e.g. because
+    the box was restarted and the trace continued, counts as a pause of
+    `restart_gap` seconds, and the following edges are shifted, so their
+    delays are kept.
+
+    :param records: the edges, see :func:`read_trace`
+    :param factory: the `MockFactory` of the controller
+    """
+
+    # longer than the hold, tap and chord windows, so the sessions before
+    # and after a restart do not interact
+    restart_gap = 10.0
+
+    def __init__(self, records, factory):
+        self.records = records
+        self.factory = factory
+
+    def timeline(self):
+        """
+        Yields the edges with the timestamps made monotonic.
+        """
+        previous = None
+        offset = 0.0
+        for gpio, value, timestamp in self.records:
+            timestamp += offset
+            if previous is not None and timestamp < previous:
+                shift = previous + self.restart_gap - timestamp
+                offset += shift
+                timestamp += shift
+            previous = timestamp
+            yield gpio, value, timestamp
+
+    def drive(self, gpio, value):
+        pin = self.factory.pin(gpio)
+        if value:
+            pin.drive_high()
+        else:
+            pin.drive_low()
+
+    def replay(self, scheduler=None, speed=1.0, tail=5.0):
+        """
+        Replays the edges.
+
+        :param scheduler: the :class:`ManualScheduler` of the controller to
+                          replay as fast as possible, or None to replay in
+                          real time
+        :param speed: the speed factor of a real time replay
+        :param tail: the seconds the scheduler is advanced after the last
+                     edge, to run the pending timers
+        :return: the number of edges driven
+        """
+        started = monotonic()
+        first = None
+        edges = 0
+        for gpio, value, timestamp in self.timeline():
+            if first is None:
+                first = timestamp
+            if scheduler is not None:
+                scheduler.advance(timestamp)
+            else:
+                delay = started + (timestamp - first) / speed - monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            self.drive(gpio, value)
+            edges += 1
+        if scheduler is not None and first is not None:
+            scheduler.advance(scheduler.now + tail)
+        return edges
@@ -0,0 +1,162 @@
+#
+#  Copyright 2019 Thomas Wunschel (https://github.com/wuschi)
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+import logging
+import threading
+
+from . import latency
+from .compat import monotonic
+from .statecache import StateCache
+
+
+class VolumeCoalescer:
+    """
+    Coalesces volume changes into absolute mixer writes.
+
+    Only one `set_volume` call is in flight at any time. Changes made while
+    a write is in flight are applied to a pending absolute target, which is
+    written as soon as the previous write has finished, so a burst of
+    changes turns into as few mixer writes as possible. Every change is
+    clamped to 0..100 in order, so the result is exactly the same as if the
+    changes had been written one by one. The commands whose changes are
+    carried by a write are acknowledged when the write is resolved.
+    """
+    logger = logging.getLogger(__name__)
+
+    default_volume = 50
+
+    def __init__(self, core, state):
+        self.core = core
+        self.state = state
+        self.condition = threading.Condition()
+        self.pending = None
+        self.traces = []
+        self.written = None
+        self.in_flight = False
+        self.running = True
+        self.writes = 0
+        self.thread = None
+
+    def adjust(self, delta):
+        """
+        Changes the volume by `delta` percent without waiting for the mixer.
+
+        :param delta: the volume change in percent
+        :return: the new absolute volume target
+        """
+        with self.condition:
+            base = self.base()
+        if base is None:
+            base = self.state.get(StateCache.VOLUME)
+            if base is None:
+                base = self.default_volume
+
+        with self.condition:
+            # prefer a target set by another thread in the meantime
+            current = self.base()
+            if current is not None:
+                base = current
+            target = min(max(base + delta, 0), 100)
+            self.pending = target
+            trace = latency.current()
+            if trace is not None:
+                self.traces.append(trace)
+            if not self.in_flight:
+                self.in_flight = True
+                self.start()
+                self.condition.notify_all()
+        return target
+
+    def base(self):
+        """
+        Returns the target the next change is based on, or None if no write
+        is pending or in flight. Must be called with the condition held.
+        """
+        if self.pending is not None:
+            return self.pending
+        if self.in_flight:
+            return self.written
+        return None
+
+    def start(self):
+        """
+        Starts the writer thread if not started yet. Must be called with the
+        condition held.
+        """
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run,
+                                           name='PhonieboxVolumeCoalescer')
+            self.thread.daemon = True
+            self.thread.start()
+
+    def run(self):
+        """
+        Writes the pending targets to the mixer until stopped.
+        """
+        while True:
+            with self.condition:
+                while self.pending is None and self.running:
+                    self.in_flight = False
+                    self.condition.notify_all()
+                    self.condition.wait()
+                if self.pending is None:
+                    self.in_flight = False
+                    self.condition.notify_all()
+                    return
+                target = self.pending
+                traces = self.traces
+                self.pending = None
+                self.traces = []
+                self.written = target
+
+            self.state.update(StateCache.VOLUME, target)
+            try:
+                future = self.core.mixer.set_volume(target)
+                for trace in traces:
+                    latency.acknowledge(future, trace)
+                future.get()
+            except Exception:
+                self.logger.exception("error setting volume to %s", target)
+            self.writes += 1
+
+    def wait(self, timeout=None):
+        """
+        Blocks until all changes have been written to the mixer.
+
+        :param timeout: the maximum time to wait in seconds
+        :return: True if all changes have been written, False if the timeout
+                 expired before
+        """
+        deadline = None if timeout is None else monotonic() + timeout
+        with self.condition:
+            while self.in_flight:
+                remaining = None
+                if deadline is not None:
+                    remaining = deadline - monotonic()
+                    if remaining <= 0:
+                        return False
+                self.condition.wait(remaining)
+            return True
+
+    def stop(self):
+        """
+        Stops the writer thread after the pending change has been written.
+        """
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+            thread = self.thread
+        if thread is not None:
+            thread.join()
@@ -0,0 +1,149 @@
+#
+#  Copyright 2019 Thomas Wunschel (https://github.com/wuschi)
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+from __future__ import unicode_literals
+
+import unittest
+
+import mock
+
+from mopidy_phoniebox import Extension, FunctionConfig, GpioConfig
+from mopidy_phoniebox.check import ConfigCheck
+from mopidy_phoniebox.encoderconfig import EncoderConfig
+
+
+def function(value):
+    return FunctionConfig().deserialize(value)
+
+
+def valid_config():
+    pull_up = GpioConfig().deserialize('pull_up')
+    return {
+        'gpio20': pull_up,
+        'gpio20.when_pressed': function('play_pause'),
+        'gpio20.when_held': function('shutdown'),
+        'gpio21': pull_up,
+        'gpio21.when_released': function('next'),
+        'gpio22': GpioConfig().deserialize('pull_down'),
+        'gpio22.when_double_pressed': function('prev'),
+        'gpio23': pull_up,
+        'chord.gpio21+gpio23': function('mute'),
+        'encoder0': EncoderConfig().deserialize('24,25'),
+        'encoder0.when_rotated_clockwise': function('vol_up'),
+        'encoder0.when_rotated_counter_clockwise': function('vol_down'),
+    }
+
+
+class ConfigCheckTest(unittest.TestCase):
+
+    @mock.patch('mopidy_phoniebox.controls.subprocess')
+    def test_valid_config(self, subprocess):
+        check = ConfigCheck(valid_config())
+
+        self.assertTrue(check.run())
+
+        self.assertEqual([], check.errors)
+        self.assertEqual([], check.warnings)
+        self.assertEqual([
+            ('gpio20.when_held', 'shutdown'),
+            ('gpio20.when_pressed', 'play_pause'),
+            ('gpio21.when_released', 'next'),
+            ('gpio22.when_double_pressed', 'prev'),
+            ('chord.gpio21+gpio23', 'mute'),
+            ('encoder0.when_rotated_clockwise', 'vol_up'),
+            ('encoder0.when_rotated_counter_clockwise', 'vol_down'),
+        ], [(result.name, result.fn_type) for result in check.results])
+        for result in check.results:
+            self.assertTrue(result.ok, result)
+            self.assertIsNotNone(result.dispatch_ms, result)
+        results = dict((result.name, result) for result in check.results)
+        # the press after the hold pauses the playback started by the hold
+        self.assertEqual(['playback.get_state', 'playback.play'],
+                         results['gpio20.when_held'].calls)
+        self.assertEqual(['playback.pause'],
+                         results['gpio20.when_pressed'].calls)
+        self.assertEqual(['tracklist.get_tl_tracks', 'playback.next'],
+                         results['gpio21.when_released'].calls)
+        self.assertIn('mixer.set_volume',
+                      results['encoder0.when_rotated_clockwise'].calls)
+        self.assertIsNotNone(
+            results['encoder0.when_rotated_clockwise'].ack_ms)
+        # the chord suppresses the release of its buttons
+        self.assertEqual(['mute'], results['chord.gpio21+gpio23'].dispatched)
+        self.assertFalse(subprocess.call.called)
+
+    def test_conflicts(self):
+        config = valid_config()
+        config['gpio26'] = GpioConfig().deserialize('pull_up')
+        config['gpio27.when_pressed'] = function('next')
+        config['gpio21.when_held'] = function('unknown')
+        config['encoder1'] = EncoderConfig().deserialize('20,5')
+        config['encoder1.when_rotated_clockwise'] = function('vol_up')
+        check = ConfigCheck(config)
+
+        self.assertFalse(check.run())
+
+        self.assertEqual(3, len(check.errors))
+        self.assertIn("cannot configure 27.when_pressed"
+                      + " - gpio27 not configured", check.errors)
+        self.assertIn("cannot assign gpio21.when_held:"
+                      + " unknown fn type 'unknown'", check.errors)
+        self.assertIn("cannot configure encoder1 - gpio20 already in use",
+                      check.errors)
+        self.assertEqual(["gpio26 is configured but has no function"],
+                         check.warnings)
+        self.assertEqual(['gpio21.when_held'], [
+            result.name for result in check.results if not result.ok])
+
+    def test_restores_pin_factory(self):
+        from gpiozero import Device
+        previous = Device.pin_factory
+
+        ConfigCheck({}).run()
+
+        self.assertIs(previous, Device.pin_factory)
+
+
+class CheckCommandTest(unittest.TestCase):
+
+    def run_check(self, config, argv=()):
+        command = Extension().get_command()
+        args = command.parse(['check'] + list(argv))
+        with mock.patch('mopidy_phoniebox.commands.print',
+                        create=True) as output:
+            code = args.command.run(args, {'phoniebox': config})
+        lines = [call[0][0] for call in output.call_args_list]
+        return code, lines
+
+    def test_valid_config(self):
+        config = valid_config()
+        del config['gpio20.when_held']
+        code, lines = self.run_check(config, ['--latency', '5'])
+
+        self.assertEqual(0, code)
+        self.assertTrue(lines[0].startswith(
+            "ok   gpio20.when_pressed -> play_pause: dispatch "))
+        self.assertIn("playback.play)", lines[0])
+        self.assertEqual("6 function(s), 0 error(s), 0 warning(s)",
+                         lines[-1])
+
+    def test_errors(self):
+        config = valid_config()
+        config['gpio27.when_pressed'] = function('next')
+        code, lines = self.run_check(config)
+
+        self.assertEqual(1, code)
+        self.assertEqual("error: cannot configure 27.when_pressed"
+                         + " - gpio27 not configured", lines[0])
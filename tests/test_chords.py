@@ -0,0 +1,147 @@
+#
+#  Copyright 2019 Thomas Wunschel (https://github.com/wuschi)
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+from __future__ import unicode_literals
+
+import time
+import unittest
+
+from gpiozero import Device
+from gpiozero.pins.mock import MockFactory
+
+import mock
+
+from mopidy_phoniebox import FunctionConfig, GpioConfig
+from mopidy_phoniebox.chords import Chord, ChordDetector
+from mopidy_phoniebox.gpiocontroller import GpioController
+from mopidy_phoniebox.scheduler import Scheduler
+
+
+class ChordDetectorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.scheduler = Scheduler()
+        self.executor = mock.Mock()
+        self.detector = ChordDetector(self.scheduler, self.executor)
+        self.chord_fn = mock.Mock()
+        self.detector.add(Chord([19, 13], 'mute', self.chord_fn, 0.05))
+        self.buttons = {}
+        self.actions = {}
+        for gpio in 13, 19:
+            btn = mock.Mock(when_held=None, was_held=False)
+            self.actions[gpio] = btn.when_pressed
+            self.buttons[gpio] = btn
+            self.detector.wrap(gpio, btn)
+
+    def tearDown(self):
+        self.scheduler.stop()
+
+    def test_chord(self):
+        self.assertEqual((1 << 13) | (1 << 19),
+                         Chord([19, 13], 'mute', None, 0).mask)
+        self.buttons[13].when_pressed()
+        self.buttons[19].when_pressed()
+        self.executor.submit.assert_called_once_with('mute', self.chord_fn)
+        self.assertEqual((1 << 13) | (1 << 19), self.detector.pressed)
+        time.sleep(0.1)
+        self.actions[13].assert_not_called()
+        self.actions[19].assert_not_called()
+        self.assertTrue(self.buttons[13].was_held)
+        self.assertTrue(self.buttons[19].was_held)
+
+        release = self.buttons[13].when_released
+        release(self.buttons[13])
+        self.assertEqual(1 << 19, self.detector.pressed)
+        self.assertEqual(1 << 19, self.detector.chorded)
+        self.actions[13].assert_not_called()
+
+    def test_single_press(self):
+        self.buttons[13].when_pressed()
+        self.actions[13].assert_not_called()
+        time.sleep(0.1)
+        self.actions[13].assert_called_once_with()
+        self.buttons[19].when_pressed()
+        time.sleep(0.1)
+        self.actions[19].assert_called_once_with()
+        self.executor.submit.assert_not_called()
+
+    def test_release_within_grace_window(self):
+        self.buttons[13].when_pressed()
+        self.buttons[13].when_released(self.buttons[13])
+        self.actions[13].assert_called_once_with()
+        self.assertEqual(0, self.detector.pressed)
+        time.sleep(0.1)
+        self.actions[13].assert_called_once_with()
+
+    def test_close(self):
+        self.buttons[13].when_pressed()
+        self.detector.close()
+        time.sleep(0.1)
+        self.actions[13].assert_not_called()
+        self.assertEqual({}, self.detector.pending)
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            self.detector.add(Chord([13, 19], 'next', mock.Mock(), 0.05))
+        with self.assertRaises(ValueError):
+            self.detector.add(Chord([13, 13], 'next', mock.Mock(), 0.05))
+
+
+class ChordGpioControllerTest(unittest.TestCase):
+
+    def test_chords(self):
+        Device.pin_factory = MockFactory()
+        controls = mock.Mock()
+        config = {
+            'chord_grace_time': 50,
+            'gpio13': GpioConfig().deserialize('pull_up'),
+            'gpio13.when_pressed': FunctionConfig().deserialize('vol_down'),
+            'gpio19': GpioConfig().deserialize('pull_up'),
+            'gpio19.when_pressed': FunctionConfig().deserialize('vol_up'),
+            'gpio19.when_released': FunctionConfig().deserialize('next'),
+            'gpio26': GpioConfig().deserialize('pull_up'),
+            'gpio26.when_pressed': FunctionConfig().deserialize('play_pause'),
+            'chord.gpio13+gpio19': FunctionConfig().deserialize('mute'),
+            'chord.gpio13+gpio27': FunctionConfig().deserialize('mute'),
+            'chord.gpio13+gpio26': FunctionConfig().deserialize('unknown'),
+        }
+        controller = GpioController(config, controls)
+        self.assertEqual([(1 << 13) | (1 << 19)],
+                         list(controller.chords.chords))
+
+        # buttons which are not part of a chord are not delayed
+        Device.pin_factory.pin(26).drive_low()
+        controller.executor.join()
+        controls.play_pause.assert_called_once_with()
+
+        pin13 = Device.pin_factory.pin(13)
+        pin19 = Device.pin_factory.pin(19)
+        pin13.drive_low()
+        pin19.drive_low()
+        time.sleep(0.1)
+        pin19.drive_high()
+        pin13.drive_high()
+        controller.executor.join()
+        controls.mute_unmute.assert_called_once_with()
+        controls.volume_down.assert_not_called()
+        controls.volume_up.assert_not_called()
+        controls.next.assert_not_called()
+
+        pin19.drive_low()
+        pin19.drive_high()
+        controller.executor.join()
+        controls.volume_up.assert_called_once_with(5)
+        controls.next.assert_called_once_with()
+        controller.close()
@@ -21,9 +21,15 @@ import unittest
 import mock
 
 from mopidy.audio import PlaybackState
-from mopidy.models import TlTrack
+from mopidy.models import TlTrack, Track
 
 from mopidy_phoniebox.controls import PhonieboxControls
+from mopidy_phoniebox.fakecore import FakeCore
+from mopidy_phoniebox.statecache import StateCache, TracklistIndex
+
+
+def tl_tracks(*tlids):
+    return [TlTrack(tlid, None) for tlid in tlids]
 
 
 class PhonieboxControlsTest(unittest.TestCase):
@@ -47,6 +53,7 @@ class PhonieboxControlsTest(unittest.TestCase):
         core.playback.play.assert_not_called()
 
         core.reset_mock()
+        ctrls.state.invalidate()
         ctrls = PhonieboxControls(core)
         future.get.return_value = PlaybackState.PAUSED
         ctrls.play_pause()
@@ -55,6 +62,7 @@ class PhonieboxControlsTest(unittest.TestCase):
         core.playback.play.assert_not_called()
 
         core.reset_mock()
+        ctrls.state.invalidate()
         ctrls = PhonieboxControls(core)
         future.get.return_value = PlaybackState.STOPPED
         ctrls.play_pause()
@@ -62,6 +70,47 @@ class PhonieboxControlsTest(unittest.TestCase):
         core.playback.resume.assert_not_called()
         core.playback.play.assert_called_once()
 
+    def test_play_pause_cached(self):
+        core = mock.Mock()
+
+        ctrls = PhonieboxControls(core)
+        ctrls.state.playback_state_changed(PlaybackState.STOPPED,
+                                           PlaybackState.PLAYING)
+        ctrls.play_pause()
+        core.playback.get_state.assert_not_called()
+        core.playback.pause.assert_called_once()
+
+    def test_play_pause_twice(self):
+        core = FakeCore(latency=0.02)
+        ctrls = PhonieboxControls(core)
+        core.listener = ctrls.state
+        try:
+            ctrls.play_pause()
+            self.assertEqual(PlaybackState.PLAYING,
+                             core.playback.get_state().get())
+            del core.calls[:]
+            # the second press comes before the state event of the first
+            ctrls.play_pause()
+            ctrls.play_pause()
+            ctrls.play_pause()
+            self.assertEqual(['playback.pause', 'playback.resume',
+                              'playback.pause'],
+                             [call[0] for call in core.calls])
+        finally:
+            ctrls.close()
+            core.stop()
+
+    def test_play_pause_stopped(self):
+        core = mock.Mock()
+        ctrls = PhonieboxControls(core)
+        ctrls.state.playback_state_changed(PlaybackState.PLAYING,
+                                           PlaybackState.STOPPED)
+        ctrls.play_pause()
+        core.playback.play.assert_called_once_with()
+        # the outcome of play() is fetched behind it
+        self.assertFalse(
+            ctrls.state.lookup(StateCache.PLAYBACK_STATE)[0])
+
     def test_cd_previous(self):
         core = mock.Mock()
         future = mock.Mock()
@@ -69,8 +118,8 @@ class PhonieboxControlsTest(unittest.TestCase):
         future_tl_track = mock.Mock()
         core.playback.get_current_tl_track.return_value = future_tl_track
         future_tl = mock.Mock()
-        core.tracklist.get_length.return_value = future_tl
-        future_tl.get.return_value = 3
+        core.tracklist.get_tl_tracks.return_value = future_tl
+        future_tl.get.return_value = tl_tracks(1, 2, 3)
 
         ctrls = PhonieboxControls(core)
         future.get.return_value = 1000
@@ -81,6 +130,7 @@ class PhonieboxControlsTest(unittest.TestCase):
         core.playback.play.assert_not_called()
 
         core.reset_mock()
+        ctrls.state.invalidate()
         ctrls = PhonieboxControls(core)
         future.get.return_value = 1000
         future_tl_track.get.return_value = TlTrack(1, None)
@@ -90,6 +140,7 @@ class PhonieboxControlsTest(unittest.TestCase):
         core.playback.play.assert_called_with(tlid=3)
 
         core.reset_mock()
+        ctrls.state.invalidate()
         future.get.return_value = 4000
         future_tl_track.get.return_value = TlTrack(2, None)
         ctrls.cd_previous()
@@ -97,8 +148,9 @@ class PhonieboxControlsTest(unittest.TestCase):
         core.playback.seek.assert_called_with(0)
         core.playback.play.assert_not_called()
 
-        future_tl.get.return_value = 0
+        future_tl.get.return_value = tl_tracks()
         core.reset_mock()
+        ctrls.state.invalidate()
         future.get.return_value = 4000
         future_tl_track.get.return_value = None
         ctrls.cd_previous()
@@ -106,8 +158,9 @@ class PhonieboxControlsTest(unittest.TestCase):
         core.playback.seek.assert_not_called()
         core.playback.play.assert_not_called()
 
-        future_tl.get.return_value = 0
+        future_tl.get.return_value = tl_tracks()
         core.reset_mock()
+        ctrls.state.invalidate()
         future.get.return_value = 4000
         future_tl_track.get.return_value = TlTrack(1, None)
         ctrls.cd_previous()
@@ -115,8 +168,9 @@ class PhonieboxControlsTest(unittest.TestCase):
         core.playback.seek.assert_not_called()
         core.playback.play.assert_not_called()
 
-        future_tl.get.return_value = 3
+        future_tl.get.return_value = tl_tracks(1, 2, 3)
         core.reset_mock()
+        ctrls.state.invalidate()
         future.get.return_value = 4000
         future_tl_track.get.return_value = None
         ctrls.cd_previous()
@@ -129,8 +183,8 @@ class PhonieboxControlsTest(unittest.TestCase):
         future_tl_track = mock.Mock()
         core.playback.get_current_tl_track.return_value = future_tl_track
         future_tl = mock.Mock()
-        core.tracklist.get_length.return_value = future_tl
-        future_tl.get.return_value = 3
+        core.tracklist.get_tl_tracks.return_value = future_tl
+        future_tl.get.return_value = tl_tracks(1, 2, 3)
 
         ctrls = PhonieboxControls(core)
         future_tl_track.get.return_value = TlTrack(2, None)
@@ -139,27 +193,31 @@ class PhonieboxControlsTest(unittest.TestCase):
         core.playback.seek.assert_not_called()
 
         core.reset_mock()
+        ctrls.state.invalidate()
         future_tl_track.get.return_value = TlTrack(1, None)
         ctrls.previous()
         core.playback.previous.assert_not_called()
         core.playback.play.assert_called_with(tlid=3)
 
-        future_tl.get.return_value = 0
+        future_tl.get.return_value = tl_tracks()
         core.reset_mock()
+        ctrls.state.invalidate()
         future_tl_track.get.return_value = None
         ctrls.previous()
         core.playback.previous.assert_not_called()
         core.playback.play.assert_not_called()
 
-        future_tl.get.return_value = 0
+        future_tl.get.return_value = tl_tracks()
         core.reset_mock()
+        ctrls.state.invalidate()
         future_tl_track.get.return_value = TlTrack(1, None)
         ctrls.previous()
         core.playback.previous.assert_not_called()
         core.playback.play.assert_not_called()
 
-        future_tl.get.return_value = 3
+        future_tl.get.return_value = tl_tracks(1, 2, 3)
         core.reset_mock()
+        ctrls.state.invalidate()
         future_tl_track.get.return_value = None
         ctrls.previous()
         core.playback.previous.assert_not_called()
@@ -170,8 +228,8 @@ class PhonieboxControlsTest(unittest.TestCase):
         future_tl_track = mock.Mock()
         future_tl = mock.Mock()
         core.playback.get_current_tl_track.return_value = future_tl_track
-        core.tracklist.get_length.return_value = future_tl
-        future_tl.get.return_value = 3
+        core.tracklist.get_tl_tracks.return_value = future_tl
+        future_tl.get.return_value = tl_tracks(1, 2, 3)
 
         ctrls = PhonieboxControls(core)
         future_tl_track.get.return_value = TlTrack(2, None)
@@ -180,72 +238,229 @@ class PhonieboxControlsTest(unittest.TestCase):
         core.playback.play.assert_not_called()
 
         core.reset_mock()
+        ctrls.state.invalidate()
         future_tl_track.get.return_value = TlTrack(3, None)
         ctrls.next()
         core.playback.next.assert_not_called()
         core.playback.play.assert_called_with(tlid=1)
 
-        future_tl.get.return_value = 1
+        future_tl.get.return_value = tl_tracks(1)
         core.reset_mock()
+        ctrls.state.invalidate()
         future_tl_track.get.return_value = None
         ctrls.next()
         core.playback.next.assert_not_called()
         core.playback.play.assert_called_with(tlid=1)
 
-        future_tl.get.return_value = 0
+        future_tl.get.return_value = tl_tracks()
         core.reset_mock()
+        ctrls.state.invalidate()
         future_tl_track.get.return_value = None
         ctrls.next()
         core.playback.next.assert_not_called()
         core.playback.play.assert_not_called()
 
-        future_tl.get.return_value = 0
+        future_tl.get.return_value = tl_tracks()
         core.reset_mock()
+        ctrls.state.invalidate()
         future_tl_track.get.return_value = TlTrack(1, None)
         ctrls.next()
         core.playback.next.assert_not_called()
         core.playback.play.assert_not_called()
 
+    def test_next_twice(self):
+        core = mock.Mock()
+        core.tracklist.get_tl_tracks.return_value.get.return_value = \
+            tl_tracks(1, 2, 3)
+        core.playback.get_current_tl_track.return_value.get.return_value = \
+            TlTrack(2, None)
+
+        # the track_playback_started event of the first next() is late
+        ctrls = PhonieboxControls(core)
+        ctrls.next()
+        ctrls.next()
+        core.playback.next.assert_called_once_with()
+        core.playback.play.assert_called_once_with(tlid=1)
+        core.playback.get_current_tl_track.assert_called_once_with()
+        self.assertEqual(TlTrack(1, None),
+                         ctrls.state.get(StateCache.CURRENT_TL_TRACK))
+
+    def test_previous_twice(self):
+        core = mock.Mock()
+        core.tracklist.get_tl_tracks.return_value.get.return_value = \
+            tl_tracks(1, 2, 3)
+        core.playback.get_current_tl_track.return_value.get.return_value = \
+            TlTrack(2, None)
+        core.playback.get_time_position.return_value.get.return_value = 500
+
+        ctrls = PhonieboxControls(core)
+        ctrls.previous()
+        ctrls.previous()
+        core.playback.previous.assert_called_once_with()
+        core.playback.play.assert_called_once_with(tlid=3)
+
+        core.reset_mock()
+        for _ in range(3):
+            ctrls.cd_previous()
+        self.assertEqual(2, core.playback.previous.call_count)
+        core.playback.play.assert_called_once_with(tlid=3)
+        core.playback.seek.assert_not_called()
+        # the position is extrapolated from the track changes
+        core.playback.get_time_position.assert_not_called()
+
+    def test_cd_previous_position(self):
+        core = mock.Mock()
+        core.tracklist.get_tl_tracks.return_value.get.return_value = \
+            tl_tracks(1, 2, 3)
+
+        ctrls = PhonieboxControls(core)
+        ctrls.state.track_playback_started(TlTrack(2, None))
+        ctrls.state.seeked(5000)
+        ctrls.cd_previous()
+        core.playback.seek.assert_called_once_with(0)
+        core.playback.get_time_position.assert_not_called()
+
+        # the seek is written through
+        ctrls.cd_previous()
+        core.playback.previous.assert_called_once_with()
+        core.playback.get_time_position.assert_not_called()
+
+    def test_replaced_tracklist(self):
+        core = mock.Mock()
+        core.playback.get_time_position.return_value.get.return_value = 1000
+
+        ctrls = PhonieboxControls(core)
+        ctrls.state.update(StateCache.TRACKLIST,
+                           TracklistIndex(tl_tracks(7, 8, 9)))
+        ctrls.state.track_playback_started(TlTrack(9, None))
+        ctrls.next()
+        core.playback.play.assert_called_once_with(tlid=7)
+        core.playback.next.assert_not_called()
+
+        core.reset_mock()
+        ctrls.state.track_playback_started(TlTrack(8, None))
+        ctrls.next()
+        ctrls.previous()
+        core.playback.next.assert_called_once()
+        core.playback.previous.assert_called_once()
+        core.playback.play.assert_not_called()
+
+        core.reset_mock()
+        ctrls.state.track_playback_started(TlTrack(7, None))
+        ctrls.previous()
+        core.playback.play.assert_called_once_with(tlid=9)
+
+        core.reset_mock()
+        ctrls.state.track_playback_started(TlTrack(7, None))
+        ctrls.cd_previous()
+        core.playback.play.assert_called_once_with(tlid=9)
+
+        # tracks that are no longer in the tracklist
+        core.reset_mock()
+        ctrls.state.track_playback_started(TlTrack(3, None))
+        ctrls.next()
+        core.playback.play.assert_called_once_with(tlid=7)
+        core.tracklist.get_tl_tracks.assert_not_called()
+        core.tracklist.get_length.assert_not_called()
+
     def test_seek_bwd(self):
         core = mock.Mock()
         future_pos = mock.Mock()
         core.playback.get_time_position.return_value = future_pos
+        future_tl_track = mock.Mock()
+        future_tl_track.get.return_value = TlTrack(1, Track(length=60000))
+        core.playback.get_current_tl_track.return_value = future_tl_track
 
         ctrls = PhonieboxControls(core)
         future_pos.get.return_value = 6000
         ctrls.seek_bwd()
+        ctrls.seek_accumulator.flush()
         core.playback.seek.assert_called_with(1000)
 
         core.reset_mock()
+        ctrls.state.invalidate()
         future_pos.get.return_value = 1000
         ctrls.seek_bwd()
+        ctrls.seek_accumulator.flush()
         core.playback.seek.assert_called_with(0)
 
         core.reset_mock()
+        ctrls.state.invalidate()
         future_pos.get.return_value = 10000
         ctrls.seek_bwd(seconds=3)
+        ctrls.seek_accumulator.flush()
         core.playback.seek.assert_called_with(7000)
 
+        core.reset_mock()
+        ctrls.state.invalidate()
+        future_pos.get.return_value = 10000
+        ctrls.seek_bwd(seconds=0.57)
+        ctrls.seek_accumulator.flush()
+        core.playback.seek.assert_called_with(9430)
+
     def test_seek_fwd(self):
         core = mock.Mock()
         future_pos = mock.Mock()
         core.playback.get_time_position.return_value = future_pos
+        future_tl_track = mock.Mock()
+        future_tl_track.get.return_value = TlTrack(1, Track(length=60000))
+        core.playback.get_current_tl_track.return_value = future_tl_track
 
         ctrls = PhonieboxControls(core)
         future_pos.get.return_value = 6000
         ctrls.seek_fwd()
+        ctrls.seek_accumulator.flush()
         core.playback.seek.assert_called_with(11000)
 
         core.reset_mock()
+        ctrls.state.invalidate()
         future_pos.get.return_value = 0
         ctrls.seek_fwd()
+        ctrls.seek_accumulator.flush()
         core.playback.seek.assert_called_with(5000)
 
         core.reset_mock()
+        ctrls.state.invalidate()
         future_pos.get.return_value = 10000
         ctrls.seek_fwd(seconds=3)
+        ctrls.seek_accumulator.flush()
         core.playback.seek.assert_called_with(13000)
 
+        core.reset_mock()
+        ctrls.state.invalidate()
+        future_pos.get.return_value = 58000
+        ctrls.seek_fwd()
+        ctrls.seek_accumulator.flush()
+        core.playback.seek.assert_called_with(60000)
+
+    def test_seek_accumulated(self):
+        core = mock.Mock()
+        future_pos = mock.Mock()
+        core.playback.get_time_position.return_value = future_pos
+        future_pos.get.return_value = 10000
+
+        ctrls = PhonieboxControls(core)
+        ctrls.state.playback_state_changed(PlaybackState.PLAYING,
+                                           PlaybackState.PAUSED)
+        ctrls.state.track_playback_started(TlTrack(1, Track(length=60000)))
+        ctrls.state.track_playback_paused(None, 10000)
+        ctrls.seek_fwd()
+        ctrls.seek_fwd()
+        ctrls.seek_bwd(seconds=2)
+        core.playback.seek.assert_not_called()
+        ctrls.seek_accumulator.flush()
+        core.playback.seek.assert_called_once_with(18000)
+        core.playback.get_time_position.assert_not_called()
+
+        # no current track, nothing to seek
+        core.reset_mock()
+        ctrls.state.track_playback_ended(None, 0)
+        core.playback.get_current_tl_track.return_value.get.return_value = \
+            None
+        ctrls.seek_fwd()
+        ctrls.seek_accumulator.flush()
+        core.playback.seek.assert_not_called()
+
     def test_volume_up(self):
         core = mock.Mock()
         future_vol = mock.Mock()
@@ -254,21 +469,28 @@ class PhonieboxControlsTest(unittest.TestCase):
         ctrls = PhonieboxControls(core)
         future_vol.get.return_value = None
         ctrls.volume_up()
+        ctrls.volume_coalescer.wait()
         core.mixer.set_volume.asert_called_with(55)
 
         core.reset_mock()
+        ctrls.state.invalidate()
         future_vol.get.return_value = 80
         ctrls.volume_up()
+        ctrls.volume_coalescer.wait()
         core.mixer.set_volume.assert_called_with(85)
 
         core.reset_mock()
+        ctrls.state.invalidate()
         future_vol.get.return_value = 80
         ctrls.volume_up(vol_step=3)
+        ctrls.volume_coalescer.wait()
         core.mixer.set_volume.assert_called_with(83)
 
         core.reset_mock()
+        ctrls.state.invalidate()
         future_vol.get.return_value = 100
         ctrls.volume_up()
+        ctrls.volume_coalescer.wait()
         core.mixer.set_volume.assert_called_with(100)
 
     def test_volume_down(self):
@@ -279,23 +501,46 @@ class PhonieboxControlsTest(unittest.TestCase):
         ctrls = PhonieboxControls(core)
         future_vol.get.return_value = None
         ctrls.volume_down()
+        ctrls.volume_coalescer.wait()
         core.mixer.set_volume.asert_called_with(45)
 
         core.reset_mock()
+        ctrls.state.invalidate()
         future_vol.get.return_value = 80
         ctrls.volume_down()
+        ctrls.volume_coalescer.wait()
         core.mixer.set_volume.assert_called_with(75)
 
         core.reset_mock()
+        ctrls.state.invalidate()
         future_vol.get.return_value = 80
         ctrls.volume_down(vol_step=1)
+        ctrls.volume_coalescer.wait()
         core.mixer.set_volume.assert_called_with(79)
 
         core.reset_mock()
+        ctrls.state.invalidate()
         future_vol.get.return_value = 0
         ctrls.volume_down()
+        ctrls.volume_coalescer.wait()
         core.mixer.set_volume.assert_called_with(0)
 
+    def test_volume_cached(self):
+        core = mock.Mock()
+
+        ctrls = PhonieboxControls(core)
+        ctrls.state.volume_changed(40)
+        ctrls.volume_up()
+        ctrls.volume_coalescer.wait()
+        core.mixer.set_volume.assert_called_with(45)
+        ctrls.volume_up()
+        ctrls.volume_coalescer.wait()
+        core.mixer.set_volume.assert_called_with(50)
+        ctrls.volume_down(vol_step=10)
+        ctrls.volume_coalescer.wait()
+        core.mixer.set_volume.assert_called_with(40)
+        core.mixer.get_volume.assert_not_called()
+
     def test_mute_unmute(self):
         core = mock.Mock()
         future_muted = mock.Mock()
@@ -307,11 +552,13 @@ class PhonieboxControlsTest(unittest.TestCase):
         core.mixer.set_mute.assert_called_with(False)
 
         core.reset_mock()
+        ctrls.state.invalidate()
         future_muted.get.return_value = False
         ctrls.mute_unmute()
         core.mixer.set_mute.assert_called_with(True)
 
         core.reset_mock()
+        ctrls.state.invalidate()
         future_muted.get.return_value = True
         ctrls.mute_unmute()
         core.mixer.set_mute.assert_called_with(False)
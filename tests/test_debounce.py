@@ -0,0 +1,132 @@
+#
+#  Copyright 2019 Thomas Wunschel (https://github.com/wuschi)
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+from __future__ import unicode_literals
+
+import unittest
+
+from gpiozero import Device
+from gpiozero.pins.mock import MockFactory
+
+import mock
+
+from mopidy_phoniebox import GpioConfig
+from mopidy_phoniebox.debounce import Debouncer
+from mopidy_phoniebox.gpiocontroller import GpioController
+
+
+class DebouncerTest(unittest.TestCase):
+
+    def test_fixed(self):
+        debouncer = Debouncer(0.01)
+        self.assertFalse(debouncer.adaptive)
+        self.assertTrue(debouncer.accept(1.0))
+        self.assertFalse(debouncer.accept(1.002))
+        self.assertFalse(debouncer.accept(1.009))
+        self.assertTrue(debouncer.accept(1.5))
+        self.assertTrue(debouncer.accept(1.52))
+        self.assertEqual(0.01, debouncer.window)
+
+        stats = debouncer.stats()
+        self.assertEqual(3, stats['accepted'])
+        self.assertEqual(2, stats['rejected'])
+        self.assertEqual(2, stats['bounces']['count'])
+        self.assertEqual(10, stats['window'])
+
+    def test_force(self):
+        debouncer = Debouncer(0.01)
+        self.assertTrue(debouncer.accept(1.0))
+        self.assertFalse(debouncer.accept(1.002))
+        self.assertEqual(1.01, debouncer.closes_at())
+        debouncer.force(1.0099)
+        self.assertEqual(2, debouncer.accepted)
+        self.assertFalse(debouncer.accept(1.01))
+        self.assertAlmostEqual(1.0199, debouncer.closes_at())
+
+    def test_no_bounce_time(self):
+        debouncer = Debouncer(0)
+        for timestamp in 1.0, 1.0001, 1.0002:
+            self.assertTrue(debouncer.accept(timestamp))
+        self.assertEqual(0, debouncer.intervals.count)
+
+    def test_adaptive_shrinks_on_clean_pin(self):
+        debouncer = Debouncer(0.005, 0.05)
+        self.assertEqual(0.05, debouncer.window)
+        for i in range(100):
+            self.assertTrue(debouncer.accept(i * 0.2))
+        self.assertEqual(0.005, debouncer.window)
+
+    def test_adaptive_grows_on_bounce(self):
+        debouncer = Debouncer(0.005, 0.05)
+        for i in range(100):
+            debouncer.accept(i * 0.2)
+        # a bounce longer than the window is accepted, but widens the window
+        self.assertTrue(debouncer.accept(20.0))
+        self.assertTrue(debouncer.accept(20.008))
+        self.assertAlmostEqual(0.012, debouncer.window)
+        self.assertTrue(debouncer.accept(20.2))
+        self.assertFalse(debouncer.accept(20.21))
+        self.assertEqual(1, debouncer.rejected)
+
+        # bounded by the maximum
+        debouncer.accept(21.0)
+        debouncer.accept(21.045)
+        self.assertEqual(0.05, debouncer.window)
+
+    def test_invalid_bounds(self):
+        with self.assertRaises(ValueError):
+            Debouncer(0.05, 0.01)
+
+    def test_log_stats(self):
+        debouncer = Debouncer(0.01)
+        debouncer.logger = mock.Mock()
+        debouncer.accept(1.0)
+        debouncer.log_stats('gpio2')
+        debouncer.logger.info.assert_not_called()
+        debouncer.accept(1.001)
+        debouncer.log_stats('gpio2')
+        debouncer.logger.info.assert_called_once()
+
+
+class DebounceGpioControllerTest(unittest.TestCase):
+
+    def setUp(self):
+        Device.pin_factory = MockFactory()
+        Device.pin_factory.reset()
+
+    def tearDown(self):
+        Device.pin_factory.reset()
+
+    def test_debounce_stats(self):
+        controls = mock.Mock()
+        config = {
+            'gpio20': GpioConfig().deserialize('pull_up,5-1000'),
+            'gpio21': GpioConfig().deserialize('pull_up'),
+        }
+        controller = GpioController(config, controls)
+        pin = Device.pin_factory.pin(20)
+        pin.drive_low()
+        pin.drive_high()
+        pin.drive_low()
+
+        stats = controller.debounce_stats()
+        self.assertEqual(['gpio20', 'gpio21'], sorted(stats))
+        self.assertTrue(stats['gpio20']['adaptive'])
+        self.assertEqual(1, stats['gpio20']['accepted'])
+        self.assertEqual(1, stats['gpio20']['rejected'])
+        self.assertEqual(1000, stats['gpio20']['window'])
+        self.assertFalse(stats['gpio21']['adaptive'])
+        self.assertEqual(0, stats['gpio21']['accepted'])
+        controller.close()
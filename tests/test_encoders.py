@@ -0,0 +1,166 @@
+#
+#  Copyright 2019 Thomas Wunschel (https://github.com/wuschi)
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+from __future__ import unicode_literals
+
+import time
+import unittest
+
+from gpiozero import Device
+from gpiozero.pins.mock import MockFactory
+
+import mock
+
+from mopidy_phoniebox import FunctionConfig, GpioConfig
+from mopidy_phoniebox.encoderconfig import EncoderConfig
+from mopidy_phoniebox.encoders import StepAccumulator, repeat
+from mopidy_phoniebox.gpiocontroller import GpioController
+
+
+class EncoderConfigTest(unittest.TestCase):
+
+    def test_deserialize(self):
+        encoder_conf = EncoderConfig().deserialize("20, 21")
+        self.assertIsInstance(encoder_conf, EncoderConfig.tuple_encoderconfig)
+        self.assertEqual(20, encoder_conf.pin_a)
+        self.assertEqual(21, encoder_conf.pin_b)
+        self.assertEqual(4, encoder_conf.acceleration)
+
+        encoder_conf = EncoderConfig().deserialize("20,21,2.5")
+        self.assertEqual(2.5, encoder_conf.acceleration)
+
+        self.assertIsNone(EncoderConfig().deserialize(None))
+        self.assertIsNone(EncoderConfig().deserialize(""))
+
+        for val in "20", "20,21,2,1", "20,x", "20,-1", "20,20", "20,21,0.5":
+            with self.assertRaises(ValueError):
+                EncoderConfig().deserialize(val)
+
+    def test_serialize(self):
+        value = EncoderConfig().serialize(
+            EncoderConfig().deserialize("20,21,2"))
+        self.assertEqual("20,21,2.0", value)
+        self.assertEqual("", EncoderConfig().serialize(None))
+
+
+class StepAccumulatorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.scheduler = mock.Mock()
+        self.scheduler.clock.return_value = 10.0
+        self.executor = mock.Mock()
+        self.up = mock.Mock()
+        self.down = mock.Mock()
+        self.accumulator = StepAccumulator(self.scheduler, self.executor,
+                                           ('vol_up', self.up),
+                                           ('vol_down', self.down),
+                                           acceleration=4)
+
+    def test_slow_steps(self):
+        clock = self.scheduler.clock
+        clock.return_value = 10.0
+        self.accumulator.rotated_clockwise()
+        self.scheduler.schedule.assert_called_once_with(
+            10.05, self.accumulator.flush)
+        clock.return_value = 10.2
+        self.accumulator.rotated_clockwise()
+        self.assertEqual(1, self.scheduler.schedule.call_count)
+        self.accumulator.flush()
+        self.executor.submit.assert_called_once_with('vol_up', repeat,
+                                                     self.up, 2)
+
+    def test_acceleration(self):
+        clock = self.scheduler.clock
+        for i in range(5):
+            clock.return_value = 10.0 + i * 0.01
+            self.accumulator.rotated_counter_clockwise()
+        self.accumulator.flush()
+        # the first step counts once, the fast ones four times
+        self.executor.submit.assert_called_once_with('vol_down', repeat,
+                                                     self.down, 17)
+
+        clock.return_value = 10.065
+        self.accumulator.rotated_clockwise()
+        clock.return_value = 10.1
+        self.accumulator.rotated_clockwise()
+        self.accumulator.flush()
+        # weights of 4 and about 2.86
+        self.executor.submit.assert_called_with('vol_up', repeat,
+                                                self.up, 6)
+
+    def test_direction_change(self):
+        clock = self.scheduler.clock
+        clock.return_value = 10.0
+        self.accumulator.rotated_clockwise()
+        clock.return_value = 10.5
+        self.accumulator.rotated_counter_clockwise()
+        self.accumulator.flush()
+        self.executor.submit.assert_not_called()
+
+    def test_missing_function(self):
+        accumulator = StepAccumulator(self.scheduler, self.executor,
+                                      ('vol_up', self.up), None)
+        accumulator.rotated_counter_clockwise()
+        accumulator.flush()
+        self.executor.submit.assert_not_called()
+
+    def test_repeat(self):
+        fn = mock.Mock()
+        repeat(fn, 3)
+        self.assertEqual(3, fn.call_count)
+
+
+class EncoderGpioControllerTest(unittest.TestCase):
+
+    def setUp(self):
+        Device.pin_factory = MockFactory()
+        Device.pin_factory.reset()
+
+    def tearDown(self):
+        Device.pin_factory.reset()
+
+    def rotate(self, a, b, steps):
+        for _ in range(steps):
+            for pin, state in ((a, False), (b, False), (a, True), (b, True)):
+                pin.drive_high() if state else pin.drive_low()
+
+    def test_encoder(self):
+        controls = mock.Mock()
+        config = {
+            'gpio21': GpioConfig().deserialize('pull_up'),
+            'encoder0': EncoderConfig().deserialize('20,21'),
+            'encoder0.when_rotated_clockwise':
+                FunctionConfig().deserialize('vol_up'),
+            'encoder1': EncoderConfig().deserialize('22,23,1'),
+            'encoder1.when_rotated_clockwise':
+                FunctionConfig().deserialize('vol_up,vol_step=2'),
+            'encoder1.when_rotated_counter_clockwise':
+                FunctionConfig().deserialize('vol_down,vol_step=2'),
+            'encoder2': EncoderConfig().deserialize('24,25'),
+        }
+        controller = GpioController(config, controls)
+        self.assertEqual(['encoder1'], list(controller.encoders))
+
+        a = Device.pin_factory.pin(22)
+        b = Device.pin_factory.pin(23)
+        self.rotate(a, b, 3)
+        self.rotate(b, a, 1)
+        time.sleep(0.1)
+        controller.executor.join()
+        self.assertEqual([mock.call(2), mock.call(2)],
+                         controls.volume_up.call_args_list)
+        controls.volume_down.assert_not_called()
+        controller.close()
+        self.assertEqual({}, controller.encoders)
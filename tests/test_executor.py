@@ -0,0 +1,321 @@
+#
+#  Copyright 2019 Thomas Wunschel (https://github.com/wuschi)
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+from __future__ import unicode_literals
+
+import threading
+import unittest
+
+import mock
+
+from mopidy_phoniebox.executor import (
+    BULK, CRITICAL, CommandExecutor, DROP, INTERACTIVE, LaneQueue, MERGE,
+    QUEUE)
+
+LANES = {'shutdown': CRITICAL, 'play_pause': INTERACTIVE, 'vol_up': BULK}
+
+
+def lane(name):
+    return LANES.get(name, INTERACTIVE)
+
+
+class CommandExecutorTest(unittest.TestCase):
+
+    def test_submit(self):
+        fn = mock.Mock()
+        executor = CommandExecutor()
+        self.assertTrue(executor.submit('fn', fn))
+        self.assertTrue(executor.submit('fn', fn, 3))
+        executor.join()
+        fn.assert_has_calls([mock.call(), mock.call(3)])
+        self.assertIsNot(threading.current_thread(), executor.thread)
+        executor.stop()
+        self.assertFalse(executor.thread.is_alive())
+
+    def test_submit_does_not_block(self):
+        release = threading.Event()
+        fn = mock.Mock()
+        executor = CommandExecutor(max_queued=2)
+        executor.submit('blocker', lambda: release.wait(5))
+        # wait until the worker has dequeued the blocking command
+        while executor.queue.qsize() > 0:
+            release.wait(0.01)
+        self.assertTrue(executor.submit('fn', fn))
+        self.assertTrue(executor.submit('fn', fn))
+        self.assertFalse(executor.submit('fn', fn))
+        self.assertEqual(1, executor.dropped)
+        fn.assert_not_called()
+
+        release.set()
+        executor.join()
+        self.assertEqual(2, fn.call_count)
+        executor.stop()
+
+    def test_dropped_concurrently(self):
+        release = threading.Event()
+        executor = CommandExecutor(max_queued=1)
+        executor.submit('blocker', lambda: release.wait(5))
+        while executor.queue.qsize() > 0:
+            release.wait(0.01)
+        executor.submit('fn', mock.Mock())
+
+        def submit():
+            for _ in range(200):
+                executor.submit('fn', mock.Mock())
+        threads = [threading.Thread(target=submit) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(1600, executor.stats()['dropped'])
+
+        release.set()
+        executor.join()
+        executor.stop()
+
+    def test_error(self):
+        fn = mock.Mock()
+        executor = CommandExecutor()
+        executor.submit('error', mock.Mock(side_effect=ValueError))
+        executor.submit('fn', fn)
+        executor.join()
+        fn.assert_called_once()
+        executor.stop()
+
+    def block(self, executor):
+        """
+        Submits a command which blocks the worker until the returned event
+        is set.
+        """
+        release = threading.Event()
+        executor.submit('blocker', lambda: release.wait(5))
+        while executor.queue.qsize() > 0:
+            release.wait(0.01)
+        return release
+
+    def test_submit_repeat_drop(self):
+        fn = mock.Mock()
+        executor = CommandExecutor()
+        release = self.block(executor)
+        self.assertTrue(executor.submit_repeat('btn', 'next', fn, DROP))
+        self.assertFalse(executor.submit_repeat('btn', 'next', fn, DROP))
+        self.assertFalse(executor.submit_repeat('btn', 'next', fn, DROP))
+        # other keys are tracked on their own
+        self.assertTrue(executor.submit_repeat('other', 'next', fn, DROP))
+        release.set()
+        executor.join()
+        self.assertEqual(2, fn.call_count)
+        self.assertEqual({}, executor.in_flight)
+        self.assertEqual({'dropped': 0, 'merged': {}, 'shed': {'next': 2},
+                          'cancelled': {}}, executor.stats())
+
+        # not in flight anymore
+        self.assertTrue(executor.submit_repeat('btn', 'next', fn, DROP))
+        executor.join()
+        self.assertEqual(3, fn.call_count)
+        executor.stop()
+
+    def test_submit_repeat_merge(self):
+        fn = mock.Mock()
+        executor = CommandExecutor()
+        release = self.block(executor)
+        for _ in range(5):
+            self.assertTrue(executor.submit_repeat('btn', 'vol_up', fn,
+                                                   MERGE))
+        self.assertEqual(1, executor.queue.qsize())
+        release.set()
+        executor.join()
+        self.assertEqual(5, fn.call_count)
+        self.assertEqual({'vol_up': 4}, executor.stats()['merged'])
+        self.assertEqual({}, executor.in_flight)
+        executor.stop()
+
+    def test_submit_repeat_merge_while_running(self):
+        release = threading.Event()
+        running = threading.Event()
+        calls = []
+
+        def fn():
+            calls.append(1)
+            running.set()
+            release.wait(5)
+
+        executor = CommandExecutor()
+        executor.submit_repeat('btn', 'vol_up', fn, MERGE)
+        running.wait(5)
+        executor.submit_repeat('btn', 'vol_up', fn, MERGE)
+        executor.submit_repeat('btn', 'vol_up', fn, MERGE)
+        self.assertEqual(0, executor.queue.qsize())
+        release.set()
+        executor.join()
+        self.assertEqual(3, len(calls))
+        self.assertEqual({}, executor.in_flight)
+        executor.stop()
+
+    def test_submit_repeat_merge_count(self):
+        release = threading.Event()
+        running = threading.Event()
+        calls = []
+
+        def fn():
+            calls.append(1)
+            running.set()
+            release.wait(5)
+
+        executor = CommandExecutor()
+        executor.submit_repeat('btn', 'vol_up', fn, MERGE)
+        running.wait(5)
+        for _ in range(4):
+            executor.submit_repeat('btn', 'vol_up', fn, MERGE)
+        self.assertEqual([4, INTERACTIVE, 'vol_up'],
+                         executor.in_flight['btn'])
+        release.set()
+        executor.join()
+        # one call per merged repeat, none queued on their own
+        self.assertEqual(5, len(calls))
+        self.assertEqual({'vol_up': 4}, executor.stats()['merged'])
+        executor.stop()
+
+    def test_submit_repeat_queue(self):
+        fn = mock.Mock()
+        executor = CommandExecutor()
+        release = self.block(executor)
+        for _ in range(3):
+            self.assertTrue(executor.submit_repeat('btn', 'radio', fn,
+                                                   QUEUE))
+        self.assertEqual(3, executor.queue.qsize())
+        release.set()
+        executor.join()
+        self.assertEqual(3, fn.call_count)
+        executor.stop()
+
+    def test_submit_repeat_error(self):
+        executor = CommandExecutor()
+        fn = mock.Mock(side_effect=ValueError)
+        executor.submit_repeat('btn', 'next', fn, DROP)
+        executor.join()
+        self.assertEqual({}, executor.in_flight)
+        executor.stop()
+
+    def test_submit_repeat_full(self):
+        fn = mock.Mock()
+        executor = CommandExecutor(max_queued=1)
+        release = self.block(executor)
+        executor.submit('fn', fn)
+        self.assertFalse(executor.submit_repeat('btn', 'next', fn, DROP))
+        self.assertEqual(1, executor.dropped)
+        self.assertEqual({}, executor.in_flight)
+        release.set()
+        executor.join()
+        executor.stop()
+
+    def test_lanes(self):
+        calls = []
+        executor = CommandExecutor(priority=lane)
+        release = self.block(executor)
+        executor.submit('vol_up', calls.append, 'vol_up 1')
+        executor.submit('play_pause', calls.append, 'play_pause')
+        executor.submit('vol_up', calls.append, 'vol_up 2')
+        executor.submit('shutdown', calls.append, 'shutdown')
+        release.set()
+        executor.join()
+        self.assertEqual(['shutdown', 'play_pause', 'vol_up 1', 'vol_up 2'],
+                         calls)
+        executor.stop()
+
+    def test_evict(self):
+        calls = []
+        executor = CommandExecutor(max_queued=2, priority=lane)
+        release = self.block(executor)
+        executor.submit('vol_up', calls.append, 'vol_up 1')
+        executor.submit('vol_up', calls.append, 'vol_up 2')
+        self.assertFalse(executor.submit('vol_up', calls.append, 'vol_up 3'))
+        self.assertTrue(executor.submit('play_pause', calls.append,
+                                        'play_pause'))
+        self.assertTrue(executor.submit('shutdown', calls.append,
+                                        'shutdown'))
+        self.assertFalse(executor.submit('vol_up', calls.append, 'vol_up 4'))
+        self.assertEqual(4, executor.dropped)
+        release.set()
+        executor.join()
+        self.assertEqual(['shutdown', 'play_pause'], calls)
+        executor.stop()
+
+    def test_cancel_repeats(self):
+        fn = mock.Mock()
+        executor = CommandExecutor(priority=lane)
+        release = self.block(executor)
+        executor.submit_repeat('btn', 'vol_up', fn.vol_up, MERGE)
+        executor.submit_repeat('btn', 'vol_up', fn.vol_up, MERGE)
+        # a single press is not a stale repeat
+        executor.submit('vol_up', fn.vol_up)
+        executor.submit('play_pause', fn.play_pause)
+        self.assertEqual({}, executor.in_flight)
+        self.assertEqual({'vol_up': 2}, executor.stats()['cancelled'])
+        release.set()
+        executor.join()
+        self.assertEqual([mock.call.play_pause(), mock.call.vol_up()],
+                         fn.mock_calls)
+        executor.stop()
+
+    def test_cancel_running_repeats(self):
+        release = threading.Event()
+        running = threading.Event()
+        calls = []
+
+        def vol_up():
+            calls.append('vol_up')
+            running.set()
+            release.wait(5)
+
+        executor = CommandExecutor(priority=lane)
+        executor.submit_repeat('btn', 'vol_up', vol_up, MERGE)
+        running.wait(5)
+        executor.submit_repeat('btn', 'vol_up', vol_up, MERGE)
+        executor.submit('play_pause', calls.append, 'play_pause')
+        release.set()
+        executor.join()
+        self.assertEqual(['vol_up', 'play_pause'], calls)
+        self.assertEqual({'vol_up': 1}, executor.stats()['cancelled'])
+        self.assertEqual({}, executor.in_flight)
+        executor.stop()
+
+
+class LaneQueueTest(unittest.TestCase):
+
+    def test_get(self):
+        queue = LaneQueue(4)
+        queue.put((BULK, 'a'))
+        queue.put((INTERACTIVE, 'b'))
+        queue.put((BULK, 'c'))
+        queue.put((CRITICAL, 'd'))
+        self.assertTrue(queue.full())
+        self.assertEqual(['d', 'b', 'a', 'c'],
+                         [queue.get() for _ in range(4)])
+
+    def test_discard(self):
+        queue = LaneQueue(4)
+        for item in ('a', 'b', 'c'):
+            queue.put((BULK, item))
+        queue.put((INTERACTIVE, 'd'))
+        self.assertEqual(['c'], queue.discard([BULK, INTERACTIVE],
+                                              lambda item: True, limit=1))
+        self.assertEqual(['b', 'a'], queue.discard(
+            [BULK], lambda item: item != 'd'))
+        self.assertEqual(1, queue.qsize())
+        queue.get()
+        queue.task_done()
+        # the discarded items are done
+        queue.join()
@@ -32,6 +32,13 @@ class ExtensionTest(unittest.TestCase):
         self.assertIn('[phoniebox]', config)
         self.assertIn('enabled = true', config)
         self.assertIn('idle_time_before_shutdown = 0', config)
+        self.assertIn('latency_log_interval = 0', config)
+        self.assertIn('state_max_age = 60', config)
+        self.assertIn('input_engine = gpiozero', config)
+        self.assertIn('chord_grace_time = 100', config)
+        self.assertIn('multi_tap_window = 300', config)
+        self.assertIn('edge_trace_records = 65536', config)
+        self.assertIn('config_watch_interval = 0', config)
 
     def test_get_config_schema(self):
         ext = Extension()
@@ -39,11 +46,90 @@ class ExtensionTest(unittest.TestCase):
 
         self.assertIn('enabled', schema)
         self.assertIn('idle_time_before_shutdown', schema)
+        self.assertIn('latency_log_interval', schema)
+        self.assertIn('state_max_age', schema)
+        self.assertIn('input_engine', schema)
+        self.assertIn('multi_tap_window', schema)
+        self.assertIn('edge_trace_file', schema)
+        self.assertIn('edge_trace_records', schema)
+        self.assertIn('config_files', schema)
+        self.assertIn('config_watch_interval', schema)
 
-        for gpio in range(28):
-            self.assertIn('gpio{:d}'.format(gpio), schema)
-            self.assertIn('gpio{:d}.when_pressed'.format(gpio), schema)
-            self.assertIn('gpio{:d}.when_held'.format(gpio), schema)
+        self.assertNotIn('gpio0', schema)
+
+    def test_gpio_config(self):
+        schema = Extension().get_config_schema()
+
+        values, errors = schema.deserialize({
+            'gpio0': 'pull_up',
+            'gpio0.when_pressed': 'play_pause',
+            'gpio0.when_held': 'vol_up',
+            'gpio0.when_double_pressed': 'next',
+            'gpio0.when_triple_pressed': 'prev',
+            'gpio40': 'pull_down,50',
+            'gpio40.when_released': 'mute',
+            'gpio1.when_hit': 'mute',
+            'gpiox': 'pull_up',
+        })
+        self.assertEqual('pull_up', values['gpio0'].pull_up_down)
+        self.assertEqual('play_pause', values['gpio0.when_pressed'].fn_type)
+        self.assertEqual('next', values['gpio0.when_double_pressed'].fn_type)
+        self.assertEqual(50, values['gpio40'].bounce_time)
+        self.assertEqual('mute', values['gpio40.when_released'].fn_type)
+        self.assertIn('gpio1.when_hit', errors)
+        self.assertIn('gpiox', errors)
+        self.assertNotIn('gpio0', errors)
+        self.assertNotIn('gpio40', errors)
+
+        serialized = schema.serialize(values)
+        self.assertEqual('mute', serialized['gpio40.when_released'])
+
+    def test_chord_config(self):
+        schema = Extension().get_config_schema()
+        self.assertIn('chord_grace_time', schema)
+
+        values, errors = schema.deserialize({
+            'chord.gpio13+gpio19': 'mute',
+            'chord.gpio13+gpio19.grace_time': '150',
+            'chord.gpio5+gpio6+gpio26': 'shutdown',
+            'chord.gpio13': 'mute',
+            'chord.gpio13+gpio19.hold_time': '1',
+        })
+        self.assertEqual('mute', values['chord.gpio13+gpio19'].fn_type)
+        self.assertEqual(150, values['chord.gpio13+gpio19.grace_time'])
+        self.assertEqual('shutdown',
+                         values['chord.gpio5+gpio6+gpio26'].fn_type)
+        self.assertIn('chord.gpio13', errors)
+        self.assertIn('chord.gpio13+gpio19.hold_time', errors)
+        self.assertNotIn('chord.gpio13+gpio19', errors)
+        self.assertNotIn('chord.gpio5+gpio6+gpio26', errors)
+
+        serialized = schema.serialize(values)
+        self.assertEqual('mute', serialized['chord.gpio13+gpio19'])
+        self.assertEqual('150', serialized['chord.gpio13+gpio19.grace_time'])
+
+    def test_encoder_config(self):
+        schema = Extension().get_config_schema()
+
+        values, errors = schema.deserialize({
+            'encoder0': '20,21',
+            'encoder0.when_rotated_clockwise': 'vol_up,vol_step=2',
+            'encoder0.when_rotated_counter_clockwise': 'vol_down',
+            'encoder0.when_pressed': 'mute',
+            'encoder1': '20',
+        })
+        self.assertEqual(20, values['encoder0'].pin_a)
+        self.assertEqual(
+            'vol_up', values['encoder0.when_rotated_clockwise'].fn_type)
+        self.assertEqual(
+            'vol_down',
+            values['encoder0.when_rotated_counter_clockwise'].fn_type)
+        self.assertIn('encoder0.when_pressed', errors)
+        self.assertIn('encoder1', errors)
+        self.assertNotIn('encoder0', errors)
+
+        serialized = schema.serialize(values)
+        self.assertEqual('20,21,4.0', serialized['encoder0'])
 
     def test_setup(self):
         registry = mock.Mock()
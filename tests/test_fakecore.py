@@ -0,0 +1,103 @@
+#
+#  Copyright 2019 Thomas Wunschel (https://github.com/wuschi)
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+from __future__ import unicode_literals
+
+import unittest
+
+import mock
+
+from mopidy.audio import PlaybackState
+
+from mopidy_phoniebox.fakecore import FakeCore
+
+
+def resolve(future):
+    return future.get(timeout=1)
+
+
+class FakeCoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.listener = mock.Mock()
+        self.core = FakeCore(tracks=3, listener=self.listener)
+
+    def tearDown(self):
+        self.core.stop()
+
+    def test_playback(self):
+        core = self.core
+        self.assertEqual(PlaybackState.STOPPED,
+                         resolve(core.playback.get_state()))
+        self.assertIsNone(resolve(core.playback.get_current_tl_track()))
+
+        resolve(core.playback.play())
+        self.assertEqual(PlaybackState.PLAYING,
+                         resolve(core.playback.get_state()))
+        self.assertEqual(1, resolve(core.playback.get_current_tl_track()).tlid)
+        self.listener.playback_state_changed.assert_called_once_with(
+            old_state=PlaybackState.STOPPED, new_state=PlaybackState.PLAYING)
+
+        resolve(core.playback.pause())
+        self.assertEqual(PlaybackState.PAUSED,
+                         resolve(core.playback.get_state()))
+        resolve(core.playback.resume())
+        self.assertEqual(PlaybackState.PLAYING,
+                         resolve(core.playback.get_state()))
+
+        resolve(core.playback.next())
+        resolve(core.playback.next())
+        self.assertEqual(3, resolve(core.playback.get_current_tl_track()).tlid)
+        resolve(core.playback.previous())
+        self.assertEqual(2, resolve(core.playback.get_current_tl_track()).tlid)
+        resolve(core.playback.play(tlid=3))
+        self.assertEqual(3, resolve(core.playback.get_current_tl_track()).tlid)
+        resolve(core.playback.next())
+        self.assertIsNone(resolve(core.playback.get_current_tl_track()))
+        self.assertEqual(PlaybackState.STOPPED,
+                         resolve(core.playback.get_state()))
+
+    def test_seek(self):
+        core = self.core
+        self.assertFalse(resolve(core.playback.seek(1000)))
+        resolve(core.playback.play())
+        resolve(core.playback.pause())
+        self.assertTrue(resolve(core.playback.seek(5000)))
+        self.assertEqual(5000, resolve(core.playback.get_time_position()))
+        self.listener.seeked.assert_called_once_with(time_position=5000)
+
+    def test_mixer(self):
+        core = self.core
+        resolve(core.mixer.set_volume(20))
+        self.assertEqual(20, resolve(core.mixer.get_volume()))
+        self.listener.volume_changed.assert_called_once_with(volume=20)
+        resolve(core.mixer.set_mute(True))
+        self.assertTrue(resolve(core.mixer.get_mute()))
+        self.listener.mute_changed.assert_called_once_with(mute=True)
+
+    def test_tracklist(self):
+        self.assertEqual(3, resolve(self.core.tracklist.get_length()))
+        self.assertEqual([1, 2, 3], [
+            t.tlid for t in resolve(self.core.tracklist.get_tl_tracks())])
+
+    def test_latency(self):
+        core = FakeCore(latency=0.05)
+        try:
+            future = core.mixer.get_volume()
+            self.assertEqual(50, resolve(future))
+            name, args, timestamp = core.calls[0]
+            self.assertEqual('mixer.get_volume', name)
+        finally:
+            core.stop()
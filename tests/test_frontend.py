@@ -32,8 +32,13 @@ class PhonieboxControlsTest(unittest.TestCase):
         self.assertIs(core, f.core)
         self.assertIs(config['phoniebox'], f.config)
         self.assertIsNotNone(f.controls)
+        self.assertEqual(60, f.controls.state.max_age)
         self.assertIsNone(f.idle_watchdog)
 
+        config['phoniebox']['state_max_age'] = 0
+        f = PhonieboxFrontend(config, core)
+        self.assertIsNone(f.controls.state.max_age)
+
     def test_on_start(self):
         core = mock.Mock()
         config = {'phoniebox': {'idle_time_before_shutdown': 0}}
@@ -48,6 +53,44 @@ class PhonieboxControlsTest(unittest.TestCase):
         self.assertIsNotNone(f.idle_watchdog)
         f.idle_watchdog.stop()
 
+    def test_gpio_setup(self):
+        core = mock.Mock()
+        config = {'phoniebox': {'idle_time_before_shutdown': 0}}
+
+        f = PhonieboxFrontend(config, core)
+        f.gpio_controller = mock.Mock()
+        f.gpio_controller.setup.assert_not_called()
+        f.on_start()
+        f.wait_for_gpios()
+        f.gpio_controller.setup.assert_called_once_with()
+
+        f.gpio_controller.setup.side_effect = RuntimeError('pin in use')
+        f.setup_gpios()
+
+    def test_latency_stats(self):
+        core = mock.Mock()
+        config = {'phoniebox': {'idle_time_before_shutdown': 0,
+                                'latency_log_interval': 5}}
+
+        f = PhonieboxFrontend(config, core)
+        f.on_start()
+        self.assertIsNotNone(f.latency_log_timer)
+        self.assertEqual({}, f.get_latency_stats())
+        self.assertEqual(0, f.get_timer_stats()['pending'])
+        self.assertEqual({}, f.get_debounce_stats())
+        self.assertEqual({'dropped': 0, 'merged': {}, 'shed': {},
+                          'cancelled': {}}, f.get_command_stats())
+        f.gpio_controller.executor.latency = mock.Mock()
+        f.gpio_controller.scheduler = mock.Mock()
+        f.on_latency_log_timer()
+        f.gpio_controller.executor.latency.log.assert_called_once()
+        f.gpio_controller.scheduler.log_stats.assert_called_once()
+        f.gpio_controller.log_debounce_stats = mock.Mock()
+        f.log_latency_stats()
+        f.gpio_controller.log_debounce_stats.assert_called_once_with()
+        f.on_stop()
+        self.assertIsNone(f.latency_log_timer)
+
     def test_on_stop(self):
         core = mock.Mock()
         config = {'phoniebox': {'idle_time_before_shutdown': 100}}
@@ -55,5 +98,38 @@ class PhonieboxControlsTest(unittest.TestCase):
 
         f = PhonieboxFrontend(config, core)
         f.idle_watchdog = iw
+        f.gpio_controller = mock.Mock()
         f.on_stop()
         iw.stop.assert_called_once()
+        f.gpio_controller.close.assert_called_once()
+
+    def test_events(self):
+        core = mock.Mock()
+        config = {'phoniebox': {'idle_time_before_shutdown': 0}}
+
+        f = PhonieboxFrontend(config, core)
+        f.controls.state = mock.Mock()
+        f.playback_state_changed('stopped', 'playing')
+        f.controls.state.playback_state_changed.assert_called_once_with(
+            'stopped', 'playing')
+        f.volume_changed(10)
+        f.controls.state.volume_changed.assert_called_once_with(10)
+        f.mute_changed(True)
+        f.controls.state.mute_changed.assert_called_once_with(True)
+        f.track_playback_started('tl_track')
+        f.controls.state.track_playback_started.assert_called_once_with(
+            'tl_track')
+        f.track_playback_ended('tl_track', 100)
+        f.controls.state.track_playback_ended.assert_called_once_with(
+            'tl_track', 100)
+        f.track_playback_paused('tl_track', 100)
+        f.controls.state.track_playback_paused.assert_called_once_with(
+            'tl_track', 100)
+        f.track_playback_resumed('tl_track', 100)
+        f.controls.state.track_playback_resumed.assert_called_once_with(
+            'tl_track', 100)
+        f.seeked(200)
+        f.controls.state.seeked.assert_called_once_with(200)
+        f.tracklist_changed()
+        f.controls.state.tracklist_changed.assert_called_once_with()
+        f.controls.state.get.assert_called_once_with('tracklist')
@@ -18,6 +18,8 @@ from __future__ import unicode_literals
 import unittest
 
 from mopidy_phoniebox import FunctionConfig
+from mopidy_phoniebox.functionconfig import (
+    Tokenizer, _cache, parse_function_config)
 
 
 class FunctionConfigTest(unittest.TestCase):
@@ -64,6 +66,58 @@ class FunctionConfigTest(unittest.TestCase):
         with self.assertRaises(ValueError):
             FunctionConfig().deserialize("some_fn,a=bla")
 
+    def test_quoting(self):
+        fn_conf = FunctionConfig().deserialize(
+            "radio, uri = 'http://radio/?a=1,b=2', name=\"it's\","
+            + " escaped='\\'\\\\\\n'")
+        self.assertEqual('radio', fn_conf.fn_type)
+        self.assertEqual({
+            'uri': 'http://radio/?a=1,b=2',
+            'name': "it's",
+            'escaped': "'\\\n",
+        }, fn_conf.fn_args)
+
+    def test_types(self):
+        fn_conf = FunctionConfig().deserialize(
+            "some_fn,a=5,b=-2,c=0.5,d=1e3,e=true,f=False")
+        self.assertEqual({'a': 5, 'b': -2, 'c': 0.5, 'd': 1000.0,
+                          'e': True, 'f': False}, fn_conf.fn_args)
+        self.assertIsInstance(fn_conf.fn_args['a'], int)
+        self.assertIsInstance(fn_conf.fn_args['c'], float)
+
+    def test_error_positions(self):
+        for val, message in (
+                ("some_fn,a=bla", "expected string, number or boolean"
+                 + " at position 10"),
+                ("some_fn,a", "expected '=' at position 9"),
+                ("some_fn,a=", "expected value at position 10"),
+                ("some_fn,=1", "expected argument name at position 8"),
+                ("some_fn,a=1 b=2", "expected ',' at position 12"),
+                ("some_fn,a='x", "unterminated string at position 10"),
+                ("some_fn,a='\\x'", "invalid escape '\\x' at position 11"),
+                ("some_fn,a=1-2", "invalid number '1-2' at position 10"),
+                ("some_fn,a=1,a=2", "duplicate argument 'a' at position 12"),
+        ):
+            with self.assertRaises(ValueError) as context:
+                Tokenizer(val).parse()
+            self.assertIn(message, str(context.exception))
+
+    def test_cache(self):
+        _cache.clear()
+        result = parse_function_config("some_fn,a=1")
+        self.assertIs(result, parse_function_config("some_fn,a=1"))
+        self.assertEqual(1, len(_cache))
+
+        # the deserialized arguments are not shared
+        fn_conf = FunctionConfig().deserialize("some_fn,a=1")
+        fn_conf.fn_args['a'] = 2
+        self.assertEqual(
+            1, FunctionConfig().deserialize("some_fn,a=1").fn_args['a'])
+
+        with self.assertRaises(ValueError):
+            parse_function_config("some_fn,a=")
+        self.assertEqual(1, len(_cache))
+
     def test_serialize(self):
         fn_conf = FunctionConfig.tuple_functionconfig("some_fn", None)
         val = FunctionConfig().serialize(fn_conf)
@@ -85,3 +139,14 @@ class FunctionConfigTest(unittest.TestCase):
 
         val = FunctionConfig().serialize(None)
         self.assertEqual("", val)
+
+        fn_conf = FunctionConfig.tuple_functionconfig(
+                "radio", {'uri': "it's,a=\\b"})
+        val = FunctionConfig().serialize(fn_conf)
+        self.assertEqual("radio,uri='it\\'s,a=\\\\b'", val)
+        self.assertEqual(fn_conf, FunctionConfig().deserialize(val))
+
+        fn_conf = FunctionConfig.tuple_functionconfig(
+                "some_fn", {'loud': True})
+        self.assertEqual("some_fn,loud=true",
+                         FunctionConfig().serialize(fn_conf))
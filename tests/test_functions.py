@@ -0,0 +1,201 @@
+#
+#  Copyright 2019 Thomas Wunschel (https://github.com/wuschi)
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+from __future__ import unicode_literals
+
+import sys
+import unittest
+
+import mock
+
+from mopidy_phoniebox.compat import iter_entry_points
+from mopidy_phoniebox.executor import (
+    BULK, CRITICAL, DROP, INTERACTIVE, MERGE, QUEUE)
+from mopidy_phoniebox.functions import (
+    Argument, FUNCTION_TYPES, FunctionRegistry, FunctionType,
+    command_priority)
+
+
+class ArgumentTest(unittest.TestCase):
+
+    def test_convert(self):
+        argument = Argument('vol_step', int, 5, minimum=1, maximum=100)
+        self.assertEqual(3, argument.convert(3))
+        self.assertEqual(3, argument.convert(3.0))
+        self.assertIsInstance(argument.convert(3.0), int)
+        with self.assertRaises(ValueError):
+            argument.convert(3.5)
+        with self.assertRaises(ValueError):
+            argument.convert('3')
+        with self.assertRaises(ValueError):
+            argument.convert(True)
+        with self.assertRaises(ValueError):
+            argument.convert(0)
+        with self.assertRaises(ValueError):
+            argument.convert(101)
+
+        argument = Argument('factor', float, 1.0)
+        self.assertEqual(2.0, argument.convert(2))
+        self.assertIsInstance(argument.convert(2), float)
+
+        argument = Argument('seconds', float, 5, above=0)
+        self.assertEqual(0.5, argument.convert(0.5))
+        with self.assertRaises(ValueError):
+            argument.convert(0)
+
+
+class FunctionTypeTest(unittest.TestCase):
+
+    def test_compile(self):
+        controls = mock.Mock()
+        fn = FunctionType('play_pause', 'play_pause').compile(controls, {})
+        fn()
+        controls.play_pause.assert_called_once_with()
+
+        fn_type = FunctionType('seek_fwd', 'seek_fwd',
+                               [Argument('seconds', int, 5, minimum=1)])
+        fn_type.compile(controls, None)()
+        controls.seek_fwd.assert_called_with(5)
+        fn_type.compile(controls, {'seconds': 20})()
+        controls.seek_fwd.assert_called_with(20)
+
+    def test_compile_invalid(self):
+        controls = mock.Mock()
+        fn_type = FunctionType('seek_fwd', 'seek_fwd',
+                               [Argument('seconds', int, 5, minimum=1)])
+        with self.assertRaises(ValueError):
+            fn_type.compile(controls, {'secnods': 20})
+        with self.assertRaises(ValueError):
+            fn_type.compile(controls, {'seconds': -1})
+        with self.assertRaises(ValueError):
+            FunctionType('mute', 'mute_unmute').compile(controls, {'a': 1})
+        controls.seek_fwd.assert_not_called()
+
+    def test_compile_function(self):
+        controls = mock.Mock()
+        fn = mock.Mock()
+        fn_type = FunctionType('radio', fn, [Argument('station', int, 1)])
+        fn_type.compile(controls, {'station': 3})()
+        fn.assert_called_once_with(controls, 3)
+
+    def test_function_types(self):
+        controls = mock.Mock()
+        for name, fn_type in FUNCTION_TYPES.items():
+            self.assertEqual(name, fn_type.name)
+            fn_type.compile(controls)()
+            getattr(controls, fn_type.method).assert_called_once()
+        controls.volume_up.assert_called_once_with(5)
+        controls.seek_bwd.assert_called_once_with(5)
+
+        FUNCTION_TYPES['seek_fwd'].compile(controls, {'seconds': 2.5})()
+        controls.seek_fwd.assert_called_with(2.5)
+        with self.assertRaises(ValueError):
+            FUNCTION_TYPES['seek_fwd'].compile(controls, {'seconds': 0})
+
+    def test_repeat_policies(self):
+        self.assertEqual(MERGE, FUNCTION_TYPES['vol_up'].repeat)
+        self.assertEqual(MERGE, FUNCTION_TYPES['seek_fwd'].repeat)
+        self.assertEqual(DROP, FUNCTION_TYPES['next'].repeat)
+        self.assertEqual(DROP, FUNCTION_TYPES['prev'].repeat)
+        self.assertEqual(QUEUE, FunctionType('radio', 'radio').repeat)
+
+    def test_priorities(self):
+        self.assertEqual(CRITICAL, command_priority('shutdown'))
+        self.assertEqual(INTERACTIVE, command_priority('play_pause'))
+        self.assertEqual(INTERACTIVE, command_priority('next'))
+        self.assertEqual(BULK, command_priority('vol_down'))
+        self.assertEqual(BULK, command_priority('seek_fwd'))
+        self.assertEqual(INTERACTIVE, command_priority('unknown'))
+
+
+class FunctionRegistryTest(unittest.TestCase):
+
+    def entry_point(self, name, fn_type=None):
+        entry_point = mock.Mock()
+        entry_point.name = name
+        entry_point.load.return_value = fn_type
+        return entry_point
+
+    @mock.patch('mopidy_phoniebox.functions.iter_entry_points')
+    def test_builtins(self, iter_entry_points):
+        registry = FunctionRegistry(FUNCTION_TYPES)
+        self.assertIs(FUNCTION_TYPES['vol_up'], registry['vol_up'])
+        iter_entry_points.assert_not_called()
+
+    @mock.patch('mopidy_phoniebox.functions.iter_entry_points')
+    def test_entry_points(self, iter_entry_points):
+        radio = FunctionType('radio', mock.Mock())
+        entry_points = [self.entry_point('radio', radio),
+                        self.entry_point('lights'),
+                        self.entry_point('vol_up')]
+        iter_entry_points.return_value = entry_points
+        registry = FunctionRegistry(FUNCTION_TYPES, 'group')
+
+        self.assertIn('radio', registry)
+        self.assertIn('lights', registry)
+        self.assertNotIn('unknown', registry)
+        self.assertIn('vol_up', registry.names())
+        self.assertIn('radio', registry.names())
+        for entry_point in entry_points:
+            entry_point.load.assert_not_called()
+
+        self.assertIs(radio, registry['radio'])
+        self.assertIs(radio, registry['radio'])
+        entry_points[0].load.assert_called_once()
+        entry_points[1].load.assert_not_called()
+        self.assertIs(FUNCTION_TYPES['vol_up'], registry['vol_up'])
+        entry_points[2].load.assert_not_called()
+        iter_entry_points.assert_called_once_with('group')
+
+        with self.assertRaises(KeyError):
+            registry['unknown']
+
+    @mock.patch('mopidy_phoniebox.functions.iter_entry_points')
+    def test_invalid_entry_points(self, iter_entry_points):
+        broken = self.entry_point('broken')
+        broken.load.side_effect = ImportError('no module named broken')
+        iter_entry_points.return_value = [
+            broken,
+            self.entry_point('other', object()),
+            self.entry_point('renamed', FunctionType('radio', mock.Mock())),
+        ]
+        registry = FunctionRegistry(FUNCTION_TYPES)
+        for name in 'broken', 'other', 'renamed':
+            with self.assertRaises(ValueError):
+                registry[name]
+
+
+@unittest.skipIf(sys.version_info < (3, 8), "needs importlib.metadata")
+class IterEntryPointsTest(unittest.TestCase):
+
+    @mock.patch('importlib.metadata.entry_points')
+    def test_group(self, entry_points):
+        entry_point = mock.Mock()
+        entry_points.return_value = [entry_point]
+        self.assertEqual([entry_point], iter_entry_points('group'))
+        entry_points.assert_called_once_with(group='group')
+
+    @mock.patch('importlib.metadata.entry_points')
+    def test_group_by_name(self, entry_points):
+        # python < 3.10 returns the entry points of all groups by group
+        entry_point = mock.Mock()
+
+        def find(**kwargs):
+            if kwargs:
+                raise TypeError('unexpected keyword argument')
+            return {'group': (entry_point,), 'other': (mock.Mock(),)}
+        entry_points.side_effect = find
+        self.assertEqual([entry_point], iter_entry_points('group'))
+        self.assertEqual([], iter_entry_points('missing'))
@@ -65,6 +65,18 @@ class GpioConfigTest(unittest.TestCase):
         with self.assertRaises(ValueError):
             GpioConfig().deserialize("pull_up,150,2,False,")
 
+    def test_deserialize_adaptive_bounce_time(self):
+        gpio_conf = GpioConfig().deserialize("pull_up,5-50,2")
+        self.assertEqual((5, 50), gpio_conf.bounce_time)
+        self.assertEqual(5, gpio_conf.bounce_time.minimum)
+        self.assertEqual(50, gpio_conf.bounce_time.maximum)
+        self.assertEqual("pull_up,5-50,2.0,False",
+                         GpioConfig().serialize(gpio_conf))
+
+        for bounce_time in "50-5", "5-5", "0-50", "5-x", "5-50-100":
+            with self.assertRaises(ValueError):
+                GpioConfig().deserialize("pull_up," + bounce_time)
+
     def test_deserialize_pull_up_down(self):
         gpio_conf = GpioConfig().deserialize("   pull_up,150,2,False")
         self.assertEqual("pull_up", gpio_conf.pull_up_down)
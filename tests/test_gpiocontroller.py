@@ -15,6 +15,8 @@
 #
 from __future__ import unicode_literals
 
+import subprocess
+import sys
 import time
 import unittest
 
@@ -25,18 +27,40 @@ import mock
 
 from mopidy_phoniebox import FunctionConfig, GpioConfig
 from mopidy_phoniebox.gpiocontroller import GpioController
+from mopidy_phoniebox.inputs import DeviceButton
 
 
 class GpioControllerTest(unittest.TestCase):
 
     Device.pin_factory = MockFactory()
 
+    def test_deferred_setup(self):
+        Device.pin_factory.reset()
+        controls = mock.Mock()
+        config = {
+            'gpio27': GpioConfig().deserialize("pull_up"),
+            'gpio27.when_pressed': FunctionConfig().deserialize('play_pause')
+        }
+        controller = GpioController(config, controls, deferred=True)
+        self.assertIsNone(controller.gpios.get(27))
+        controller.setup()
+        self.assertIsNotNone(controller.gpios[27])
+        controller.close()
+
+    def test_lazy_gpiozero_import(self):
+        code = ('import sys\n'
+                'from mopidy_phoniebox.gpiocontroller import GpioController\n'
+                'GpioController({}, None).close()\n'
+                'print("gpiozero" in sys.modules)\n')
+        output = subprocess.check_output([sys.executable, '-c', code])
+        self.assertEqual(b'False', output.strip())
+
     def test_init(self):
         config = {}
         controls = mock.Mock()
         controller = GpioController(config, controls)
         for gpio in range(28):
-            self.assertIsNone(controller.gpios[gpio])
+            self.assertIsNone(controller.gpios.get(gpio))
 
         Device.pin_factory.reset()
         controls.reset_mock()
@@ -45,7 +69,7 @@ class GpioControllerTest(unittest.TestCase):
             config['gpio{:d}'.format(gpio)] = None
         controller = GpioController(config, controls)
         for gpio in range(28):
-            self.assertIsNone(controller.gpios[gpio])
+            self.assertIsNone(controller.gpios.get(gpio))
 
         Device.pin_factory.reset()
         controls.reset_mock()
@@ -55,7 +79,7 @@ class GpioControllerTest(unittest.TestCase):
         }
         controller = GpioController(config, controls)
         for gpio in range(27):
-            self.assertIsNone(controller.gpios[gpio])
+            self.assertIsNone(controller.gpios.get(gpio))
         self.assertIsNotNone(controller.gpios[27])
         self.assertTrue(controller.gpios[27].pull_up)
         self.assertEqual(1, controller.gpios[27].hold_time)
@@ -67,6 +91,7 @@ class GpioControllerTest(unittest.TestCase):
         btn_pin.drive_low()
         time.sleep(0.1)
         btn_pin.drive_high()
+        controller.executor.join()
         controls.play_pause.assert_called_once()
 
         Device.pin_factory.reset()
@@ -77,7 +102,7 @@ class GpioControllerTest(unittest.TestCase):
         }
         controller = GpioController(config, controls)
         for gpio in range(27):
-            self.assertIsNone(controller.gpios[gpio])
+            self.assertIsNone(controller.gpios.get(gpio))
         self.assertIsNotNone(controller.gpios[27])
         self.assertTrue(controller.gpios[27].pull_up)
         self.assertEqual(1, controller.gpios[27].hold_time)
@@ -90,12 +115,14 @@ class GpioControllerTest(unittest.TestCase):
         time.sleep(0.1)
         btn_pin.drive_high()
         time.sleep(0.2)
+        controller.executor.join()
         controls.play_pause.assert_not_called()
 
         btn_pin.drive_low()
         time.sleep(1.2)
         btn_pin.drive_high()
         time.sleep(0.2)
+        controller.executor.join()
         controls.play_pause.assert_called_once()
 
         Device.pin_factory.reset()
@@ -106,8 +133,8 @@ class GpioControllerTest(unittest.TestCase):
         }
         controller = GpioController(config, controls)
         for gpio in range(27):
-            self.assertIsNone(controller.gpios[gpio])
-        self.assertIsNone(controller.gpios[27])
+            self.assertIsNone(controller.gpios.get(gpio))
+        self.assertIsNone(controller.gpios.get(27))
 
     def test_configure_gpios(self):
         Device.pin_factory.reset()
@@ -116,44 +143,44 @@ class GpioControllerTest(unittest.TestCase):
         controller = GpioController(config, controls)
 
         Device.pin_factory.reset()
-        controller.gpios = [None] * 28
+        controller.gpios = {}
         controller.config = {'gpio27': GpioConfig().deserialize("pull_up,150")}
         controller.configure_gpios()
         for gpio in range(27):
-            self.assertIsNone(controller.gpios[gpio])
+            self.assertIsNone(controller.gpios.get(gpio))
         self.assertIsNotNone(controller.gpios[27])
         self.assertTrue(controller.gpios[27].pull_up)
         self.assertEqual(1, controller.gpios[27].hold_time)
         self.assertFalse(controller.gpios[27].hold_repeat)
 
         Device.pin_factory.reset()
-        controller.gpios = [None] * 28
+        controller.gpios = {}
         controller.config = {'gpio27': GpioConfig().deserialize("pull_down")}
         controller.configure_gpios()
         for gpio in range(27):
-            self.assertIsNone(controller.gpios[gpio])
+            self.assertIsNone(controller.gpios.get(gpio))
         self.assertIsNotNone(controller.gpios[27])
         self.assertFalse(controller.gpios[27].pull_up)
         self.assertEqual(1, controller.gpios[27].hold_time)
         self.assertFalse(controller.gpios[27].hold_repeat)
 
         Device.pin_factory.reset()
-        controller.gpios = [None] * 28
+        controller.gpios = {}
         controller.config = {'gpio27': GpioConfig().deserialize("none")}
         controller.configure_gpios()
         for gpio in range(27):
-            self.assertIsNone(controller.gpios[gpio])
+            self.assertIsNone(controller.gpios.get(gpio))
         self.assertIsNotNone(controller.gpios[27])
         self.assertIsNone(controller.gpios[27].pull_up)
         self.assertEqual(1, controller.gpios[27].hold_time)
         self.assertFalse(controller.gpios[27].hold_repeat)
 
         Device.pin_factory.reset()
-        controller.gpios = [None] * 28
+        controller.gpios = {}
         controller.config = {'gpio27': GpioConfig().deserialize("none_invert")}
         controller.configure_gpios()
         for gpio in range(27):
-            self.assertIsNone(controller.gpios[gpio])
+            self.assertIsNone(controller.gpios.get(gpio))
         self.assertIsNotNone(controller.gpios[27])
         self.assertIsNone(controller.gpios[27].pull_up)
         self.assertEqual(1, controller.gpios[27].hold_time)
@@ -164,189 +191,66 @@ class GpioControllerTest(unittest.TestCase):
         config = {}
         controller = GpioController(config, controls)
 
+        # no functions configured, nothing to do
         controller.configure_button = mock.Mock()
         controller.configure_buttons()
-        controller.configure_button.assert_has_calls(
-            [
-                mock.call(0, 'when_pressed'),
-                mock.call(0, 'when_released'),
-                mock.call(0, 'when_held'),
-                mock.call(1, 'when_pressed'),
-                mock.call(1, 'when_released'),
-                mock.call(1, 'when_held'),
-                mock.call(2, 'when_pressed'),
-                mock.call(2, 'when_released'),
-                mock.call(2, 'when_held'),
-                mock.call(3, 'when_pressed'),
-                mock.call(3, 'when_released'),
-                mock.call(3, 'when_held'),
-                mock.call(4, 'when_pressed'),
-                mock.call(4, 'when_released'),
-                mock.call(4, 'when_held'),
-                mock.call(5, 'when_pressed'),
-                mock.call(5, 'when_released'),
-                mock.call(5, 'when_held'),
-                mock.call(6, 'when_pressed'),
-                mock.call(6, 'when_released'),
-                mock.call(6, 'when_held'),
-                mock.call(7, 'when_pressed'),
-                mock.call(7, 'when_released'),
-                mock.call(7, 'when_held'),
-                mock.call(8, 'when_pressed'),
-                mock.call(8, 'when_released'),
-                mock.call(8, 'when_held'),
-                mock.call(9, 'when_pressed'),
-                mock.call(9, 'when_released'),
-                mock.call(9, 'when_held'),
-                mock.call(10, 'when_pressed'),
-                mock.call(10, 'when_released'),
-                mock.call(10, 'when_held'),
-                mock.call(11, 'when_pressed'),
-                mock.call(11, 'when_released'),
-                mock.call(11, 'when_held'),
-                mock.call(12, 'when_pressed'),
-                mock.call(12, 'when_released'),
-                mock.call(12, 'when_held'),
-                mock.call(13, 'when_pressed'),
-                mock.call(13, 'when_released'),
-                mock.call(13, 'when_held'),
-                mock.call(14, 'when_pressed'),
-                mock.call(14, 'when_released'),
-                mock.call(14, 'when_held'),
-                mock.call(15, 'when_pressed'),
-                mock.call(15, 'when_released'),
-                mock.call(15, 'when_held'),
-                mock.call(16, 'when_pressed'),
-                mock.call(16, 'when_released'),
-                mock.call(16, 'when_held'),
-                mock.call(17, 'when_pressed'),
-                mock.call(17, 'when_released'),
-                mock.call(17, 'when_held'),
-                mock.call(18, 'when_pressed'),
-                mock.call(18, 'when_released'),
-                mock.call(18, 'when_held'),
-                mock.call(19, 'when_pressed'),
-                mock.call(19, 'when_released'),
-                mock.call(19, 'when_held'),
-                mock.call(20, 'when_pressed'),
-                mock.call(20, 'when_released'),
-                mock.call(20, 'when_held'),
-                mock.call(21, 'when_pressed'),
-                mock.call(21, 'when_released'),
-                mock.call(21, 'when_held'),
-                mock.call(22, 'when_pressed'),
-                mock.call(22, 'when_released'),
-                mock.call(22, 'when_held'),
-                mock.call(23, 'when_pressed'),
-                mock.call(23, 'when_released'),
-                mock.call(23, 'when_held'),
-                mock.call(24, 'when_pressed'),
-                mock.call(24, 'when_released'),
-                mock.call(24, 'when_held'),
-                mock.call(25, 'when_pressed'),
-                mock.call(25, 'when_released'),
-                mock.call(25, 'when_held'),
-                mock.call(26, 'when_pressed'),
-                mock.call(26, 'when_released'),
-                mock.call(26, 'when_held'),
-                mock.call(27, 'when_pressed'),
-                mock.call(27, 'when_released'),
-                mock.call(27, 'when_held')
-            ]
-        )
+        controller.configure_button.assert_not_called()
+
+        # only the configured functions, the multi-tap functions last
+        controller.config = {
+            'gpio3': GpioConfig().deserialize('pull_up'),
+            'gpio3.when_double_pressed': FunctionConfig().deserialize('next'),
+            'gpio3.when_pressed': FunctionConfig().deserialize('play_pause'),
+            'gpio3.when_held': None,
+            'gpio40.when_released': FunctionConfig().deserialize('mute'),
+            'gpio17.when_held': FunctionConfig().deserialize('vol_up'),
+        }
+        controller.configure_buttons()
+        self.assertEqual([
+            mock.call(3, 'when_pressed'),
+            mock.call(17, 'when_held'),
+            mock.call(40, 'when_released'),
+            mock.call(3, 'when_double_pressed'),
+        ], controller.configure_button.mock_calls)
+
+        controller.configure_button.reset_mock()
+        controller.configure_buttons([17, 40, 5])
+        self.assertEqual([
+            mock.call(17, 'when_held'),
+            mock.call(40, 'when_released'),
+        ], controller.configure_button.mock_calls)
 
         # assert all configure_button() are called even when ValueErrors raised
         controller.configure_button = mock.Mock()
         controller.configure_button.side_effect = ValueError
         controller.configure_buttons()
-        controller.configure_button.assert_has_calls(
-            [
-                mock.call(0, 'when_pressed'),
-                mock.call(0, 'when_released'),
-                mock.call(0, 'when_held'),
-                mock.call(1, 'when_pressed'),
-                mock.call(1, 'when_released'),
-                mock.call(1, 'when_held'),
-                mock.call(2, 'when_pressed'),
-                mock.call(2, 'when_released'),
-                mock.call(2, 'when_held'),
-                mock.call(3, 'when_pressed'),
-                mock.call(3, 'when_released'),
-                mock.call(3, 'when_held'),
-                mock.call(4, 'when_pressed'),
-                mock.call(4, 'when_released'),
-                mock.call(4, 'when_held'),
-                mock.call(5, 'when_pressed'),
-                mock.call(5, 'when_released'),
-                mock.call(5, 'when_held'),
-                mock.call(6, 'when_pressed'),
-                mock.call(6, 'when_released'),
-                mock.call(6, 'when_held'),
-                mock.call(7, 'when_pressed'),
-                mock.call(7, 'when_released'),
-                mock.call(7, 'when_held'),
-                mock.call(8, 'when_pressed'),
-                mock.call(8, 'when_released'),
-                mock.call(8, 'when_held'),
-                mock.call(9, 'when_pressed'),
-                mock.call(9, 'when_released'),
-                mock.call(9, 'when_held'),
-                mock.call(10, 'when_pressed'),
-                mock.call(10, 'when_released'),
-                mock.call(10, 'when_held'),
-                mock.call(11, 'when_pressed'),
-                mock.call(11, 'when_released'),
-                mock.call(11, 'when_held'),
-                mock.call(12, 'when_pressed'),
-                mock.call(12, 'when_released'),
-                mock.call(12, 'when_held'),
-                mock.call(13, 'when_pressed'),
-                mock.call(13, 'when_released'),
-                mock.call(13, 'when_held'),
-                mock.call(14, 'when_pressed'),
-                mock.call(14, 'when_released'),
-                mock.call(14, 'when_held'),
-                mock.call(15, 'when_pressed'),
-                mock.call(15, 'when_released'),
-                mock.call(15, 'when_held'),
-                mock.call(16, 'when_pressed'),
-                mock.call(16, 'when_released'),
-                mock.call(16, 'when_held'),
-                mock.call(17, 'when_pressed'),
-                mock.call(17, 'when_released'),
-                mock.call(17, 'when_held'),
-                mock.call(18, 'when_pressed'),
-                mock.call(18, 'when_released'),
-                mock.call(18, 'when_held'),
-                mock.call(19, 'when_pressed'),
-                mock.call(19, 'when_released'),
-                mock.call(19, 'when_held'),
-                mock.call(20, 'when_pressed'),
-                mock.call(20, 'when_released'),
-                mock.call(20, 'when_held'),
-                mock.call(21, 'when_pressed'),
-                mock.call(21, 'when_released'),
-                mock.call(21, 'when_held'),
-                mock.call(22, 'when_pressed'),
-                mock.call(22, 'when_released'),
-                mock.call(22, 'when_held'),
-                mock.call(23, 'when_pressed'),
-                mock.call(23, 'when_released'),
-                mock.call(23, 'when_held'),
-                mock.call(24, 'when_pressed'),
-                mock.call(24, 'when_released'),
-                mock.call(24, 'when_held'),
-                mock.call(25, 'when_pressed'),
-                mock.call(25, 'when_released'),
-                mock.call(25, 'when_held'),
-                mock.call(26, 'when_pressed'),
-                mock.call(26, 'when_released'),
-                mock.call(26, 'when_held'),
-                mock.call(27, 'when_pressed'),
-                mock.call(27, 'when_released'),
-                mock.call(27, 'when_held')
-            ]
-        )
+        self.assertEqual(4, controller.configure_button.call_count)
+
+    def test_pins_beyond_27(self):
+        Device.pin_factory.reset()
+        controls = mock.Mock()
+        config = {
+            'gpio40': GpioConfig().deserialize('pull_up'),
+            'gpio40.when_pressed': FunctionConfig().deserialize('play_pause'),
+        }
+        controller = GpioController(config, controls)
+        self.assertEqual([40], list(controller.gpios))
+        Device.pin_factory.pin(40).drive_low()
+        controller.executor.join()
+        controls.play_pause.assert_called_once_with()
+        controller.close()
+        self.assertEqual({}, controller.gpios)
+
+    def test_pin_map(self):
+        controller = GpioController({}, mock.Mock())
+        pins = controller.pin_map()
+        self.assertIs(pins, controller.pin_map())
+        self.assertEqual(0, len(pins))
+        controller.config = {
+            'gpio5.when_held': FunctionConfig().deserialize('next')}
+        pins = controller.pin_map()
+        self.assertEqual([5], list(pins))
+        controller.close()
 
     def test_configure_button(self):
         controls = mock.Mock()
@@ -355,25 +259,25 @@ class GpioControllerTest(unittest.TestCase):
 
         # no config set, should pass without changes
         Device.pin_factory.reset()
-        controller.gpios = [None] * 28
+        controller.gpios = {}
         controller.config = {}
         controller.configure_button(27, 'when_held')
         controller.configure_button(27, 'when_released')
 
         Device.pin_factory.reset()
-        controller.gpios = [None] * 28
+        controller.gpios = {}
         controller.config = {'gpio27': None}
         controller.configure_button(27, 'when_released')
         controller.configure_button(27, 'when_held')
 
         Device.pin_factory.reset()
-        controller.gpios = [None] * 28
+        controller.gpios = {}
         controller.config = {'gpio27': ''}
         controller.configure_button(27, 'when_released')
         controller.configure_button(27, 'when_held')
 
         Device.pin_factory.reset()
-        controller.gpios = [None] * 28
+        controller.gpios = {}
         controller.config = {
             'gpio27.when_pressed': FunctionConfig().deserialize('play_pause')
         }
@@ -382,7 +286,7 @@ class GpioControllerTest(unittest.TestCase):
             controller.configure_button(27, 'when_pressed')
 
         Device.pin_factory.reset()
-        controller.gpios = [None] * 28
+        controller.gpios = {}
         controller.gpios[0] = Button(0)
         controller.config = {
             'gpio0.when_pressed': FunctionConfig().deserialize('unknown_fn')
@@ -391,7 +295,7 @@ class GpioControllerTest(unittest.TestCase):
             controller.configure_button(0, 'when_pressed')
 
         Device.pin_factory.reset()
-        controller.gpios = [None] * 28
+        controller.gpios = {}
         controller.gpios[0] = Button(0)
         controller.config = {
             'gpio0.when_pressed': FunctionConfig().deserialize('play_pause')
@@ -400,7 +304,7 @@ class GpioControllerTest(unittest.TestCase):
         self.assertIsNotNone(controller.gpios[0].when_pressed)
 
         Device.pin_factory.reset()
-        controller.gpios = [None] * 28
+        controller.gpios = {}
         controller.gpios[0] = Button(0)
         controller.gpios[0].when_pressed = lambda x: x
         controller.config = {
@@ -410,7 +314,7 @@ class GpioControllerTest(unittest.TestCase):
             controller.configure_button(0, 'when_pressed')
 
         Device.pin_factory.reset()
-        controller.gpios = [None] * 28
+        controller.gpios = {}
         controller.gpios[0] = Button(0)
         controller.config = {
             'gpio0.when_held': FunctionConfig().deserialize(' play_pause ')
@@ -419,7 +323,7 @@ class GpioControllerTest(unittest.TestCase):
         self.assertIsNotNone(controller.gpios[0].when_held)
 
         Device.pin_factory.reset()
-        controller.gpios = [None] * 28
+        controller.gpios = {}
         controller.gpios[0] = Button(0)
         controller.gpios[0].when_held = lambda x: x
         controller.config = {
@@ -429,7 +333,7 @@ class GpioControllerTest(unittest.TestCase):
             controller.configure_button(0, 'when_held')
 
         Device.pin_factory.reset()
-        controller.gpios = [None] * 28
+        controller.gpios = {}
         controller.gpios[0] = Button(0)
         controller.config = {
             'gpio0.when_released': FunctionConfig().deserialize(' play_pause ')
@@ -438,7 +342,7 @@ class GpioControllerTest(unittest.TestCase):
         self.assertIsNotNone(controller.gpios[0].when_released)
 
         Device.pin_factory.reset()
-        controller.gpios = [None] * 28
+        controller.gpios = {}
         controller.gpios[0] = Button(0)
         controller.gpios[0].when_released = lambda x: x
         controller.config = {
@@ -453,132 +357,110 @@ class GpioControllerTest(unittest.TestCase):
         controller = GpioController(config, controls)
 
         Device.pin_factory.reset()
-        btn = Button(0)
-        controller.on_held(btn, controls.some_fn)
+        btn = DeviceButton(controller.scheduler, 0)
+        controller.on_held('some_fn', controls.some_fn, btn)
+        controller.executor.join()
         self.assertTrue(btn.was_held)
         controls.some_fn.assert_called_once()
 
+    def test_on_held_repeat_policy(self):
+        config = {}
+        controls = mock.Mock()
+        executor = mock.Mock()
+        controller = GpioController(config, controls, executor)
+
+        Device.pin_factory.reset()
+        btn = DeviceButton(controller.scheduler, 0)
+        controller.on_held('vol_up', controls.volume_up, btn)
+        executor.submit_repeat.assert_called_once_with(
+            (btn, 'vol_up'), 'vol_up', controls.volume_up, 'merge')
+        executor.reset_mock()
+        controller.on_held('next', controls.next, btn)
+        executor.submit_repeat.assert_called_once_with(
+            (btn, 'next'), 'next', controls.next, 'drop')
+        self.assertEqual('queue', controller.repeat_policy('some_fn'))
+        btn.close()
+        controller.close()
+
     def test_on_released(self):
         config = {}
         controls = mock.Mock()
         controller = GpioController(config, controls)
 
         Device.pin_factory.reset()
-        btn = Button(0)
+        btn = DeviceButton(controller.scheduler, 0)
         self.assertFalse(btn.was_held)
-        controller.on_released(btn, controls.some_fn)
+        controller.on_released('some_fn', controls.some_fn, btn)
+        controller.executor.join()
         self.assertFalse(btn.was_held)
         controls.some_fn.assert_called_once()
 
         controls.reset_mock()
         Device.pin_factory.reset()
         btn.was_held = True
-        controller.on_released(btn, controls.some_fn)
+        controller.on_released('some_fn', controls.some_fn, btn)
+        controller.executor.join()
         self.assertFalse(btn.was_held)
         controls.some_fn.assert_not_called()
 
-    def test_gpiocontrols_volume_up(self):
-        config = {}
-        controls = mock.Mock()
-        controller = GpioController(config, controls)
-
-        args = {}
-        controller.controls.volume_up(**args)
-        controls.volume_up.assert_called_once()
-
-        args = {'vol_step': 3}
-        controller.controls.volume_up(**args)
-        controls.volume_up.assert_called_with(3)
-
-    def test_gpiocontrols_volume_down(self):
-        config = {}
-        controls = mock.Mock()
-        controller = GpioController(config, controls)
-
-        args = {}
-        controller.controls.volume_down(**args)
-        controls.volume_down.assert_called_once()
-
-        args = {'vol_step': 3}
-        controller.controls.volume_down(**args)
-        controls.volume_down.assert_called_with(3)
-
-    def test_gpiocontrols_mute_unmute(self):
-        config = {}
-        controls = mock.Mock()
-        controller = GpioController(config, controls)
-
-        args = {}
-        controller.controls.mute_unmute(**args)
-        controls.mute_unmute.assert_called_once()
-
-    def test_gpiocontrols_shutdown(self):
-        config = {}
-        controls = mock.Mock()
-        controller = GpioController(config, controls)
-
-        args = {}
-        controller.controls.shutdown(**args)
-        controls.shutdown.assert_called_once()
-
-    def test_gpiocontrols_play_pause(self):
-        config = {}
-        controls = mock.Mock()
-        controller = GpioController(config, controls)
-
-        args = {}
-        controller.controls.play_pause(**args)
-        controls.play_pause.assert_called_once()
-
-    def test_gpiocontrols_cd_previous(self):
-        config = {}
-        controls = mock.Mock()
-        controller = GpioController(config, controls)
-
-        args = {}
-        controller.controls.cd_previous(**args)
-        controls.cd_previous.assert_called_once()
-
-    def test_gpiocontrols_previous(self):
-        config = {}
+    def test_close(self):
+        Device.pin_factory.reset()
         controls = mock.Mock()
+        config = {
+            'gpio27': GpioConfig().deserialize("pull_up"),
+            'gpio27.when_pressed': FunctionConfig().deserialize('play_pause')
+        }
         controller = GpioController(config, controls)
+        btn = controller.gpios[27]
+        controller.close()
+        self.assertIsNone(controller.gpios.get(27))
+        self.assertTrue(btn.closed)
+        self.assertFalse(controller.executor.thread.is_alive())
 
-        args = {}
-        controller.controls.previous(**args)
-        controls.previous.assert_called_once()
-
-    def test_gpiocontrols_next(self):
-        config = {}
+    def test_compiled_functions(self):
+        Device.pin_factory.reset()
         controls = mock.Mock()
+        config = {
+            'gpio26': GpioConfig().deserialize("pull_up"),
+            'gpio26.when_pressed': FunctionConfig().deserialize('vol_up'),
+            'gpio27': GpioConfig().deserialize("pull_up"),
+            'gpio27.when_pressed': FunctionConfig().deserialize(
+                'seek_fwd,seconds=10'),
+        }
         controller = GpioController(config, controls)
 
-        args = {}
-        controller.controls.next(**args)
-        controls.next.assert_called_once()
+        Device.pin_factory.pin(26).drive_low()
+        Device.pin_factory.pin(27).drive_low()
+        controller.executor.join()
+        controls.volume_up.assert_called_once_with(5)
+        controls.seek_fwd.assert_called_once_with(10)
+        controller.close()
 
-    def test_gpiocontrols_seek_bwd(self):
-        config = {}
+    def test_invalid_function_args(self):
+        Device.pin_factory.reset()
         controls = mock.Mock()
-        controller = GpioController(config, controls)
-
-        args = {}
-        controller.controls.seek_bwd(**args)
-        controls.seek_bwd.assert_called_once()
-
-        args = {'seconds': 3}
-        controller.controls.seek_bwd(**args)
-        controls.seek_bwd.assert_called_with(3)
+        controller = GpioController({}, controls)
 
-    def test_gpiocontrols_seek_fwd(self):
-        config = {}
-        controls = mock.Mock()
-        controller = GpioController(config, controls)
+        controller.gpios[0] = Button(0)
+        controller.config = {
+            'gpio0.when_pressed': FunctionConfig().deserialize(
+                'vol_up,vol_stpe=3')
+        }
+        with self.assertRaises(ValueError):
+            controller.configure_button(0, 'when_pressed')
+        self.assertIsNone(controller.gpios[0].when_pressed)
 
-        args = {}
-        controller.controls.seek_fwd(**args)
-        controls.seek_fwd.assert_called_once()
+        controller.config = {
+            'gpio0.when_pressed': FunctionConfig().deserialize(
+                'play_pause,vol_step=3')
+        }
+        with self.assertRaises(ValueError):
+            controller.configure_button(0, 'when_pressed')
 
-        args = {'seconds': 3}
-        controller.controls.seek_fwd(**args)
-        controls.seek_fwd.assert_called_with(3)
+        controller.config = {
+            'gpio0.when_pressed': FunctionConfig().deserialize(
+                "vol_up,vol_step='3'")
+        }
+        with self.assertRaises(ValueError):
+            controller.configure_button(0, 'when_pressed')
+        controller.close()
@@ -0,0 +1,426 @@
+#
+#  Copyright 2019 Thomas Wunschel (https://github.com/wuschi)
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+from __future__ import unicode_literals
+
+import os
+import select
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from gpiozero import Device
+from gpiozero.pins.mock import MockFactory
+
+import mock
+
+from mopidy_phoniebox import FunctionConfig, GpioConfig
+from mopidy_phoniebox.compat import monotonic
+from mopidy_phoniebox.gpiocontroller import GpioController
+from mopidy_phoniebox.inputs import (
+    DeviceButton, EdgeButton, EdgeMultiplexer, MockEdgeSource,
+    SysfsEdgeSource, nonblocking_pipe, wrap_callback)
+from mopidy_phoniebox.scheduler import ManualScheduler, Scheduler
+from mopidy_phoniebox.trace import read_trace
+
+
+class EdgeMultiplexerTest(unittest.TestCase):
+
+    def setUp(self):
+        Device.pin_factory = MockFactory()
+        self.multiplexer = EdgeMultiplexer.for_factory()
+
+    def tearDown(self):
+        self.multiplexer.close()
+
+    def test_for_factory(self):
+        self.assertIsInstance(self.multiplexer.source, MockEdgeSource)
+
+    def test_press_release(self):
+        btn = self.multiplexer.button(2)
+        self.assertIsInstance(btn, EdgeButton)
+        self.assertFalse(btn.is_pressed)
+        pressed = mock.Mock()
+        released = mock.Mock()
+        btn.when_pressed = lambda: pressed()
+        btn.when_released = lambda device: released(device)
+
+        pin = Device.pin_factory.pin(2)
+        pin.drive_low()
+        self.assertTrue(self.multiplexer.sync(1))
+        self.assertTrue(btn.is_pressed)
+        pressed.assert_called_once_with()
+        released.assert_not_called()
+
+        pin.drive_high()
+        self.assertTrue(self.multiplexer.sync(1))
+        self.assertFalse(btn.is_pressed)
+        released.assert_called_once_with(btn)
+        self.assertEqual(2, self.multiplexer.edges)
+
+    def test_single_thread(self):
+        threads = threading.active_count()
+        for gpio in range(2, 12):
+            self.multiplexer.button(gpio, hold_time=0.05).when_held = \
+                lambda btn: None
+        for gpio in range(2, 12):
+            Device.pin_factory.pin(gpio).drive_low()
+        time.sleep(0.1)
+        self.assertEqual(threads, threading.active_count())
+
+    def test_edges_in_order(self):
+        order = []
+        for gpio in range(2, 6):
+            btn = self.multiplexer.button(gpio)
+            btn.when_pressed = lambda gpio=gpio: order.append(gpio)
+        for gpio in (5, 3, 2, 4):
+            Device.pin_factory.pin(gpio).drive_low()
+        self.assertTrue(self.multiplexer.sync(1))
+        self.assertEqual([5, 3, 2, 4], order)
+
+    def test_active_state(self):
+        btn = self.multiplexer.button(4, pull_up=False)
+        self.assertFalse(btn.is_pressed)
+        Device.pin_factory.pin(4).drive_high()
+        self.multiplexer.sync(1)
+        self.assertTrue(btn.is_pressed)
+
+        btn = self.multiplexer.button(6, None, False)
+        Device.pin_factory.pin(6).drive_high()
+        Device.pin_factory.pin(6).drive_low()
+        self.multiplexer.sync(1)
+        self.assertTrue(btn.is_pressed)
+
+        with self.assertRaises(ValueError):
+            self.multiplexer.button(5, None, None)
+        with self.assertRaises(ValueError):
+            self.multiplexer.button(4)
+
+    def test_bounce(self):
+        btn = self.multiplexer.button(2, bounce_time=10)
+        pressed = mock.Mock()
+        btn.when_pressed = lambda: pressed()
+        pin = Device.pin_factory.pin(2)
+        pin.drive_low()
+        pin.drive_high()
+        pin.drive_low()
+        self.multiplexer.sync(1)
+        pressed.assert_called_once_with()
+        self.assertTrue(btn.is_pressed)
+
+    def test_glitch(self):
+        btn = self.multiplexer.button(2, bounce_time=0.02)
+        events = []
+        btn.when_pressed = lambda: events.append('pressed')
+        btn.when_released = lambda: events.append('released')
+        pin = Device.pin_factory.pin(2)
+        pin.drive_low()
+        pin.drive_high()
+        self.multiplexer.sync(1)
+        time.sleep(0.05)
+        self.multiplexer.sync(1)
+        self.assertEqual(['pressed', 'released'], events)
+        self.assertFalse(btn.is_pressed)
+
+    def test_hold(self):
+        btn = self.multiplexer.button(2, hold_time=0.05)
+        held = mock.Mock()
+        btn.when_held = lambda device: held(device)
+        pin = Device.pin_factory.pin(2)
+        pin.drive_low()
+        time.sleep(0.02)
+        pin.drive_high()
+        time.sleep(0.1)
+        held.assert_not_called()
+
+        pin.drive_low()
+        time.sleep(0.2)
+        held.assert_called_once_with(btn)
+        pin.drive_high()
+
+    def test_hold_repeat(self):
+        btn = self.multiplexer.button(2, hold_time=0.05, hold_repeat=True)
+        held = mock.Mock()
+        btn.when_held = lambda device: held(device)
+        pin = Device.pin_factory.pin(2)
+        pin.drive_low()
+        time.sleep(0.23)
+        pin.drive_high()
+        self.multiplexer.sync(1)
+        count = held.call_count
+        self.assertGreaterEqual(count, 3)
+        self.assertLessEqual(count, 5)
+        time.sleep(0.1)
+        self.assertEqual(count, held.call_count)
+
+    def test_schedule(self):
+        called = threading.Event()
+        deadline = self.multiplexer.schedule(monotonic() + 0.01, mock.Mock())
+        deadline.cancel()
+        self.multiplexer.schedule(monotonic() + 0.02, called.set)
+        self.assertTrue(called.wait(1))
+        deadline.callback.assert_not_called()
+
+    def test_call_later(self):
+        done = threading.Event()
+        timer = self.multiplexer.call_later(0.01, done.set)
+        self.assertTrue(done.wait(1))
+        self.assertGreaterEqual(self.multiplexer.clock(), timer.when)
+
+    def test_close(self):
+        btn = self.multiplexer.button(2)
+        btn.close()
+        self.assertTrue(btn.closed)
+        self.assertNotIn(2, self.multiplexer.buttons)
+        self.assertIsNone(Device.pin_factory.pin(2).when_changed)
+        self.multiplexer.button(2)
+
+
+class LevelSource:
+    """
+    An edge source which is always readable, like the sysfs value files.
+    """
+    events = SysfsEdgeSource.events
+
+    def __init__(self):
+        self.read_fd, self.write_fd = nonblocking_pipe()
+        os.write(self.write_fd, b'1')
+        self.reads = 0
+
+    def open(self, gpio, pull):
+        return self.read_fd, 1
+
+    def read(self, fd):
+        self.reads += 1
+        return [(2, 1, monotonic())]
+
+    def close(self, gpio):
+        pass
+
+    def shutdown(self):
+        os.close(self.read_fd)
+        os.close(self.write_fd)
+
+
+class EdgeSourceEventsTest(unittest.TestCase):
+
+    def test_events(self):
+        self.assertEqual(select.EPOLLIN, MockEdgeSource.events)
+        self.assertEqual(select.EPOLLPRI | select.EPOLLERR,
+                         SysfsEdgeSource.events)
+
+    def test_readable_source_does_not_wake(self):
+        source = LevelSource()
+        multiplexer = EdgeMultiplexer(source)
+        try:
+            btn = multiplexer.button(2)
+            recorder = mock.Mock()
+            btn.recorder = recorder
+            time.sleep(0.05)
+            self.assertEqual(0, source.reads)
+            self.assertLessEqual(multiplexer.timers.wakeups, 1)
+            recorder.record.assert_not_called()
+        finally:
+            multiplexer.close()
+
+
+class DeviceButtonTest(unittest.TestCase):
+
+    def setUp(self):
+        Device.pin_factory = MockFactory()
+        self.scheduler = Scheduler()
+
+    def tearDown(self):
+        self.scheduler.stop()
+
+    def test_press_hold_release(self):
+        btn = DeviceButton(self.scheduler, 2, hold_time=0.05,
+                           hold_repeat=True)
+        events = []
+        btn.when_pressed = lambda: events.append('pressed')
+        btn.when_held = lambda device: events.append('held')
+        btn.when_released = lambda device: events.append('released')
+        self.assertFalse(btn.is_pressed)
+
+        pin = Device.pin_factory.pin(2)
+        pin.drive_low()
+        self.assertTrue(btn.is_pressed)
+        time.sleep(0.13)
+        pin.drive_high()
+        time.sleep(0.1)
+        self.assertEqual(['pressed', 'held', 'held', 'released'], events)
+        stats = self.scheduler.stats()
+        self.assertEqual(2, stats['drift']['count'])
+        self.assertEqual(0, stats['pending'])
+        btn.close()
+        self.assertTrue(btn.device.closed)
+
+    def test_glitch(self):
+        scheduler = ManualScheduler()
+        btn = DeviceButton(scheduler, 2, bounce_time=0.05, hold_time=0.5,
+                           hold_repeat=True)
+        events = []
+        btn.when_pressed = lambda: events.append('pressed')
+        btn.when_held = lambda: events.append('held')
+        btn.when_released = lambda: events.append('released')
+
+        pin = Device.pin_factory.pin(2)
+        pin.drive_low()
+        scheduler.advance(0.001)
+        pin.drive_high()
+        self.assertTrue(btn.is_pressed)
+        # the release is emitted when the window closes
+        scheduler.advance(5.0)
+        self.assertEqual(['pressed', 'released'], events)
+        self.assertFalse(btn.is_pressed)
+        self.assertEqual(1, btn.debouncer.rejected)
+
+        # the glitch of a release is fixed alike
+        pin.drive_low()
+        scheduler.advance(5.1)
+        pin.drive_high()
+        scheduler.advance(5.101)
+        pin.drive_low()
+        scheduler.advance(10.0)
+        self.assertEqual(['pressed', 'released', 'pressed', 'released',
+                          'pressed'] + ['held'] * 9, events)
+        btn.close()
+        self.assertIsNone(btn.settle_timer)
+
+    def test_held_reads_pin(self):
+        scheduler = ManualScheduler()
+        btn = DeviceButton(scheduler, 2, hold_time=0.5, hold_repeat=True)
+        events = []
+        btn.when_held = lambda: events.append('held')
+        btn.when_released = lambda: events.append('released')
+
+        pin = Device.pin_factory.pin(2)
+        pin.drive_low()
+        scheduler.advance(0.6)
+        # the release edge is lost
+        btn.device.when_deactivated = None
+        pin.drive_high()
+        scheduler.advance(5.0)
+        self.assertEqual(['held', 'released'], events)
+        self.assertFalse(btn.is_pressed)
+        btn.close()
+
+    def test_threads(self):
+        buttons = [DeviceButton(self.scheduler, gpio, hold_time=0.05)
+                   for gpio in range(4, 6)]
+        for btn in buttons:
+            btn.when_held = lambda device: None
+            Device.pin_factory.pin(btn.pin).drive_low()
+        time.sleep(0.1)
+        threads = threading.active_count()
+        wakeups = self.scheduler.wakeups
+
+        buttons = [DeviceButton(self.scheduler, gpio, hold_time=0.05)
+                   for gpio in range(6, 26)]
+        for btn in buttons:
+            btn.when_held = lambda device: None
+        time.sleep(0.1)
+        self.assertEqual(threads, threading.active_count())
+        self.assertEqual(wakeups, self.scheduler.wakeups)
+
+
+class WrapCallbackTest(unittest.TestCase):
+
+    def test_wrap_callback(self):
+        device = object()
+        self.assertIsNone(wrap_callback(None, device))
+
+        def no_args():
+            return 'no args'
+
+        def one_arg(btn):
+            return btn
+
+        self.assertIs(no_args, wrap_callback(no_args, device))
+        self.assertIs(device, wrap_callback(one_arg, device)())
+
+
+class EpollGpioControllerTest(unittest.TestCase):
+
+    def test_input_engine(self):
+        Device.pin_factory = MockFactory()
+        controls = mock.Mock()
+        config = {
+            'input_engine': 'epoll',
+            'gpio27': GpioConfig().deserialize('pull_up'),
+            'gpio27.when_pressed': FunctionConfig().deserialize('play_pause'),
+            'gpio26': GpioConfig().deserialize('pull_up,none,0.05'),
+            'gpio26.when_held': FunctionConfig().deserialize('vol_up'),
+            'gpio26.when_released': FunctionConfig().deserialize('vol_down'),
+        }
+        controller = GpioController(config, controls)
+        self.assertIsInstance(controller.gpios[27], EdgeButton)
+
+        Device.pin_factory.pin(27).drive_low()
+        controller.multiplexer.sync(1)
+        controller.executor.join()
+        controls.play_pause.assert_called_once_with()
+
+        pin = Device.pin_factory.pin(26)
+        pin.drive_low()
+        time.sleep(0.1)
+        pin.drive_high()
+        controller.multiplexer.sync(1)
+        controller.executor.join()
+        controls.volume_up.assert_called_once_with(5)
+        controls.volume_down.assert_not_called()
+
+        pin.drive_low()
+        pin.drive_high()
+        controller.multiplexer.sync(1)
+        controller.executor.join()
+        controls.volume_down.assert_called_once_with(5)
+
+        multiplexer = controller.multiplexer
+        controller.close()
+        self.assertFalse(multiplexer.thread.is_alive())
+
+    def test_edge_trace(self):
+        Device.pin_factory = MockFactory()
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        path = os.path.join(tmpdir, 'edges.trace')
+        controls = mock.Mock()
+        config = {
+            'input_engine': 'epoll',
+            'edge_trace_file': path,
+            'gpio27': GpioConfig().deserialize('pull_up'),
+            'gpio27.when_pressed': FunctionConfig().deserialize('play_pause'),
+        }
+        controller = GpioController(config, controls)
+        self.assertEqual(1.0, controller.recorder.flush_interval)
+
+        pin = Device.pin_factory.pin(27)
+        pin.drive_low()
+        controller.multiplexer.sync(1)
+        # the trace is written by its own thread, off the multiplexer
+        self.assertTrue(controller.recorder.thread.is_alive())
+        pin.drive_high()
+        pin.drive_low()
+        controller.multiplexer.sync(1)
+        self.assertTrue(controller.multiplexer.thread.is_alive())
+        controller.executor.join()
+        self.assertEqual(2, controls.play_pause.call_count)
+
+        controller.close()
+        self.assertEqual([27, 27, 27], [gpio for gpio, _, _ in
+                                        read_trace(path)])
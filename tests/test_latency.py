@@ -0,0 +1,107 @@
+#
+#  Copyright 2019 Thomas Wunschel (https://github.com/wuschi)
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+from __future__ import unicode_literals
+
+import unittest
+
+import mock
+
+import pykka
+
+from mopidy_phoniebox import latency
+from mopidy_phoniebox.executor import CommandExecutor
+from mopidy_phoniebox.latency import Histogram, LatencyStats
+
+
+class HistogramTest(unittest.TestCase):
+
+    def test_add(self):
+        histogram = Histogram((1, 10, 100))
+        self.assertIsNone(histogram.percentile(50))
+        for value in (0.5, 2, 3, 4, 50, 500):
+            histogram.add(value)
+        self.assertEqual([1, 3, 1, 1], histogram.counts)
+        self.assertEqual(6, histogram.count)
+        self.assertEqual(500, histogram.max)
+        self.assertEqual(10, histogram.percentile(50))
+        self.assertEqual(500, histogram.percentile(99))
+
+        snapshot = histogram.snapshot()
+        self.assertEqual(6, snapshot['count'])
+        self.assertEqual(10, snapshot['p50'])
+        self.assertEqual(1, snapshot['buckets']['inf'])
+
+
+class LatencyStatsTest(unittest.TestCase):
+
+    def test_trace(self):
+        stats = LatencyStats()
+        with mock.patch('mopidy_phoniebox.latency.monotonic') as clock:
+            clock.return_value = 10.0
+            stats.begin('next', 9.999)
+            latency.mark(latency.DISPATCH)
+            clock.return_value = 10.010
+            latency.mark(latency.DECISION)
+            latency.mark(latency.DECISION)
+            stats.end()
+            latency.mark(latency.DECISION)
+
+        snapshot = stats.snapshot()
+        self.assertEqual(['next'], list(snapshot))
+        self.assertEqual(1, snapshot['next']['dispatch']['count'])
+        self.assertAlmostEqual(1, snapshot['next']['dispatch']['p50'])
+        self.assertEqual(1, snapshot['next']['decision']['count'])
+        self.assertAlmostEqual(11, snapshot['next']['decision']['p50'])
+
+    def test_acknowledge(self):
+        stats = LatencyStats()
+        future = pykka.ThreadingFuture()
+        latency.acknowledge(future)
+
+        stats.begin('play_pause', 0)
+        latency.acknowledge(future)
+        stats.end()
+        self.assertNotIn('play_pause', stats.snapshot())
+
+        future.set(None)
+        stats.stop()
+        self.assertEqual(1, stats.snapshot()['play_pause']['ack']['count'])
+
+    def test_executor(self):
+        executor = CommandExecutor()
+
+        def fn():
+            latency.mark(latency.DISPATCH)
+
+        executor.submit('vol_up', fn)
+        executor.submit('vol_up', fn)
+        executor.join()
+        snapshot = executor.latency.snapshot()
+        self.assertEqual(2, snapshot['vol_up']['dispatch']['count'])
+        executor.stop()
+
+    def test_log(self):
+        stats = LatencyStats()
+        stats.logger = mock.Mock()
+        stats.log()
+        stats.logger.info.assert_called_once()
+
+        stats.logger.reset_mock()
+        stats.record('next', latency.DISPATCH, 1.5)
+        stats.record('next', latency.ACK, 7.5)
+        stats.record('mute', latency.ACK, 2.5)
+        stats.log()
+        self.assertEqual(2, stats.logger.info.call_count)
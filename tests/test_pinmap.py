@@ -0,0 +1,60 @@
+#
+#  Copyright 2019 Thomas Wunschel (https://github.com/wuschi)
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+from __future__ import unicode_literals
+
+import unittest
+
+from mopidy_phoniebox import FunctionConfig, GpioConfig
+from mopidy_phoniebox.pinmap import Pin, PinMap
+
+
+class PinMapTest(unittest.TestCase):
+
+    def test_compile(self):
+        pull_up = GpioConfig().deserialize('pull_up')
+        play_pause = FunctionConfig().deserialize('play_pause')
+        mute = FunctionConfig().deserialize('mute')
+        config = {
+            'enabled': True,
+            'gpio3': pull_up,
+            'gpio3.when_pressed': play_pause,
+            'gpio3.when_held': mute,
+            'gpio4': None,
+            'gpio4.when_pressed': None,
+            'gpio64.when_released': mute,
+            'chord.gpio3+gpio64': mute,
+            'encoder0': None,
+        }
+        pins = PinMap(config)
+        self.assertIs(config, pins.config)
+        self.assertEqual([3, 64], list(pins))
+        self.assertEqual(2, len(pins))
+        self.assertIn(3, pins)
+        self.assertNotIn(4, pins)
+        self.assertIsNone(pins.get(4))
+        self.assertEqual(
+            Pin(3, pull_up, (('when_held', mute),
+                             ('when_pressed', play_pause))),
+            pins[3])
+        self.assertIsNone(pins[64].config)
+        self.assertIs(mute, pins[64].function('when_released'))
+        self.assertIsNone(pins[64].function('when_pressed'))
+
+    def test_empty(self):
+        pins = PinMap({})
+        self.assertEqual([], list(pins))
+        with self.assertRaises(KeyError):
+            pins[0]
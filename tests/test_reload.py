@@ -0,0 +1,274 @@
+#
+#  Copyright 2019 Thomas Wunschel (https://github.com/wuschi)
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+from __future__ import unicode_literals
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from gpiozero import Device
+from gpiozero.pins.mock import MockFactory
+
+import mock
+
+from mopidy_phoniebox import FunctionConfig, GpioConfig
+from mopidy_phoniebox.encoderconfig import EncoderConfig
+from mopidy_phoniebox.frontend import PhonieboxFrontend
+from mopidy_phoniebox.gpiocontroller import GpioController, StagedButton
+
+
+def press(gpio):
+    pin = Device.pin_factory.pin(gpio)
+    pin.drive_low()
+    pin.drive_high()
+
+
+class ReloadTest(unittest.TestCase):
+
+    def setUp(self):
+        Device.pin_factory = MockFactory()
+        Device.pin_factory.reset()
+        self.controls = mock.Mock()
+        self.config = {
+            'gpio20': GpioConfig().deserialize('pull_up'),
+            'gpio20.when_pressed': FunctionConfig().deserialize('next'),
+            'gpio21': GpioConfig().deserialize('pull_up'),
+            'gpio21.when_pressed': FunctionConfig().deserialize('prev'),
+            'gpio22': GpioConfig().deserialize('pull_up'),
+            'gpio22.when_pressed': FunctionConfig().deserialize('mute'),
+        }
+        self.controller = GpioController(self.config, self.controls)
+
+    def tearDown(self):
+        self.controller.close()
+        Device.pin_factory.reset()
+
+    def reload(self, **changes):
+        config = dict(self.config)
+        for key, value in changes.items():
+            if key.startswith('gpio') and '.' not in key:
+                key = key.replace('_', '.', 1)
+            if value is None:
+                config.pop(key, None)
+            else:
+                config[key] = value
+        return self.controller.reload(config)
+
+    def test_unchanged(self):
+        btn = self.controller.gpios[20]
+        handler = btn.when_pressed
+        result = self.controller.reload(dict(self.config))
+        self.assertEqual({'reopened': [], 'rebound': [], 'chords': False,
+                          'encoders': []}, result)
+        self.assertIs(btn, self.controller.gpios[20])
+        self.assertIs(handler, btn.when_pressed)
+
+    def test_function_changed(self):
+        btn20 = self.controller.gpios[20]
+        btn21 = self.controller.gpios[21]
+        handler21 = btn21.when_pressed
+        Device.pin_factory.pin(21).drive_low()
+
+        result = self.reload(gpio20_when_pressed=FunctionConfig().deserialize(
+            'play_pause'))
+        self.assertEqual([], result['reopened'])
+        self.assertEqual([20], result['rebound'])
+        self.assertIs(btn20, self.controller.gpios[20])
+        self.assertIs(btn21, self.controller.gpios[21])
+        self.assertIs(handler21, btn21.when_pressed)
+        self.assertTrue(btn21.is_pressed)
+
+        press(20)
+        Device.pin_factory.pin(21).drive_high()
+        press(21)
+        self.controller.executor.join()
+        self.controls.play_pause.assert_called_once_with()
+        self.controls.next.assert_not_called()
+        self.assertEqual(2, self.controls.previous.call_count)
+
+    def test_gpio_changed(self):
+        btn20 = self.controller.gpios[20]
+        result = self.reload(
+            gpio20=GpioConfig().deserialize('pull_up,5-50'),
+            gpio22=None,
+            gpio23=GpioConfig().deserialize('pull_up'),
+            gpio23_when_pressed=FunctionConfig().deserialize('mute'))
+        self.assertEqual([20, 22, 23], result['reopened'])
+        self.assertIsNot(btn20, self.controller.gpios[20])
+        self.assertTrue(self.controller.gpios[20].debouncer.adaptive)
+        self.assertNotIn(22, self.controller.gpios)
+
+        press(20)
+        press(23)
+        self.controller.executor.join()
+        self.controls.next.assert_called_once_with()
+        self.controls.mute_unmute.assert_called_once_with()
+
+    def test_invalid_function(self):
+        btn = self.controller.gpios[20]
+        self.reload(gpio20_when_pressed=FunctionConfig().deserialize(
+            'unknown'))
+        self.assertIsNone(btn.when_pressed)
+        self.assertIsNot(StagedButton, type(self.controller.gpios[20]))
+
+    def test_chords(self):
+        handler22 = self.controller.gpios[22].when_pressed
+        result = self.reload(**{
+            'chord.gpio20+gpio21': FunctionConfig().deserialize('shutdown'),
+            'chord_grace_time': 50,
+        })
+        self.assertTrue(result['chords'])
+        self.assertEqual([20, 21], result['rebound'])
+        self.assertEqual([(1 << 20) | (1 << 21)],
+                         list(self.controller.chords.chords))
+        self.assertIs(handler22, self.controller.gpios[22].when_pressed)
+
+        # a function of a chord gpio rebuilds the chords
+        self.config = dict(self.controller.config)
+        result = self.reload(gpio21_when_pressed=FunctionConfig().deserialize(
+            'vol_up'))
+        self.assertTrue(result['chords'])
+        self.assertEqual([20, 21], result['rebound'])
+
+        result = self.reload(**{'chord.gpio20+gpio21': None})
+        self.assertIsNone(self.controller.chords)
+
+    def test_taps(self):
+        result = self.reload(
+            gpio20_when_double_pressed=FunctionConfig().deserialize('mute'))
+        self.assertEqual([20], result['rebound'])
+        self.assertEqual([20], list(self.controller.tap_counters))
+
+        self.config = dict(self.controller.config)
+        result = self.reload(multi_tap_window=500)
+        self.assertEqual([20], result['rebound'])
+        self.assertEqual(0.5, self.controller.tap_counters[20].window)
+
+    def test_taps_pending(self):
+        self.reload(
+            gpio20_when_double_pressed=FunctionConfig().deserialize('mute'),
+            multi_tap_window=50)
+        counter = self.controller.tap_counters[20]
+        self.config = dict(self.controller.config)
+        press(20)
+        self.assertIsNotNone(counter.timer)
+
+        self.reload(gpio20_when_pressed=FunctionConfig().deserialize(
+            'play_pause'))
+        self.assertIsNone(counter.timer)
+        time.sleep(0.1)
+        self.controller.executor.join()
+        self.controls.next.assert_not_called()
+
+    def test_chords_pending(self):
+        self.reload(**{
+            'chord.gpio20+gpio21': FunctionConfig().deserialize('shutdown'),
+            'chord_grace_time': 50,
+        })
+        detector = self.controller.chords
+        self.config = dict(self.controller.config)
+        Device.pin_factory.pin(20).drive_low()
+        self.assertIn(20, detector.pending)
+
+        self.reload(**{'chord.gpio20+gpio21': None})
+        self.assertEqual({}, detector.pending)
+        time.sleep(0.1)
+        self.controller.executor.join()
+        self.controls.next.assert_not_called()
+
+    def test_encoders(self):
+        result = self.reload(**{
+            'encoder0': EncoderConfig().deserialize('24,25'),
+            'encoder0.when_rotated_clockwise':
+                FunctionConfig().deserialize('vol_up'),
+        })
+        self.assertEqual(['encoder0'], result['encoders'])
+        self.assertEqual(['encoder0'], list(self.controller.encoders))
+        encoder = self.controller.encoders['encoder0']
+
+        self.config = dict(self.controller.config)
+        result = self.reload()
+        self.assertEqual([], result['encoders'])
+        self.assertIs(encoder, self.controller.encoders['encoder0'])
+
+        result = self.reload(**{
+            'encoder0.when_rotated_clockwise':
+                FunctionConfig().deserialize('seek_fwd'),
+        })
+        self.assertEqual(['encoder0'], result['encoders'])
+        self.assertIsNot(encoder, self.controller.encoders['encoder0'])
+
+    def test_restart_keys(self):
+        self.controller.logger = mock.Mock()
+        self.reload(input_engine='epoll')
+        self.controller.logger.warning.assert_called_once_with(
+            "input_engine changed, restart mopidy to apply")
+
+
+class FrontendReloadTest(unittest.TestCase):
+
+    def setUp(self):
+        Device.pin_factory = MockFactory()
+        Device.pin_factory.reset()
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'mopidy.conf')
+        self.write_config('next')
+        self.frontend = PhonieboxFrontend({'phoniebox': {
+            'idle_time_before_shutdown': 0,
+            'config_files': (self.path,),
+            'config_watch_interval': 60,
+            'gpio20': GpioConfig().deserialize('pull_up'),
+            'gpio20.when_pressed': FunctionConfig().deserialize('next'),
+        }}, mock.Mock())
+
+    def tearDown(self):
+        self.frontend.on_stop()
+        Device.pin_factory.reset()
+        shutil.rmtree(self.tmpdir)
+
+    def write_config(self, fn_type):
+        with open(self.path, 'w') as f:
+            f.write('[phoniebox]\n'
+                    'gpio20 = pull_up\n'
+                    'gpio20.when_pressed = {}\n'.format(fn_type))
+
+    def test_reload_config(self):
+        self.write_config('prev')
+        result = self.frontend.reload_config()
+        self.assertEqual([20], result['rebound'])
+        self.assertEqual(
+            'prev', self.frontend.config['gpio20.when_pressed'].fn_type)
+
+    def test_invalid_config(self):
+        self.write_config('prev,seconds=1')
+        self.frontend.gpio_controller.reload = mock.Mock()
+        with open(self.path, 'a') as f:
+            f.write('gpio21 = pull_sideways\n')
+        self.assertIsNone(self.frontend.reload_config())
+        self.frontend.gpio_controller.reload.assert_not_called()
+
+    @mock.patch.object(PhonieboxFrontend, 'actor_ref')
+    def test_watch(self, actor_ref):
+        self.frontend.on_start()
+        self.assertIsNotNone(self.frontend.config_watch_timer)
+        self.frontend.on_config_watch_timer()
+        actor_ref.proxy.assert_not_called()
+
+        os.utime(self.path, (0, 0))
+        self.frontend.on_config_watch_timer()
+        actor_ref.proxy().reload_config.assert_called_once_with()
@@ -0,0 +1,140 @@
+#
+#  Copyright 2019 Thomas Wunschel (https://github.com/wuschi)
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+from __future__ import unicode_literals
+
+import threading
+import time
+import unittest
+
+import mock
+
+from mopidy_phoniebox.compat import monotonic
+from mopidy_phoniebox.scheduler import ManualScheduler, Scheduler, TimerQueue
+
+
+class TimerQueueTest(unittest.TestCase):
+
+    def test_run_due(self):
+        timers = TimerQueue()
+        calls = []
+        now = monotonic()
+        with timers.lock:
+            timers.push(now + 2, lambda: calls.append(2))
+            first, earliest = timers.push(now + 1, lambda: calls.append(1))
+            self.assertTrue(earliest)
+            cancelled, earliest = timers.push(now + 1.5, mock.Mock())
+            self.assertFalse(earliest)
+        cancelled.cancel()
+
+        timers.run_due(now + 1.5)
+        self.assertEqual([1], calls)
+        cancelled.callback.assert_not_called()
+        with timers.lock:
+            self.assertAlmostEqual(2, timers.timeout(), delta=0.1)
+        self.assertEqual(1, timers.stats()['pending'])
+
+        timers.run_due(now + 2)
+        self.assertEqual([1, 2], calls)
+        with timers.lock:
+            self.assertIsNone(timers.timeout())
+        self.assertEqual(2, timers.stats()['drift']['count'])
+
+    def test_error(self):
+        timers = TimerQueue()
+        calls = []
+        with timers.lock:
+            timers.push(0, mock.Mock(side_effect=ValueError))
+            timers.push(0, lambda: calls.append(1))
+        timers.run_due(monotonic())
+        self.assertEqual([1], calls)
+
+
+class SchedulerTest(unittest.TestCase):
+
+    def test_schedule(self):
+        scheduler = Scheduler()
+        self.assertIsNone(scheduler.thread)
+        done = threading.Event()
+        calls = []
+        scheduler.call_later(0.1, lambda: done.set())
+        scheduler.call_later(0.05, lambda: calls.append(
+            threading.current_thread()))
+        self.assertTrue(done.wait(1))
+        self.assertEqual([scheduler.thread], calls)
+
+        stats = scheduler.stats()
+        self.assertEqual(2, stats['drift']['count'])
+        self.assertLess(stats['drift']['max'], 50)
+        self.assertLessEqual(stats['wakeups'], 4)
+        scheduler.stop()
+        self.assertFalse(scheduler.thread.is_alive())
+
+    def test_cancel(self):
+        scheduler = Scheduler()
+        fn = mock.Mock()
+        scheduler.call_later(0.05, fn).cancel()
+        time.sleep(0.1)
+        fn.assert_not_called()
+        self.assertEqual(0, scheduler.stats()['pending'])
+        scheduler.stop()
+
+    def test_earlier_deadline(self):
+        scheduler = Scheduler()
+        done = threading.Event()
+        scheduler.call_later(10, mock.Mock())
+        scheduler.call_later(0.01, done.set)
+        self.assertTrue(done.wait(1))
+        self.assertEqual(1, scheduler.stats()['pending'])
+        scheduler.stop()
+
+    def test_log_stats(self):
+        scheduler = Scheduler()
+        scheduler.logger = mock.Mock()
+        scheduler.log_stats()
+        scheduler.logger.info.assert_not_called()
+        scheduler.drift.add(1.5)
+        scheduler.log_stats()
+        scheduler.logger.info.assert_called_once()
+        scheduler.stop()
+
+
+class ManualSchedulerTest(unittest.TestCase):
+
+    def test_advance(self):
+        scheduler = ManualScheduler(10.0)
+        calls = []
+
+        def repeat():
+            calls.append(scheduler.clock())
+            if len(calls) < 3:
+                scheduler.call_later(0.5, repeat)
+
+        scheduler.schedule(11.0, repeat)
+        scheduler.schedule(10.2, lambda: calls.append('cancelled')).cancel()
+        scheduler.advance(10.9)
+        self.assertEqual([], calls)
+        self.assertEqual(10.9, scheduler.clock())
+        scheduler.advance(11.7)
+        self.assertEqual([11.0, 11.5], calls)
+        self.assertEqual(11.7, scheduler.clock())
+        scheduler.advance(20)
+        self.assertEqual([11.0, 11.5, 12.0], calls)
+        self.assertEqual(0, scheduler.stats()['pending'])
+
+        scheduler.call_later(1, lambda: calls.append('stopped'))
+        scheduler.stop()
+        scheduler.advance(30)
+        self.assertEqual(3, len(calls))
@@ -0,0 +1,73 @@
+#
+#  Copyright 2019 Thomas Wunschel (https://github.com/wuschi)
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+from __future__ import unicode_literals
+
+import threading
+import unittest
+
+import mock
+
+from mopidy.models import TlTrack, Track
+
+from mopidy_phoniebox.latency import LatencyStats
+from mopidy_phoniebox.seek import SeekAccumulator
+from mopidy_phoniebox.statecache import StateCache
+
+
+class SeekAccumulatorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.core = mock.Mock()
+        self.state = StateCache(self.core)
+        self.state.track_playback_started(TlTrack(1, Track(length=20000)))
+        self.state.track_playback_paused(None, 10000)
+
+    def test_window(self):
+        seeked = threading.Event()
+        self.core.playback.seek.side_effect = lambda pos: seeked.set()
+        accumulator = SeekAccumulator(self.core, self.state, window=0.05)
+        self.assertEqual(15000, accumulator.seek(5000))
+        self.assertEqual(20000, accumulator.seek(5000))
+        self.assertEqual(15000, accumulator.seek(-5000))
+        self.assertTrue(seeked.wait(1))
+        self.core.playback.seek.assert_called_once_with(15000)
+        self.assertEqual(1, accumulator.seeks)
+        self.assertEqual(15000, self.state.time_position())
+
+    def test_clamp(self):
+        accumulator = SeekAccumulator(self.core, self.state)
+        self.assertEqual(0, accumulator.seek(-15000))
+        self.assertEqual(5000, accumulator.seek(5000))
+        accumulator.flush()
+        self.core.playback.seek.assert_called_once_with(5000)
+
+    def test_acknowledge(self):
+        accumulator = SeekAccumulator(self.core, self.state)
+        stats = LatencyStats()
+        for _ in range(2):
+            stats.begin('seek_fwd', 0)
+            accumulator.seek(1000)
+            stats.end()
+        accumulator.flush()
+        stats.stop()
+        self.assertEqual(2, stats.snapshot()['seek_fwd']['ack']['count'])
+
+    def test_stop(self):
+        accumulator = SeekAccumulator(self.core, self.state)
+        accumulator.seek(5000)
+        accumulator.stop()
+        accumulator.flush()
+        self.core.playback.seek.assert_not_called()
@@ -0,0 +1,210 @@
+#
+#  Copyright 2019 Thomas Wunschel (https://github.com/wuschi)
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+from __future__ import unicode_literals
+
+import unittest
+
+import mock
+
+from mopidy.audio import PlaybackState
+from mopidy.models import TlTrack
+
+from mopidy_phoniebox.statecache import StateCache, TracklistIndex
+
+
+class StateCacheTest(unittest.TestCase):
+
+    def test_init(self):
+        core = mock.Mock()
+
+        cache = StateCache(core)
+        self.assertIs(core, cache.core)
+        self.assertIsNone(cache.max_age)
+        self.assertEqual((False, None), cache.lookup(StateCache.VOLUME))
+
+    def test_get_cold(self):
+        core = mock.Mock()
+        core.mixer.get_volume.return_value.get.return_value = 40
+
+        cache = StateCache(core)
+        self.assertEqual(40, cache.get(StateCache.VOLUME))
+        self.assertEqual(40, cache.get(StateCache.VOLUME))
+        core.mixer.get_volume.assert_called_once()
+
+    def test_get_stale(self):
+        core = mock.Mock()
+        core.mixer.get_mute.return_value.get.return_value = True
+
+        cache = StateCache(core, max_age=10)
+        with mock.patch('mopidy_phoniebox.statecache.monotonic') as clock:
+            clock.return_value = 100
+            self.assertTrue(cache.get(StateCache.MUTE))
+            clock.return_value = 105
+            self.assertTrue(cache.get(StateCache.MUTE))
+            core.mixer.get_mute.assert_called_once()
+            clock.return_value = 111
+            self.assertTrue(cache.get(StateCache.MUTE))
+            self.assertEqual(2, core.mixer.get_mute.call_count)
+
+    def test_get_all(self):
+        core = mock.Mock()
+        future_tl = mock.Mock()
+        future_tl.get.return_value = [TlTrack(2, None), TlTrack(5, None)]
+        future_pos = mock.Mock()
+        future_pos.get.return_value = 1000
+        core.tracklist.get_tl_tracks.return_value = future_tl
+        core.playback.get_time_position.return_value = future_pos
+
+        cache = StateCache(core)
+        cache.track_playback_started(TlTrack(2, None))
+        with mock.patch('pykka.get_all') as get_all:
+            get_all.return_value = [future_tl.get(), 1000]
+            tracklist, tl_track, position = cache.get_all(
+                StateCache.TRACKLIST, StateCache.CURRENT_TL_TRACK,
+                StateCache.TIME_POSITION)
+            get_all.assert_called_once_with([future_tl, future_pos])
+        self.assertEqual((2, 5), tracklist.tlids)
+        self.assertEqual(TlTrack(2, None), tl_track)
+        self.assertEqual(1000, position)
+        core.playback.get_current_tl_track.assert_not_called()
+
+        # the length is cached now, the time position is volatile
+        self.assertEqual([tracklist, 1000], cache.get_all(
+            StateCache.TRACKLIST, StateCache.TIME_POSITION))
+        core.tracklist.get_tl_tracks.assert_called_once()
+        self.assertEqual(2, core.playback.get_time_position.call_count)
+
+    def test_update_since(self):
+        core = mock.Mock()
+
+        cache = StateCache(core)
+        with mock.patch('mopidy_phoniebox.statecache.monotonic') as clock:
+            clock.return_value = 100
+            cache.update(StateCache.VOLUME, 30)
+            cache.update(StateCache.VOLUME, 20, since=99)
+            self.assertEqual((True, 30), cache.lookup(StateCache.VOLUME))
+            cache.update(StateCache.VOLUME, 20, since=100)
+            self.assertEqual((True, 20), cache.lookup(StateCache.VOLUME))
+
+    def test_events(self):
+        core = mock.Mock()
+        tl_track = TlTrack(1, None)
+
+        cache = StateCache(core)
+        cache.playback_state_changed(PlaybackState.STOPPED,
+                                     PlaybackState.PLAYING)
+        cache.volume_changed(70)
+        cache.mute_changed(False)
+        cache.track_playback_started(tl_track)
+        self.assertEqual(PlaybackState.PLAYING,
+                         cache.get(StateCache.PLAYBACK_STATE))
+        self.assertEqual(70, cache.get(StateCache.VOLUME))
+        self.assertFalse(cache.get(StateCache.MUTE))
+        self.assertIs(tl_track, cache.get(StateCache.CURRENT_TL_TRACK))
+        core.playback.get_state.assert_not_called()
+        core.mixer.get_volume.assert_not_called()
+        core.mixer.get_mute.assert_not_called()
+        core.playback.get_current_tl_track.assert_not_called()
+
+        cache.update(StateCache.TRACKLIST, TracklistIndex([]))
+        cache.tracklist_changed()
+        self.assertFalse(cache.lookup(StateCache.TRACKLIST)[0])
+        self.assertFalse(cache.lookup(StateCache.CURRENT_TL_TRACK)[0])
+
+        cache.track_playback_started(tl_track)
+        cache.track_playback_ended(tl_track, 1000)
+        self.assertFalse(cache.lookup(StateCache.CURRENT_TL_TRACK)[0])
+
+    def test_invalidate(self):
+        core = mock.Mock()
+
+        cache = StateCache(core)
+        cache.volume_changed(70)
+        cache.mute_changed(False)
+        cache.invalidate(StateCache.VOLUME)
+        self.assertFalse(cache.lookup(StateCache.VOLUME)[0])
+        self.assertTrue(cache.lookup(StateCache.MUTE)[0])
+        cache.invalidate()
+        self.assertFalse(cache.lookup(StateCache.MUTE)[0])
+
+    def test_time_position(self):
+        core = mock.Mock()
+        core.playback.get_state.return_value.get.return_value = \
+            PlaybackState.PLAYING
+        core.playback.get_time_position.return_value.get.return_value = 5000
+
+        cache = StateCache(core)
+        with mock.patch('mopidy_phoniebox.statecache.monotonic') as clock:
+            clock.return_value = 100
+            self.assertEqual(5000, cache.time_position())
+            clock.return_value = 101.5
+            self.assertEqual(6500, cache.time_position())
+            core.playback.get_time_position.assert_called_once()
+
+            cache.track_playback_paused(None, 7000)
+            clock.return_value = 110
+            self.assertEqual(7000, cache.time_position())
+
+            cache.track_playback_resumed(None, 7000)
+            clock.return_value = 111
+            self.assertEqual(8000, cache.time_position())
+
+            cache.seeked(1000)
+            clock.return_value = 112
+            self.assertEqual(2000, cache.time_position())
+
+            cache.track_playback_started(None)
+            clock.return_value = 113
+            self.assertEqual(1000, cache.time_position())
+
+            cache.playback_state_changed(PlaybackState.PLAYING,
+                                         PlaybackState.STOPPED)
+            self.assertIsNone(cache.position_anchor)
+
+    def test_track_changing(self):
+        core = mock.Mock()
+
+        cache = StateCache(core)
+        cache.playback_state_changed(PlaybackState.STOPPED,
+                                     PlaybackState.PAUSED)
+        cache.track_playback_paused(TlTrack(1, None), 9000)
+        cache.track_changing(TlTrack(2, None))
+        self.assertEqual((True, TlTrack(2, None)),
+                         cache.lookup(StateCache.CURRENT_TL_TRACK))
+        self.assertEqual(0, cache.time_position())
+        self.assertFalse(cache.position_anchor[2])
+        core.playback.get_current_tl_track.assert_not_called()
+
+
+class TracklistIndexTest(unittest.TestCase):
+
+    def test_index(self):
+        index = TracklistIndex([TlTrack(4, None), TlTrack(7, None),
+                                TlTrack(5, None)])
+        self.assertEqual(3, len(index))
+        self.assertEqual((4, 7, 5), index.tlids)
+        self.assertEqual(0, index.index(4))
+        self.assertEqual(2, index.index(5))
+        self.assertIsNone(index.index(1))
+        self.assertEqual(4, index.first())
+        self.assertEqual(5, index.last())
+        self.assertEqual(TlTrack(7, None), index.tl_track(1))
+
+    def test_empty(self):
+        index = TracklistIndex([])
+        self.assertEqual(0, len(index))
+        self.assertIsNone(index.first())
+        self.assertIsNone(index.last())
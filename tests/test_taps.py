@@ -0,0 +1,144 @@
+#
+#  Copyright 2019 Thomas Wunschel (https://github.com/wuschi)
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+from __future__ import unicode_literals
+
+import time
+import unittest
+
+from gpiozero import Device
+from gpiozero.pins.mock import MockFactory
+
+import mock
+
+from mopidy_phoniebox import FunctionConfig, GpioConfig
+from mopidy_phoniebox.gpiocontroller import GpioController
+from mopidy_phoniebox.scheduler import Scheduler
+from mopidy_phoniebox.taps import TapCounter
+
+
+class TapCounterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.scheduler = Scheduler()
+        self.single = mock.Mock()
+        self.double = mock.Mock()
+        self.triple = mock.Mock()
+
+    def tearDown(self):
+        self.scheduler.stop()
+
+    def counter(self, actions):
+        return TapCounter(self.scheduler, 0.05, actions)
+
+    def test_single_tap(self):
+        counter = self.counter({1: self.single, 2: self.double})
+        counter.pressed()
+        self.single.assert_not_called()
+        time.sleep(0.1)
+        self.single.assert_called_once_with()
+        self.double.assert_not_called()
+
+    def test_double_tap(self):
+        counter = self.counter({1: self.single, 2: self.double,
+                                3: self.triple})
+        counter.pressed()
+        counter.pressed()
+        time.sleep(0.1)
+        self.double.assert_called_once_with()
+        self.single.assert_not_called()
+        self.triple.assert_not_called()
+
+    def test_max_taps_fire_immediately(self):
+        counter = self.counter({1: self.single, 3: self.triple})
+        counter.pressed()
+        counter.pressed()
+        counter.pressed()
+        self.triple.assert_called_once_with()
+        time.sleep(0.1)
+        self.triple.assert_called_once_with()
+        self.single.assert_not_called()
+
+    def test_single_per_tap(self):
+        counter = self.counter({1: self.single, 3: self.triple})
+        counter.pressed()
+        counter.pressed()
+        time.sleep(0.1)
+        self.assertEqual(2, self.single.call_count)
+        self.triple.assert_not_called()
+
+    def test_no_single(self):
+        counter = self.counter({1: None, 2: self.double})
+        counter.pressed()
+        time.sleep(0.1)
+        self.double.assert_not_called()
+        counter.pressed()
+        counter.pressed()
+        self.double.assert_called_once_with()
+
+    def test_close(self):
+        counter = self.counter({1: self.single, 2: self.double})
+        counter.pressed()
+        counter.close()
+        time.sleep(0.1)
+        self.single.assert_not_called()
+        self.assertIsNone(counter.timer)
+        self.assertEqual(0, counter.taps)
+
+
+class TapGpioControllerTest(unittest.TestCase):
+
+    def setUp(self):
+        Device.pin_factory = MockFactory()
+        Device.pin_factory.reset()
+
+    def tearDown(self):
+        Device.pin_factory.reset()
+
+    def test_taps(self):
+        controls = mock.Mock()
+        config = {
+            'multi_tap_window': 50,
+            'gpio20': GpioConfig().deserialize('pull_up'),
+            'gpio20.when_pressed': FunctionConfig().deserialize('play_pause'),
+            'gpio20.when_double_pressed': FunctionConfig().deserialize(
+                'next'),
+            'gpio21': GpioConfig().deserialize('pull_up'),
+            'gpio21.when_pressed': FunctionConfig().deserialize('prev'),
+        }
+        controller = GpioController(config, controls)
+        self.assertEqual([20], list(controller.tap_counters))
+
+        # buttons without multi-tap functions are not delayed
+        pin21 = Device.pin_factory.pin(21)
+        pin21.drive_low()
+        pin21.drive_high()
+        controller.executor.join()
+        controls.previous.assert_called_once_with()
+
+        pin20 = Device.pin_factory.pin(20)
+        for _ in range(2):
+            pin20.drive_low()
+            pin20.drive_high()
+        controller.executor.join()
+        controls.next.assert_called_once_with()
+        controls.play_pause.assert_not_called()
+
+        pin20.drive_low()
+        pin20.drive_high()
+        time.sleep(0.1)
+        controller.executor.join()
+        controls.play_pause.assert_called_once_with()
+        controller.close()
@@ -0,0 +1,215 @@
+#
+#  Copyright 2019 Thomas Wunschel (https://github.com/wuschi)
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+from __future__ import unicode_literals
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from gpiozero import Device
+from gpiozero.pins.mock import MockFactory
+
+import mock
+
+from mopidy_phoniebox import FunctionConfig, GpioConfig
+from mopidy_phoniebox.executor import CommandExecutor
+from mopidy_phoniebox.gpiocontroller import GpioController
+from mopidy_phoniebox.scheduler import ManualScheduler
+from mopidy_phoniebox.trace import (EdgeRecorder, HEADER, MAGIC, RECORD,
+                                    TraceReplayer, VERSION, read_trace)
+
+
+class EdgeRecorderTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'edges.trace')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_record(self):
+        recorder = EdgeRecorder(self.path, capacity=4)
+        self.assertEqual(HEADER.size + 4 * RECORD.size,
+                         os.path.getsize(self.path))
+        recorder.record(2, 0, 1.0)
+        recorder.record(2, 1, 1.5)
+        self.assertEqual([], read_trace(self.path))
+        recorder.flush()
+        self.assertEqual([(2, 0, 1.0), (2, 1, 1.5)], read_trace(self.path))
+        recorder.close()
+
+    def test_large_gpio(self):
+        recorder = EdgeRecorder(self.path, capacity=4)
+        recorder.record(1000, 1, 2.5)
+        recorder.close()
+        self.assertEqual([(1000, 1, 2.5)], read_trace(self.path))
+
+    def test_ring(self):
+        recorder = EdgeRecorder(self.path, capacity=4)
+        for index in range(3):
+            recorder.record(index, 0, float(index))
+        recorder.flush()
+        for index in range(3, 10):
+            recorder.record(index, 1, float(index))
+        recorder.close()
+        self.assertEqual([(index, 1, float(index)) for index in range(6, 10)],
+                         read_trace(self.path))
+        self.assertEqual(HEADER.size + 4 * RECORD.size,
+                         os.path.getsize(self.path))
+
+    def test_continue(self):
+        recorder = EdgeRecorder(self.path, capacity=4)
+        recorder.record(2, 0, 1.0)
+        recorder.close()
+        recorder = EdgeRecorder(self.path, capacity=4)
+        recorder.record(3, 0, 0.5)
+        recorder.close()
+        self.assertEqual([(2, 0, 1.0), (3, 0, 0.5)], read_trace(self.path))
+
+        # another capacity starts over
+        recorder = EdgeRecorder(self.path, capacity=8)
+        recorder.close()
+        self.assertEqual([], read_trace(self.path))
+
+        # so does a trace of an older version
+        with open(self.path, 'r+b') as f:
+            f.write(HEADER.pack(MAGIC, VERSION - 1, 8, 3))
+        recorder = EdgeRecorder(self.path, capacity=8)
+        recorder.close()
+        self.assertEqual([], read_trace(self.path))
+
+    def test_writer_thread(self):
+        recorder = EdgeRecorder(self.path, capacity=4, flush_interval=0.05)
+        recorder.record(2, 0, 1.0)
+        recorder.record(2, 1, 1.2)
+        self.assertEqual('PhonieboxEdgeRecorder', recorder.thread.name)
+        time.sleep(0.2)
+        self.assertEqual(2, len(read_trace(self.path)))
+        recorder.close()
+        self.assertFalse(recorder.thread.is_alive())
+
+    def test_slow_write(self):
+        recorder = EdgeRecorder(self.path, capacity=4, flush_interval=0.01)
+        stalled = threading.Event()
+        resume = threading.Event()
+        write = recorder.write
+
+        def slow_write(*args):
+            stalled.set()
+            resume.wait()
+            write(*args)
+        recorder.write = slow_write
+        recorder.record(2, 0, 1.0)
+        self.assertTrue(stalled.wait(1))
+
+        # the edges are buffered while the writer is stalled
+        recorder.record(2, 1, 1.2)
+        recorder.record(2, 0, 1.4)
+        self.assertEqual(2, len(recorder.buffer))
+        resume.set()
+        recorder.close()
+        self.assertEqual(3, len(read_trace(self.path)))
+
+    def test_invalid_trace(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'not a trace at all')
+        with self.assertRaises(ValueError):
+            read_trace(self.path)
+
+
+class TraceReplayTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'edges.trace')
+        self.config = {
+            'edge_trace_file': self.path,
+            'gpio20': GpioConfig().deserialize('pull_up,5-50,0.1,true'),
+            'gpio20.when_pressed': FunctionConfig().deserialize('next'),
+            'gpio20.when_held': FunctionConfig().deserialize('vol_up'),
+            'gpio21': GpioConfig().deserialize('pull_up'),
+            'gpio21.when_pressed': FunctionConfig().deserialize('prev'),
+            'gpio21.when_double_pressed': FunctionConfig().deserialize(
+                'play_pause'),
+        }
+        Device.pin_factory = MockFactory()
+        Device.pin_factory.reset()
+
+    def tearDown(self):
+        Device.pin_factory.reset()
+        shutil.rmtree(self.tmpdir)
+
+    def session(self, factory):
+        pin20 = factory.pin(20)
+        pin21 = factory.pin(21)
+        # a bouncy press, a hold with two repeats and a double tap
+        pin20.drive_low()
+        pin20.drive_high()
+        pin20.drive_low()
+        time.sleep(0.06)
+        pin20.drive_high()
+        time.sleep(0.06)
+        pin20.drive_low()
+        time.sleep(0.25)
+        pin20.drive_high()
+        time.sleep(0.06)
+        for _ in range(2):
+            pin21.drive_low()
+            pin21.drive_high()
+        time.sleep(0.4)
+
+    def test_replay(self):
+        # a single lane, so the commands are not reordered or cancelled when
+        # the executor lags behind the virtual time of the replay
+        recorded = mock.Mock()
+        controller = GpioController(self.config, recorded, CommandExecutor())
+        self.session(Device.pin_factory)
+        controller.executor.join()
+        controller.close()
+        records = read_trace(self.path)
+        self.assertEqual(10, len(records))
+
+        Device.pin_factory.reset()
+        config = dict(self.config, edge_trace_file=None)
+        replayed = mock.Mock()
+        scheduler = ManualScheduler(records[0][2])
+        controller = GpioController(config, replayed, CommandExecutor(),
+                                    scheduler)
+        started = time.time()
+        edges = TraceReplayer(records, Device.pin_factory).replay(scheduler)
+        self.assertLess(time.time() - started, 0.2)
+        controller.executor.join()
+        controller.close()
+
+        self.assertEqual(10, edges)
+        self.assertEqual(2, recorded.volume_up.call_count)
+        self.assertEqual(recorded.mock_calls, replayed.mock_calls)
+        self.assertEqual(1, replayed.play_pause.call_count)
+        self.assertEqual(2, replayed.next.call_count)
+        replayed.previous.assert_not_called()
+
+    def test_time_going_backwards(self):
+        replayer = TraceReplayer([(2, 0, 5.0), (2, 1, 1.0), (2, 0, 1.5),
+                                  (2, 1, 2.0), (2, 0, 0.5), (2, 1, 0.75)],
+                                 None)
+        # the delays after a restart are kept
+        self.assertEqual([(2, 0, 5.0), (2, 1, 15.0), (2, 0, 15.5),
+                          (2, 1, 16.0), (2, 0, 26.0), (2, 1, 26.25)],
+                         list(replayer.timeline()))
@@ -0,0 +1,84 @@
+#
+#  Copyright 2019 Thomas Wunschel (https://github.com/wuschi)
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+from __future__ import unicode_literals
+
+import threading
+import unittest
+
+import mock
+
+from mopidy_phoniebox.latency import LatencyStats
+from mopidy_phoniebox.statecache import StateCache
+from mopidy_phoniebox.volume import VolumeCoalescer
+
+
+class VolumeCoalescerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.core = mock.Mock()
+        self.state = StateCache(self.core)
+        self.coalescer = VolumeCoalescer(self.core, self.state)
+
+    def tearDown(self):
+        self.coalescer.stop()
+
+    def test_adjust(self):
+        self.state.volume_changed(40)
+        self.assertEqual(45, self.coalescer.adjust(5))
+        self.assertTrue(self.coalescer.wait(1))
+        self.core.mixer.set_volume.assert_called_once_with(45)
+        self.core.mixer.get_volume.assert_not_called()
+        self.assertEqual((True, 45), self.state.lookup(StateCache.VOLUME))
+
+    def test_acknowledge(self):
+        self.state.volume_changed(40)
+        stats = LatencyStats()
+        stats.begin('vol_up', 0)
+        self.coalescer.adjust(5)
+        stats.end()
+        self.coalescer.adjust(5)
+        self.assertTrue(self.coalescer.wait(1))
+        stats.stop()
+        self.assertEqual(1, stats.snapshot()['vol_up']['ack']['count'])
+
+    def test_adjust_cold(self):
+        self.core.mixer.get_volume.return_value.get.return_value = None
+        self.assertEqual(45, self.coalescer.adjust(-5))
+        self.assertTrue(self.coalescer.wait(1))
+        self.core.mixer.set_volume.assert_called_once_with(45)
+
+    def test_adjust_in_flight(self):
+        release = threading.Event()
+        self.core.mixer.set_volume.return_value.get.side_effect = \
+            lambda: release.wait(5)
+        self.state.volume_changed(90)
+
+        self.assertEqual(95, self.coalescer.adjust(5))
+        # clamped in order: 100, 100, 95, 90
+        self.assertEqual(100, self.coalescer.adjust(5))
+        self.assertEqual(100, self.coalescer.adjust(5))
+        self.assertEqual(95, self.coalescer.adjust(-5))
+        self.assertEqual(90, self.coalescer.adjust(-5))
+        self.assertFalse(self.coalescer.wait(0.01))
+
+        release.set()
+        self.assertTrue(self.coalescer.wait(1))
+        self.core.mixer.get_volume.assert_not_called()
+        self.assertEqual(self.core.mixer.set_volume.call_args_list[-1],
+                         mock.call(90))
+        self.assertLessEqual(self.core.mixer.set_volume.call_count, 2)
+        self.assertEqual(self.core.mixer.set_volume.call_count,
+                         self.coalescer.writes)